@@ -33,25 +33,139 @@ class Settings:
     safe_target_dream_path: str = _env("TNEA_SAFE_TARGET_DREAM_PATH", "/api/safe-target-dream") or "/api/safe-target-dream"
     cutoff_history_path: str = _env("TNEA_CUTOFF_HISTORY_PATH", "/api/cutoff-history") or "/api/cutoff-history"
 
+    # Shared downstream HTTP client (one connection pool per worker, opened/closed by the app lifespan)
+    tnea_api_timeout_seconds: float = float(_env("TNEA_API_TIMEOUT_SECONDS", "15") or "15")
+    http_max_connections: int = int(_env("HTTP_MAX_CONNECTIONS", "100") or "100")
+    http_max_keepalive_connections: int = int(_env("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20") or "20")
+    http_keepalive_expiry_seconds: float = float(_env("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30") or "30")
+    # HTTP/2 requires the optional `h2` package (`pip install httpx[http2]`)
+    http2_enabled: bool = (_env("HTTP2_ENABLED", "false") or "false").lower() in {"1", "true", "yes", "y"}
+
+    # Recommendation responses are streamed and only the best N records (by probability/matchScore)
+    # are kept (0 = buffer and keep everything); streamed bodies are cut off after the byte cap.
+    recommendation_top_k: int = int(_env("RECOMMENDATION_TOP_K", "50") or "50")
+    max_response_bytes: int = int(_env("MAX_RESPONSE_BYTES", str(4 * 1024 * 1024)) or str(4 * 1024 * 1024))
+
+    # Recommendation paging: rows per /chat page and ranked rows kept per session for "show more"
+    results_page_size: int = int(_env("RESULTS_PAGE_SIZE", "5") or "5")
+    session_results_max_rows: int = int(_env("SESSION_RESULTS_MAX_ROWS", "50") or "50")
+
+    # Downstream resilience (tracked per endpoint path)
+    breaker_failure_threshold: int = int(_env("BREAKER_FAILURE_THRESHOLD", "5") or "5")
+    breaker_reset_seconds: float = float(_env("BREAKER_RESET_SECONDS", "30") or "30")
+    retry_max_attempts: int = int(_env("RETRY_MAX_ATTEMPTS", "2") or "2")
+    retry_budget_ratio: float = float(_env("RETRY_BUDGET_RATIO", "0.2") or "0.2")
+    retry_budget_min_per_second: float = float(_env("RETRY_BUDGET_MIN_PER_SECOND", "1") or "1")
+    # Hedged duplicate GETs for the idempotent cutoff-history endpoint
+    hedge_cutoff_history: bool = (_env("HEDGE_CUTOFF_HISTORY", "false") or "false").lower() in {"1", "true", "yes", "y"}
+    hedge_percentile: float = float(_env("HEDGE_PERCENTILE", "95") or "95")
+    hedge_min_samples: int = int(_env("HEDGE_MIN_SAMPLES", "20") or "20")
+
+    # Downstream response cache (per worker). Results change at most once per counselling round.
+    # A TTL of 0 disables caching for that endpoint.
+    response_cache_enabled: bool = (_env("RESPONSE_CACHE_ENABLED", "true") or "true").lower() in {"1", "true", "yes", "y"}
+    response_cache_max_entries: int = int(_env("RESPONSE_CACHE_MAX_ENTRIES", "2000") or "2000")
+    response_cache_max_bytes: int = int(_env("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)) or str(32 * 1024 * 1024))
+    cache_ttl_recommend_seconds: float = float(_env("CACHE_TTL_RECOMMEND_SECONDS", "300") or "300")
+    cache_ttl_compare_seconds: float = float(_env("CACHE_TTL_COMPARE_SECONDS", "600") or "600")
+    cache_ttl_history_seconds: float = float(_env("CACHE_TTL_HISTORY_SECONDS", "900") or "900")
+    # After the TTL: serve stale while refreshing in the background, and serve stale when the backend errors
+    cache_stale_while_revalidate_seconds: float = float(_env("CACHE_STALE_WHILE_REVALIDATE_SECONDS", "60") or "60")
+    cache_stale_if_error_seconds: float = float(_env("CACHE_STALE_IF_ERROR_SECONDS", "3600") or "3600")
+    # Cutoff/marks are rounded to this bucket in cache keys (0 = exact match)
+    cache_cutoff_bucket: float = float(_env("CACHE_CUTOFF_BUCKET", "0.5") or "0.5")
+
+    # Local cutoff-history snapshot, refreshed in the background so last-year cutoffs need no network call.
+    # With a directory set, snapshots are persisted there and memory-mapped back on startup.
+    cutoff_snapshot_enabled: bool = (_env("CUTOFF_SNAPSHOT_ENABLED", "true") or "true").lower() in {"1", "true", "yes", "y"}
+    cutoff_snapshot_refresh_seconds: float = float(_env("CUTOFF_SNAPSHOT_REFRESH_SECONDS", "900") or "900")
+    cutoff_snapshot_max_age_seconds: float = float(_env("CUTOFF_SNAPSHOT_MAX_AGE_SECONDS", "86400") or "86400")
+    cutoff_snapshot_dir: str | None = _env("CUTOFF_SNAPSHOT_DIR", None)
+    # Credentials for background downstream calls that have no user to forward. The Node backend's /api
+    # routes check a passport session, so a logged-in service account's session cookie
+    # (e.g. "connect.sid=s%3A...") is what it accepts; the Authorization value is for token-aware proxies.
+    tnea_service_cookie: str | None = _env("TNEA_SERVICE_COOKIE", None)
+    tnea_service_authorization: str | None = _env("TNEA_SERVICE_AUTHORIZATION", None)
+
+    # Speculative recommendation prefetch once a session knows cutoff + category (needs the response cache)
+    prefetch_enabled: bool = (_env("PREFETCH_ENABLED", "true") or "true").lower() in {"1", "true", "yes", "y"}
+    prefetch_max_concurrency: int = int(_env("PREFETCH_MAX_CONCURRENCY", "32") or "32")
+
+    # Per-turn latency budget for /chat (clients may tighten it with an `X-Latency-Budget-Ms` header).
+    # Optional work (e.g. the last-year cutoff lookup) is skipped or abandoned once less than the minimum is left.
+    chat_latency_budget_ms: int = int(_env("CHAT_LATENCY_BUDGET_MS", "3000") or "3000")
+    optional_work_min_budget_ms: int = int(_env("OPTIONAL_WORK_MIN_BUDGET_MS", "400") or "400")
+
+    # Batched Safe/Target/Dream labels for recommendation lists (requires a batch-capable endpoint)
+    safe_target_dream_batch_labels: bool = (
+        _env("SAFE_TARGET_DREAM_BATCH_LABELS", "false") or "false"
+    ).lower() in {"1", "true", "yes", "y"}
+    safe_target_dream_batch_size: int = int(_env("SAFE_TARGET_DREAM_BATCH_SIZE", "25") or "25")
+    safe_target_dream_max_in_flight: int = int(_env("SAFE_TARGET_DREAM_MAX_IN_FLIGHT", "4") or "4")
+
     # Intent models
     # - "baseline": TF-IDF + Logistic Regression (joblib pipeline)
     # - "bert": DistilBERT fine-tuned model (transformers)
+    # - "onnx": ONNX export of the DistilBERT model on ONNX Runtime (CPU, optionally int8)
+    # - "cascade": baseline (then rules) first; only low-confidence messages go to CASCADE_ESCALATION_BACKEND
     intent_backend: str = (_env("INTENT_BACKEND", "baseline") or "baseline").lower()
     baseline_intent_model_path: str = _env(
         "BASELINE_INTENT_MODEL_PATH",
         os.path.join(os.path.dirname(__file__), "intent_model", "artifacts", "baseline_intent.joblib"),
     ) or os.path.join(os.path.dirname(__file__), "intent_model", "artifacts", "baseline_intent.joblib")
+    # Score the baseline with its NumPy-only export (`<model>_compiled/`) when one exists
+    baseline_compiled_enabled: bool = (_env("BASELINE_COMPILED_ENABLED", "true") or "true").lower() in {"1", "true", "yes", "y"}
     bert_intent_model_dir: str = _env(
         "BERT_INTENT_MODEL_DIR",
         os.path.join(os.path.dirname(__file__), "intent_model", "artifacts", "distilbert_intent"),
     ) or os.path.join(os.path.dirname(__file__), "intent_model", "artifacts", "distilbert_intent")
+    # Written by `scripts/train_intent_bert.py`; point at `model.onnx` for the fp32 export
+    onnx_intent_model_path: str = _env(
+        "ONNX_INTENT_MODEL_PATH",
+        os.path.join(os.path.dirname(__file__), "intent_model", "artifacts", "distilbert_intent", "onnx", "model.int8.onnx"),
+    ) or os.path.join(os.path.dirname(__file__), "intent_model", "artifacts", "distilbert_intent", "onnx", "model.int8.onnx")
+    onnx_intra_op_threads: int = int(_env("ONNX_INTRA_OP_THREADS", "1") or "1")
+    # Cascade: "bert" | "onnx"; the threshold comes from `python scripts/calibrate_cascade.py`
+    cascade_escalation_backend: str = (_env("CASCADE_ESCALATION_BACKEND", "onnx") or "onnx").lower()
+    cascade_confidence_threshold: float = float(_env("CASCADE_CONFIDENCE_THRESHOLD", "0.7") or "0.7")
+
+    # CPU-bound NLU execution: each backend ("baseline", "bert", "onnx", "ner") runs "inline" on the event loop,
+    # in a bounded thread pool ("thread") or in a process pool ("process")
+    inference_routing: str = _env("INFERENCE_ROUTING", "baseline=thread,bert=thread,onnx=thread,ner=thread") or "baseline=thread,bert=thread,onnx=thread,ner=thread"
+    inference_thread_workers: int = int(_env("INFERENCE_THREAD_WORKERS", "4") or "4")
+    inference_process_workers: int = int(_env("INFERENCE_PROCESS_WORKERS", "2") or "2")
+
+    # BERT/ONNX micro-batching (also for cascade escalations): concurrent /chat predictions are grouped into batches of up to
+    # BERT_BATCH_MAX_SIZE items, waiting at most BERT_BATCH_MAX_WAIT_MS for a batch to fill
+    bert_batching_enabled: bool = (_env("BERT_BATCHING_ENABLED", "true") or "true").lower() in {"1", "true", "yes", "y"}
+    bert_batch_max_size: int = int(_env("BERT_BATCH_MAX_SIZE", "32") or "32")
+    bert_batch_max_wait_ms: float = float(_env("BERT_BATCH_MAX_WAIT_MS", "5") or "5")
+    bert_batch_bucket_size: int = int(_env("BERT_BATCH_BUCKET_SIZE", "16") or "16")
+    bert_batch_max_concurrent: int = int(_env("BERT_BATCH_MAX_CONCURRENT", "1") or "1")
+
+    # POST /chat/batch: requests per batch and sessions processed concurrently
+    chat_batch_max_items: int = int(_env("CHAT_BATCH_MAX_ITEMS", "500") or "500")
+    chat_batch_max_concurrency: int = int(_env("CHAT_BATCH_MAX_CONCURRENCY", "8") or "8")
+
+    # Memoized NLU results (intent + entities) for repeated normalized messages
+    nlu_cache_enabled: bool = (_env("NLU_CACHE_ENABLED", "true") or "true").lower() in {"1", "true", "yes", "y"}
+    nlu_cache_max_entries: int = int(_env("NLU_CACHE_MAX_ENTRIES", "10000") or "10000")
 
     # Entity extraction
     spacy_model_path: str | None = _env("SPACY_MODEL_PATH", None)
 
     # Session memory
     memory_ttl_seconds: int = int(_env("MEMORY_TTL_SECONDS", "3600") or "3600")
-    memory_max_sessions: int = int(_env("MEMORY_MAX_SESSIONS", "5000") or "5000")
+    # In-process sessions are bounded by estimated resident bytes (0 = no byte budget) and, optionally,
+    # by count (0 = no count cap under a byte budget; 5000 sessions without one)
+    memory_max_bytes: int = int(_env("MEMORY_MAX_BYTES", str(256 * 1024 * 1024)) or str(256 * 1024 * 1024))
+    memory_max_sessions: int = int(_env("MEMORY_MAX_SESSIONS", "0") or "0")
+    # "memory" (per process) or "redis" (shared by every worker/replica; in-process cache kept as L1)
+    memory_backend: str = (_env("MEMORY_BACKEND", "memory") or "memory").lower()
+    memory_redis_url: str = _env("MEMORY_REDIS_URL", "redis://127.0.0.1:6379/0") or "redis://127.0.0.1:6379/0"
+    memory_redis_key_prefix: str = _env("MEMORY_REDIS_KEY_PREFIX", "tnea:session:") or "tnea:session:"
+    memory_redis_timeout_ms: int = int(_env("MEMORY_REDIS_TIMEOUT_MS", "250") or "250")
+    memory_redis_pool_size: int = int(_env("MEMORY_REDIS_POOL_SIZE", "4") or "4")
 
     # Behavior toggles
     enable_debug: bool = (_env("DEBUG", "false") or "false").lower() in {"1", "true", "yes", "y"}
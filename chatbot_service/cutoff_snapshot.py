@@ -0,0 +1,356 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single-writer deployments only
+    fcntl = None  # type: ignore[assignment]
+
+from config import settings
+from integration_layer import TneaApiClient
+from utils import canon_branch, normalize_whitespace
+
+
+# Cutoff-history records carry one cutoff column per reservation group
+CUTOFF_FIELDS = ("generalCutoff", "obcCutoff", "scCutoff", "stCutoff")
+CATEGORY_COLUMNS = {"OC": 0, "BC": 1, "BCM": 1, "MBC": 1, "SC": 2, "SCA": 2, "ST": 3}
+
+_ARRAYS = ("college_ids", "branch_ids", "years", "rounds", "cutoffs")
+
+
+def _college_key(name: Any) -> str:
+    return normalize_whitespace(str(name)).lower()
+
+
+def _branch_key(name: Any) -> str:
+    text = normalize_whitespace(str(name))
+    return (canon_branch(text) or text).lower()
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _version_stamp(entry: str) -> float:
+    """Millisecond timestamp of a `snapshot-<ms>-<pid>` directory name (inf for anything else)."""
+    parts = entry.split("-")
+    if len(parts) != 3 or parts[0] != "snapshot":
+        return float("inf")
+    try:
+        return int(parts[1])
+    except ValueError:
+        return float("inf")
+
+
+def _read_pointer(pointer: str) -> str | None:
+    try:
+        with open(pointer, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def _pointer_lock(directory: str) -> Iterator[None]:
+    """Serialize `CURRENT` updates (and pruning) between processes sharing `directory`."""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, "CURRENT.lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class CutoffSnapshot:
+    """
+    Immutable, columnar copy of the cutoff-history table.
+    - Rows are sorted by (college, branch, year, round); names are interned to int32 codes
+    - Cutoffs are a float32 (rows x 4) matrix, one column per reservation group, NaN when missing
+    - (college, branch) -> row slice index makes lookups a dict hit plus a tiny array scan
+    Arrays can be saved to disk and memory-mapped back, so workers share pages and start warm.
+    """
+
+    def __init__(
+        self,
+        colleges: list[str],
+        branches: list[str],
+        college_ids: np.ndarray,
+        branch_ids: np.ndarray,
+        years: np.ndarray,
+        rounds: np.ndarray,
+        cutoffs: np.ndarray,
+        fetched_at: float,
+    ):
+        self.colleges = colleges
+        self.branches = branches
+        self.college_ids = college_ids
+        self.branch_ids = branch_ids
+        self.years = years
+        self.rounds = rounds
+        self.cutoffs = cutoffs
+        self.fetched_at = fetched_at
+        self._college_index = {name: i for i, name in enumerate(colleges)}
+        self._branch_index = {name: i for i, name in enumerate(branches)}
+        self._slices = self._build_slices()
+
+    def _build_slices(self) -> dict[tuple[int, int], tuple[int, int]]:
+        n = len(self.years)
+        if n == 0:
+            return {}
+        keys = self.college_ids.astype(np.int64) * max(1, len(self.branches)) + self.branch_ids
+        bounds = np.flatnonzero(np.diff(keys)) + 1
+        starts = np.concatenate(([0], bounds))
+        stops = np.concatenate((bounds, [n]))
+        return {
+            (int(self.college_ids[s]), int(self.branch_ids[s])): (int(s), int(e)) for s, e in zip(starts, stops)
+        }
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict[str, Any]], fetched_at: float | None = None) -> "CutoffSnapshot":
+        colleges: dict[str, int] = {}
+        branches: dict[str, int] = {}
+        college_ids: list[int] = []
+        branch_ids: list[int] = []
+        years: list[int] = []
+        rounds: list[int] = []
+        cutoffs: list[tuple[float, ...]] = []
+        for rec in records:
+            if not isinstance(rec, dict) or not rec.get("collegeName") or not rec.get("branchName"):
+                continue
+            try:
+                year = int(rec.get("year"))
+            except (TypeError, ValueError):
+                continue
+            college_ids.append(colleges.setdefault(_college_key(rec["collegeName"]), len(colleges)))
+            branch_ids.append(branches.setdefault(_branch_key(rec["branchName"]), len(branches)))
+            years.append(year)
+            try:
+                rounds.append(int(rec.get("round") or 0))
+            except (TypeError, ValueError):
+                rounds.append(0)
+            cutoffs.append(tuple(_as_float(rec.get(f)) for f in CUTOFF_FIELDS))
+
+        c = np.asarray(college_ids, dtype=np.int32)
+        b = np.asarray(branch_ids, dtype=np.int32)
+        y = np.asarray(years, dtype=np.int16)
+        r = np.asarray(rounds, dtype=np.int8)
+        v = np.asarray(cutoffs, dtype=np.float32).reshape(-1, len(CUTOFF_FIELDS))
+        order = np.lexsort((r, y, b, c))
+        return cls(
+            colleges=list(colleges),
+            branches=list(branches),
+            college_ids=c[order],
+            branch_ids=b[order],
+            years=y[order],
+            rounds=r[order],
+            cutoffs=v[order],
+            fetched_at=time.time() if fetched_at is None else fetched_at,
+        )
+
+    def __len__(self) -> int:
+        return len(self.years)
+
+    def age_seconds(self) -> float:
+        return max(0.0, time.time() - self.fetched_at)
+
+    def last_cutoff(self, college: str, branch: str, category: str | None = None, year: int | None = None) -> float | None:
+        """Latest (or given year's) final-round cutoff for a college/branch/category, falling back to the general column."""
+        c = self._college_index.get(_college_key(college))
+        b = self._branch_index.get(_branch_key(branch))
+        span = self._slices.get((c, b)) if c is not None and b is not None else None
+        if span is None:
+            return None
+        start, stop = span
+        col = CATEGORY_COLUMNS.get((category or "OC").upper(), 0)
+        for column in dict.fromkeys((col, 0)):
+            values = self.cutoffs[start:stop, column]
+            valid = ~np.isnan(values)
+            if year is not None:
+                valid &= self.years[start:stop] == year
+            idx = np.flatnonzero(valid)
+            if idx.size:
+                return float(values[idx[-1]])
+        return None
+
+    def save(self, directory: str) -> bool:
+        """
+        Write a new snapshot version under `directory` and atomically point `CURRENT` at it, unless
+        another worker already published a newer one. Returns whether `CURRENT` now names this version.
+        """
+        os.makedirs(directory, exist_ok=True)
+        stamp = int(self.fetched_at * 1000)
+        version = f"snapshot-{stamp}-{os.getpid()}"
+        target = os.path.join(directory, version)
+        os.makedirs(target, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(target, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(target, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"colleges": self.colleges, "branches": self.branches, "fetched_at": self.fetched_at}, f)
+
+        pointer = os.path.join(directory, "CURRENT")
+        with _pointer_lock(directory):
+            current = _read_pointer(pointer)
+            # never move the pointer back to an older refresh that happened to finish last
+            advanced = current is None or stamp > _version_stamp(current)
+            if advanced:
+                tmp = f"{pointer}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(version)
+                os.replace(tmp, pointer)
+                current = version
+            # prune relative to what CURRENT names now (this version may itself be the outdated one)
+            newest = _version_stamp(current)
+            for entry in os.listdir(directory):
+                if _version_stamp(entry) < newest:
+                    shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+        return advanced
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "CutoffSnapshot | None":
+        for attempt in range(2):
+            version = _read_pointer(os.path.join(directory, "CURRENT"))
+            if version is None:
+                return None
+            target = os.path.join(directory, version)
+            try:
+                with open(os.path.join(target, "meta.json"), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                arrays = {
+                    name: np.load(os.path.join(target, f"{name}.npy"), mmap_mode="r" if mmap else None)
+                    for name in _ARRAYS
+                }
+            except FileNotFoundError:
+                # a newer version was published and this one pruned between reading CURRENT and opening it
+                if attempt:
+                    raise
+                continue
+            return cls(
+                colleges=meta["colleges"], branches=meta["branches"], fetched_at=float(meta["fetched_at"]), **arrays
+            )
+        return None
+
+
+def _service_headers() -> dict[str, str] | None:
+    """Credentials for the background refresh (it has no user request to forward them from)."""
+    headers: dict[str, str] = {}
+    if settings.tnea_service_cookie:
+        headers["cookie"] = settings.tnea_service_cookie
+    if settings.tnea_service_authorization:
+        headers["authorization"] = settings.tnea_service_authorization
+    return headers or None
+
+
+class CutoffSnapshotStore:
+    """
+    Keeps the current `CutoffSnapshot` fresh by reloading it from the cutoff-history endpoint
+    in the background. A refresh builds a complete new snapshot and swaps the reference, so
+    readers never observe a half-built table.
+    """
+
+    def __init__(
+        self,
+        api_client: TneaApiClient,
+        refresh_seconds: float | None = None,
+        max_age_seconds: float | None = None,
+        directory: str | None = None,
+    ):
+        self.api = api_client
+        self.refresh_seconds = refresh_seconds if refresh_seconds is not None else settings.cutoff_snapshot_refresh_seconds
+        self.max_age_seconds = max_age_seconds if max_age_seconds is not None else settings.cutoff_snapshot_max_age_seconds
+        self.directory = directory if directory is not None else settings.cutoff_snapshot_dir
+        self._snapshot: CutoffSnapshot | None = None
+        self._task: asyncio.Task[None] | None = None
+        self.refreshes = 0
+        self.failures = 0
+        self.last_error: str | None = None
+        self.last_status: int | None = None
+        if self.directory:
+            try:
+                self._snapshot = CutoffSnapshot.load(self.directory)
+            except Exception as e:
+                self.last_error = f"could not load snapshot from disk: {e}"
+
+    def current(self) -> CutoffSnapshot | None:
+        """The current snapshot, or None when none is loaded or it is older than `max_age_seconds`."""
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.age_seconds() > self.max_age_seconds:
+            return None
+        return snapshot
+
+    async def refresh(self) -> bool:
+        headers = _service_headers()
+        # straight to the backend: a cached or stale-if-error answer must not pass for a fresh table
+        res = await self.api.cutoff_history(params=None, headers=headers, cached=False)
+        self.last_status = res.status_code
+        if res.status_code in {401, 403}:
+            self.failures += 1
+            self.last_error = (
+                f"cutoff-history refresh rejected (HTTP {res.status_code}): the backend's /api routes need a "
+                "logged-in session; set TNEA_SERVICE_COOKIE to a service account's session cookie"
+                + ("" if headers else " (no service credentials are configured)")
+            )
+            return False
+        if not res.ok or res.stale or not isinstance(res.data, list):
+            self.failures += 1
+            self.last_error = res.error or "unexpected cutoff-history payload"
+            return False
+        snapshot = await asyncio.to_thread(self._build, res.data, res.fetched_at)
+        self._snapshot = snapshot
+        self.refreshes += 1
+        self.last_error = None
+        return True
+
+    def _build(self, records: list[dict[str, Any]], fetched_at: float | None = None) -> CutoffSnapshot:
+        snapshot = CutoffSnapshot.from_records(records, fetched_at=fetched_at)
+        if self.directory:
+            snapshot.save(self.directory)
+        return snapshot
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "rows": len(snapshot) if snapshot is not None else 0,
+            "age_seconds": round(snapshot.age_seconds(), 1) if snapshot is not None else None,
+            "stale": self.current() is None,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last_status": self.last_status,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import time
+
+from config import settings
+
+
+class Deadline:
+    """
+    Absolute latency budget for one chat turn, shared by every stage that handles it.
+    Stages ask `remaining()` before doing work and skip optional work via `allows()`.
+    """
+
+    def __init__(self, budget_seconds: float):
+        self.budget_seconds = max(0.0, budget_seconds)
+        self.expires_at = time.monotonic() + self.budget_seconds
+
+    @classmethod
+    def from_header(cls, value: str | None) -> "Deadline":
+        """Budget from an `X-Latency-Budget-Ms` header; callers may tighten but never exceed the configured default."""
+        budget_ms = settings.chat_latency_budget_ms
+        if value:
+            try:
+                budget_ms = min(budget_ms, max(1, int(float(value))))
+            except ValueError:
+                pass
+        return cls(budget_ms / 1000.0)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def allows(self, seconds: float) -> bool:
+        return self.remaining() >= seconds
+
+    def allows_optional_work(self) -> bool:
+        return self.allows(settings.optional_work_min_budget_ms / 1000.0)
@@ -1,10 +1,19 @@
 from __future__ import annotations
 
-from typing import Any
+import asyncio
+import hashlib
+import re
+import secrets
+from typing import Any, Awaitable, Callable
 
-from integration_layer import TneaApiClient
-from memory_store import MemoryStore
-from ner_model.entity_extractor import EntityExtractor
+from cutoff_snapshot import CutoffSnapshot, CutoffSnapshotStore
+from config import settings
+from deadline import Deadline
+from executors import InferenceExecutor
+from integration_layer import IntegrationResult, TneaApiClient, canonical_json, fan_out
+from memory_store import MemoryStore, RankedResults, SessionState
+from ner_model.entity_extractor import EntityExtractor, ExtractedEntities
+from nlu_cache import NluCache
 from response_generator import (
     generate_college_recommendation_response,
     generate_faq_response,
@@ -12,11 +21,303 @@ from response_generator import (
 from utils import canon_branch, canon_category, canon_location, suggest_branches
 
 
+# Streaming hook: `await progress(event, data)` as a turn advances. Every turn emits "nlu" first, then
+# either "clarification" or "progress" (+ "result" rows for recommendation lists, including paged ones).
+# "result" rows go out as soon as the ranked list arrives, before optional label/history enrichment.
+Progress = Callable[[str, dict[str, Any]], Awaitable[None]]
+
+
+async def _emit(progress: Progress | None, event: str, data: dict[str, Any]) -> None:
+    if progress is not None:
+        await progress(event, data)
+
+
+def _last_year_cutoff(hist: IntegrationResult) -> float | None:
+    if not (hist.ok and isinstance(hist.data, list) and hist.data):
+        return None
+    # best-effort: take first record’s generalCutoff if present
+    first = hist.data[0]
+    try:
+        return float(first.get("generalCutoff")) if first.get("generalCutoff") is not None else None
+    except Exception:
+        return None
+
+
+SHOW_MORE_RE = re.compile(
+    r"\b(?:show|see|load|give me|list)\s+(?:me\s+)?more\b|\bnext\s+(?:page|colleges|results)\b|\bmore\s+(?:colleges|results|options)\b",
+    re.I,
+)
+
+
+# Words that may surround a bare paging phrase ("ok, show more colleges please")
+_PAGING_FILLER = frozenset(
+    "please pls plz ok okay yes sure can could would you u the some a few of them those these colleges results "
+    "options more thanks thank".split()
+)
+
+
+def _asks_for_next_page(message: str, intent: str) -> bool:
+    """
+    "Show more" paging: the recommendation intent with a paging phrase, or a message that is
+    essentially only the paging phrase. "show me more documents" keeps its own intent.
+    """
+    match = SHOW_MORE_RE.search(message)
+    if match is None:
+        return False
+    if intent == "college_recommendation":
+        return True
+    rest = (message[: match.start()] + " " + message[match.end() :]).lower()
+    return all(word in _PAGING_FILLER for word in re.findall(r"[a-z]+", rest))
+
+
+def _names_search_criteria(ents: ExtractedEntities) -> bool:
+    """Whether the message states cutoff, category, branch or location (so it starts a new search)."""
+    return any(v is not None for v in (ents.cutoff_score, ents.category, ents.branch, ents.district))
+
+
+def _make_cursor(set_id: str, offset: int) -> str:
+    return f"{set_id}.{offset}"
+
+
+def _parse_cursor(cursor: str | None) -> tuple[str, int] | None:
+    if not cursor:
+        return None
+    set_id, _, offset = cursor.rpartition(".")
+    if not set_id or not offset.isdigit():
+        return None
+    return set_id, int(offset)
+
+
+def _effective_entities(state: SessionState, ents: ExtractedEntities) -> dict[str, Any]:
+    return {
+        # Follow the API spec naming expected by the frontend/chat UI
+        "cutoff": state.cutoff_score,
+        "category": state.category,
+        "branch": state.preferred_branch,
+        "location": state.location,
+        "college_name": ents.college_name,
+        "college_type": ents.college_type,
+        "round_number": ents.round_number,
+        "gender_quota": state.gender_quota,
+        "first_graduate_quota": state.first_graduate_quota,
+    }
+
+
+def _recommendation_payload(effective: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "cutoff": float(effective["cutoff"]),
+        "category": canon_category(effective["category"]),
+        "branch": canon_branch(effective["branch"]) if effective["branch"] else None,
+        "location": canon_location(effective["location"]) if effective["location"] else None,
+        "gender_quota": effective["gender_quota"],
+        "first_graduate_quota": effective["first_graduate_quota"],
+        "round": effective["round_number"],
+        "college_type": effective["college_type"],
+    }
+
+
+def _recommendation_rows(rec: IntegrationResult) -> list[dict[str, Any]]:
+    data = rec.data or {}
+    rows = data.get("results") if isinstance(data, dict) else None
+    if rows is None:
+        # accept array response
+        rows = data if isinstance(data, list) else []
+    return rows
+
+
+def _with_snapshot_cutoffs(
+    recommendations: list[dict[str, Any]], snapshot: CutoffSnapshot, category: str | None, branch: str | None
+) -> list[dict[str, Any]]:
+    out: list[dict[str, Any]] = []
+    for rec in recommendations:
+        if not isinstance(rec, dict) or rec.get("last_year_cutoff") is not None:
+            out.append(rec)
+            continue
+        college = rec.get("college") or rec.get("name") or rec.get("collegeName")
+        rec_branch = rec.get("branch") or rec.get("branchName") or branch
+        cutoff = snapshot.last_cutoff(college, rec_branch, category) if college and rec_branch else None
+        out.append({**rec, "last_year_cutoff": cutoff} if cutoff is not None else rec)
+    return out
+
+
 class DecisionEngine:
-    def __init__(self, memory: MemoryStore, extractor: EntityExtractor, api_client: TneaApiClient):
+    def __init__(
+        self,
+        memory: MemoryStore,
+        extractor: EntityExtractor,
+        api_client: TneaApiClient,
+        cutoff_snapshot: CutoffSnapshotStore | None = None,
+        inference: InferenceExecutor | None = None,
+        nlu_cache: NluCache | None = None,
+    ):
         self.memory = memory
         self.extractor = extractor
         self.api = api_client
+        self.cutoff_snapshot = cutoff_snapshot
+        self.inference = inference
+        self.nlu_cache = nlu_cache
+        # Speculative recommendation prefetch, one task per session key
+        self._prefetches: dict[str, asyncio.Task[None]] = {}
+        self.prefetch_started = 0
+        self.prefetch_skipped = 0
+        self.memory.add_expiry_listener(self._cancel_prefetch)
+
+    async def _extract(self, message: str) -> ExtractedEntities:
+        async def compute() -> ExtractedEntities:
+            if self.inference is not None:
+                return await self.inference.run("ner", "extract", message)
+            return self.extractor.extract(message)
+
+        if self.nlu_cache is None:
+            return await compute()
+        version = self.inference.version("ner") if self.inference is not None else "ner@0:builtin"
+        return await self.nlu_cache.get_or_compute("entities", "ner", version, message, compute)
+
+    def _maybe_prefetch(
+        self,
+        session_key: str,
+        state: Any,
+        effective: dict[str, Any],
+        downstream_headers: dict[str, str] | None,
+    ) -> None:
+        """
+        Once cutoff and category are known, the next turn is most likely a recommendation.
+        Warm the response cache for it in the background (the follow-up turn then hits the
+        cache, or joins the still in-flight request).
+        """
+        if not settings.prefetch_enabled or self.api.cache is None:
+            return
+        if effective["cutoff"] is None or effective["category"] is None:
+            return
+        # the follow-up is most likely a plain "recommend colleges" without round/type filters
+        payload = _recommendation_payload({**effective, "round_number": None, "college_type": None})
+        # a short digest, not the payload itself: it is kept in every session
+        marker = hashlib.blake2b(canonical_json(payload).encode("utf-8"), digest_size=8).hexdigest()
+        if (state.extras or {}).get("prefetched_payload") == marker or session_key in self._prefetches:
+            return
+        if len(self._prefetches) >= settings.prefetch_max_concurrency:
+            self.prefetch_skipped += 1
+            return
+
+        state.extras = {**(state.extras or {}), "prefetched_payload": marker}
+        self.prefetch_started += 1
+        task = asyncio.ensure_future(self.api.recommend_colleges(payload, headers=downstream_headers))
+        self._prefetches[session_key] = task
+        task.add_done_callback(lambda t: self._prefetch_done(session_key, t))
+
+    def _prefetch_done(self, session_key: str, task: asyncio.Task[Any]) -> None:
+        if self._prefetches.get(session_key) is task:
+            del self._prefetches[session_key]
+        if not task.cancelled():
+            task.exception()  # retrieve, so a failed prefetch never logs "exception was never retrieved"
+
+    def _cancel_prefetch(self, session_key: str) -> None:
+        task = self._prefetches.pop(session_key, None)
+        if task is not None:
+            task.cancel()
+
+    def prefetch_stats(self) -> dict[str, int]:
+        return {"in_flight": len(self._prefetches), "started": self.prefetch_started, "skipped": self.prefetch_skipped}
+
+    async def aclose(self) -> None:
+        tasks = list(self._prefetches.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+
+    async def _attach_std_labels(
+        self,
+        recommendations: list[dict[str, Any]],
+        payload: dict[str, Any],
+        omitted: list[str],
+        downstream_headers: dict[str, str] | None,
+        deadline: Deadline | None,
+    ) -> list[dict[str, Any]]:
+        """Label every unlabelled row with one batched Safe/Target/Dream call (optional work)."""
+        pending = [i for i, rec in enumerate(recommendations) if isinstance(rec, dict) and not rec.get("classification")]
+        if not pending:
+            return recommendations
+        if deadline is not None and not deadline.allows_optional_work():
+            omitted.append("safe_target_dream_labels")
+            return recommendations
+
+        items = []
+        for i in pending:
+            rec = recommendations[i]
+            items.append(
+                {
+                    "college": rec.get("college") or rec.get("name") or rec.get("collegeName"),
+                    "branch": rec.get("branch") or rec.get("branchName") or payload.get("branch"),
+                }
+            )
+        entities = {"cutoff": payload["cutoff"], "category": payload["category"]}
+        out = await fan_out(
+            {"labels": self.api.safe_target_dream_batch(items, entities, headers=downstream_headers, deadline=deadline)},
+            optional={"labels"},
+            deadline=deadline,
+        )
+        res = out["labels"]
+        if not res.ok:
+            omitted.append("safe_target_dream_labels")
+            return recommendations
+
+        labelled = list(recommendations)
+        for i, label in zip(pending, (res.data or {}).get("labels", [])):
+            if label:
+                labelled[i] = {**labelled[i], "classification": label}
+        return labelled
+
+    def _page(self, state: SessionState, ranked: RankedResults, offset: int, intent_confidence: float) -> dict[str, Any]:
+        """Serve one page of the session's stored recommendation list (no downstream call)."""
+        size = max(1, settings.results_page_size)
+        results = ranked.page(offset, size)
+        ranked.next_offset = offset + len(results)
+        more = ranked.next_offset < len(ranked.rows)
+        if results:
+            text = f"Here are more colleges ({offset + 1}–{ranked.next_offset} of {len(ranked.rows)})."
+        else:
+            text = "That’s the full list I have. Share a different branch or location to explore more colleges."
+        if more:
+            text += " Say “show more” to see the next ones."
+        return {
+            "intent": "college_recommendation",
+            "confidence": float(intent_confidence),
+            "entities": _effective_entities(state, ExtractedEntities()),
+            "results": results,
+            "response_text": text,
+            "next_cursor": _make_cursor(ranked.set_id, ranked.next_offset) if more else None,
+        }
+
+    def _follow_up_page(
+        self,
+        state: SessionState,
+        message: str,
+        cursor: str | None,
+        intent: str,
+        intent_confidence: float,
+        ents: ExtractedEntities,
+    ) -> dict[str, Any] | None:
+        ranked = state.ranked_results
+        if ranked is None:
+            return None
+        parsed = _parse_cursor(cursor)
+        if parsed is not None:
+            set_id, offset = parsed
+            if set_id != ranked.set_id:
+                return None  # cursor from an older result set: handle the message normally
+        elif (
+            _asks_for_next_page(message, intent)
+            and not _names_search_criteria(ents)
+            and ranked.next_offset < len(ranked.rows)
+        ):
+            # "recommend more colleges for 185 MBC" is a new search, not the next page
+            offset = ranked.next_offset
+        else:
+            return None
+        page = self._page(state, ranked, offset, intent_confidence)
+        self.memory.apply(state, ranked_results=ranked)
+        return page
 
     async def handle(
         self,
@@ -28,15 +329,67 @@ class DecisionEngine:
         intent_confidence: float,
         language: str = "en",
         downstream_headers: dict[str, str] | None = None,
+        deadline: Deadline | None = None,
+        cursor: str | None = None,
+        entities: ExtractedEntities | None = None,
+        progress: Progress | None = None,
     ) -> dict[str, Any]:
-        # Extract entities from message and merge with memory
-        ents = self.extractor.extract(message)
-        state = self.memory.get(user_id, session_id)
+        # Loaded every turn, so a change made through another worker or endpoint is never overwritten
+        state = await self.memory.load(user_id, session_id)
+        result = await self._turn(
+            state,
+            user_id=user_id,
+            session_id=session_id,
+            message=message,
+            intent=intent,
+            intent_confidence=intent_confidence,
+            language=language,
+            downstream_headers=downstream_headers,
+            deadline=deadline,
+            cursor=cursor,
+            entities=entities,
+            progress=progress,
+        )
+        await self.memory.persist(user_id, session_id, state)
+        return result
+
+    async def _turn(
+        self,
+        state: SessionState,
+        *,
+        user_id: str,
+        session_id: str | None,
+        message: str,
+        intent: str,
+        intent_confidence: float,
+        language: str,
+        downstream_headers: dict[str, str] | None,
+        deadline: Deadline | None,
+        cursor: str | None,
+        entities: ExtractedEntities | None,
+        progress: Progress | None,
+    ) -> dict[str, Any]:
+        # Extract entities from message (precomputed for batches; memoized; off the event loop)
+        ents = entities if entities is not None else await self._extract(message)
+
+        # "show more" / explicit cursor: page through the stored list without re-running the pipeline
+        page = self._follow_up_page(state, message, cursor, intent, intent_confidence, ents)
+        if page is not None:
+            await _emit(
+                progress,
+                "nlu",
+                {"intent": page["intent"], "confidence": page["confidence"], "entities": page["entities"]},
+            )
+            await _emit(progress, "progress", {"stage": "recommendations", "message": "Showing more colleges…"})
+            ranked = state.ranked_results
+            first_rank = (ranked.next_offset if ranked is not None else 0) - len(page["results"]) + 1
+            for rank, row in enumerate(page["results"], start=first_rank):
+                await _emit(progress, "result", {"rank": rank, "row": row})
+            return page
 
         # Update memory (only when new info exists)
-        self.memory.update(
-            user_id,
-            session_id,
+        self.memory.apply(
+            state,
             cutoff_score=ents.cutoff_score,
             category=ents.category,
             preferred_branch=ents.branch,
@@ -45,58 +398,69 @@ class DecisionEngine:
             first_graduate_quota=ents.first_graduate_quota,
             last_intent=intent,
         )
-        state = self.memory.get(user_id, session_id)
 
         # Build “effective” entities from message+memory
-        effective = {
-            # Follow the API spec naming expected by the frontend/chat UI
-            "cutoff": state.cutoff_score,
-            "category": state.category,
-            "branch": state.preferred_branch,
-            "location": state.location,
-            "college_name": ents.college_name,
-            "college_type": ents.college_type,
-            "round_number": ents.round_number,
-            "gender_quota": state.gender_quota,
-            "first_graduate_quota": state.first_graduate_quota,
-        }
+        effective = _effective_entities(state, ents)
+        await _emit(progress, "nlu", {"intent": intent, "confidence": float(intent_confidence), "entities": effective})
+
+        if intent != "college_recommendation":
+            self._maybe_prefetch(self.memory.key(user_id, session_id), state, effective, downstream_headers)
 
         # Validation and clarification
         if effective["branch"] is not None and canon_branch(str(effective["branch"])) is None:
+            response_text = "I couldn’t recognize that branch. Try one of these: " + ", ".join(suggest_branches()) + "."
+            await _emit(progress, "clarification", {"response_text": response_text})
             return {
                 "intent": "fallback_unknown",
                 "confidence": float(intent_confidence),
                 "entities": effective,
                 "results": [],
-                "response_text": (
-                    "I couldn’t recognize that branch. Try one of these: "
-                    + ", ".join(suggest_branches())
-                    + "."
-                ),
+                "response_text": response_text,
             }
 
         if intent == "college_recommendation":
             if effective["cutoff"] is None or effective["category"] is None:
+                response_text = "Could you please provide your cutoff score and community category (OC/BC/BCM/MBC/SC/ST/SCA)?"
+                await _emit(progress, "clarification", {"response_text": response_text})
                 return {
                     "intent": intent,
                     "confidence": float(intent_confidence),
                     "entities": effective,
                     "results": [],
-                    "response_text": "Could you please provide your cutoff score and community category (OC/BC/BCM/MBC/SC/ST/SCA)?",
+                    "response_text": response_text,
                 }
 
-            payload = {
-                "cutoff": float(effective["cutoff"]),
-                "category": canon_category(effective["category"]),
-                "branch": canon_branch(effective["branch"]) if effective["branch"] else None,
-                "location": canon_location(effective["location"]) if effective["location"] else None,
-                "gender_quota": effective["gender_quota"],
-                "first_graduate_quota": effective["first_graduate_quota"],
-                "round": effective["round_number"],
-                "college_type": effective["college_type"],
-            }
+            payload = _recommendation_payload(effective)
+            await _emit(progress, "progress", {"stage": "recommendations", "message": "Finding colleges that match your profile…"})
 
-            rec = await self.api.recommend_colleges(payload, headers=downstream_headers)
+            # Last-year cutoffs come from the local snapshot when one is loaded. Otherwise the history
+            # lookup runs concurrently with the recommendations; it is optional and is skipped (and
+            # reported as omitted) when the turn's latency budget runs low.
+            snapshot = self.cutoff_snapshot.current() if self.cutoff_snapshot is not None else None
+
+            async def recommend() -> IntegrationResult:
+                res = await self.api.recommend_colleges(payload, headers=downstream_headers, deadline=deadline)
+                if res.ok and progress is not None:
+                    # stream the ranked first page now, while the history/label calls are still running
+                    rows = _recommendation_rows(res)
+                    if snapshot is not None:
+                        rows = _with_snapshot_cutoffs(rows, snapshot, payload["category"], payload["branch"])
+                    preview = generate_college_recommendation_response(
+                        cutoff_score=float(effective["cutoff"]),
+                        category=str(effective["category"]),
+                        branch=payload.get("branch"),
+                        location=payload.get("location"),
+                        recommendations=rows[: max(1, settings.results_page_size)],
+                    )
+                    for rank, row in enumerate(preview.results, start=1):
+                        await _emit(progress, "result", {"rank": rank, "row": row})
+                return res
+
+            calls = {"recommendations": recommend()}
+            if snapshot is None and (deadline is None or deadline.allows_optional_work()):
+                calls["history"] = self.api.cutoff_history(params=None, headers=downstream_headers, deadline=deadline)
+            downstream = await fan_out(calls, optional={"history"}, deadline=deadline)
+            rec = downstream["recommendations"]
             if not rec.ok:
                 return {
                     "intent": intent,
@@ -107,22 +471,26 @@ class DecisionEngine:
                     "downstream_error": rec.error,
                 }
 
-            # Optional: attach last year cutoff by calling cutoff history if available
-            last_year_cutoff = None
-            hist = await self.api.cutoff_history(params=None, headers=downstream_headers)
-            if hist.ok and isinstance(hist.data, list) and hist.data:
-                # best-effort: take first record’s generalCutoff if present
-                first = hist.data[0]
-                try:
-                    last_year_cutoff = float(first.get("generalCutoff")) if first.get("generalCutoff") is not None else None
-                except Exception:
-                    last_year_cutoff = None
-
-            data = rec.data or {}
-            recommendations = data.get("results") if isinstance(data, dict) else None
-            if recommendations is None:
-                # accept array response
-                recommendations = data if isinstance(data, list) else []
+            recommendations = _recommendation_rows(rec)
+
+            omitted: list[str] = []
+            if rec.truncated:
+                omitted.append("full_recommendation_list")
+            # With batch labelling off, rows keep downstream or probability-derived labels and nothing is omitted;
+            # "safe_target_dream_labels" is only reported when an enabled batch call is skipped or fails
+            if settings.safe_target_dream_batch_labels and recommendations:
+                recommendations = await self._attach_std_labels(
+                    recommendations, payload, omitted, downstream_headers, deadline
+                )
+            if snapshot is not None:
+                recommendations = _with_snapshot_cutoffs(recommendations or [], snapshot, payload["category"], payload["branch"])
+                # each row carries its own cutoff; a single "vs last year" figure would only describe the top row
+                last_year_cutoff = None
+            else:
+                hist = downstream.get("history")
+                if hist is None or not hist.ok:
+                    omitted.append("last_year_cutoff")
+                last_year_cutoff = _last_year_cutoff(hist) if hist is not None else None
 
             gen = generate_college_recommendation_response(
                 cutoff_score=float(effective["cutoff"]),
@@ -132,23 +500,37 @@ class DecisionEngine:
                 recommendations=recommendations or [],
                 last_year_cutoff=last_year_cutoff,
             )
+            response_text = gen.response_text
+            if rec.stale and rec.error:
+                response_text += " (The recommendation engine is busy right now, so these are recently cached results.)"
+
+            # Keep the ranked list in the session; only the first page goes out now
+            ranked = RankedResults.from_results(secrets.token_urlsafe(6), gen.results, settings.session_results_max_rows)
+            first = self._page(state, ranked, 0, intent_confidence)
+            self.memory.apply(state, ranked_results=ranked)
+            if first["next_cursor"]:
+                response_text += " Say “show more” to see more colleges."
             return {
                 "intent": intent,
                 "confidence": float(intent_confidence),
                 "entities": effective,
-                "results": gen.results,
-                "response_text": gen.response_text,
+                "results": first["results"],
+                "response_text": response_text,
+                "omitted": omitted,
+                "next_cursor": first["next_cursor"],
             }
 
         if intent == "cutoff_prediction":
             # For cutoff prediction we need a marks/cutoff input; reuse cutoff_score as marks if user uses “cutoff”
             if effective["cutoff"] is None or effective["category"] is None:
+                response_text = "Please share your cutoff/marks and category, and (if possible) the college + branch you want to predict for."
+                await _emit(progress, "clarification", {"response_text": response_text})
                 return {
                     "intent": intent,
                     "confidence": float(intent_confidence),
                     "entities": effective,
                     "results": [],
-                    "response_text": "Please share your cutoff/marks and category, and (if possible) the college + branch you want to predict for.",
+                    "response_text": response_text,
                 }
             payload = {
                 "marks": float(effective["cutoff"]),
@@ -156,7 +538,8 @@ class DecisionEngine:
                 "collegeId": None,
                 "branchId": None,
             }
-            pred = await self.api.predict_cutoff(payload, headers=downstream_headers)
+            await _emit(progress, "progress", {"stage": "cutoff_prediction", "message": "Predicting the cutoff…"})
+            pred = await self.api.predict_cutoff(payload, headers=downstream_headers, deadline=deadline)
             if not pred.ok:
                 return {
                     "intent": intent,
@@ -185,14 +568,17 @@ class DecisionEngine:
 
         if intent == "college_comparison":
             if not ents.college_name:
+                response_text = "Which two colleges do you want to compare? (Example: “Compare PSG Tech vs SSN”)"
+                await _emit(progress, "clarification", {"response_text": response_text})
                 return {
                     "intent": intent,
                     "confidence": float(intent_confidence),
                     "entities": effective,
                     "results": [],
-                    "response_text": "Which two colleges do you want to compare? (Example: “Compare PSG Tech vs SSN”)",
+                    "response_text": response_text,
                 }
-            cmp_res = await self.api.compare_colleges({"query": message}, headers=downstream_headers)
+            await _emit(progress, "progress", {"stage": "comparison", "message": "Comparing the colleges…"})
+            cmp_res = await self.api.compare_colleges({"query": message}, headers=downstream_headers, deadline=deadline)
             if not cmp_res.ok:
                 return {
                     "intent": intent,
@@ -213,14 +599,17 @@ class DecisionEngine:
         if intent == "safe_target_dream_query":
             # Usually derived from recommendation; but allow direct call
             if effective["cutoff"] is None or effective["category"] is None:
+                response_text = "Share your cutoff and category, and the college/branch you’re aiming for, and I’ll classify it as Safe/Target/Dream."
+                await _emit(progress, "clarification", {"response_text": response_text})
                 return {
                     "intent": intent,
                     "confidence": float(intent_confidence),
                     "entities": effective,
                     "results": [],
-                    "response_text": "Share your cutoff and category, and the college/branch you’re aiming for, and I’ll classify it as Safe/Target/Dream.",
+                    "response_text": response_text,
                 }
-            res = await self.api.safe_target_dream({"query": message, "entities": effective}, headers=downstream_headers)
+            await _emit(progress, "progress", {"stage": "safe_target_dream", "message": "Classifying your chances…"})
+            res = await self.api.safe_target_dream({"query": message, "entities": effective}, headers=downstream_headers, deadline=deadline)
             if not res.ok:
                 return {
                     "intent": intent,
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from config import settings
+
+
+MODES = {"inline", "thread", "process"}
+
+InitKwargs = tuple[tuple[str, Any], ...]
+
+# Per-process model instances for the process pool, keyed by (class, constructor arguments, generation)
+_WORKER_OBJECTS: dict[tuple[type, Any, InitKwargs, int], Any] = {}
+
+
+def _worker_call(cls: type, init_arg: Any, init_kwargs: InitKwargs, generation: int, method: str, *args: Any) -> Any:
+    obj = _WORKER_OBJECTS.get((cls, init_arg, init_kwargs, generation))
+    if obj is None:
+        # a newer generation means the model was reloaded: drop this worker's older copies
+        for key in [k for k in _WORKER_OBJECTS if k[:3] == (cls, init_arg, init_kwargs)]:
+            del _WORKER_OBJECTS[key]
+        obj = _WORKER_OBJECTS[(cls, init_arg, init_kwargs, generation)] = cls(init_arg, **dict(init_kwargs))
+    return getattr(obj, method)(*args)
+
+
+def artifact_version(path: Any) -> str:
+    """Cheap fingerprint of a model artifact (file or directory): mtime + size, or "builtin" without one."""
+    if not path:
+        return "builtin"
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "missing"
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def parse_routing(spec: str) -> dict[str, str]:
+    """`"baseline=thread,bert=process"` -> `{"baseline": "thread", "bert": "process"}` (unknown modes are ignored)."""
+    routing: dict[str, str] = {}
+    for part in (spec or "").split(","):
+        name, _, mode = part.partition("=")
+        name, mode = name.strip().lower(), mode.strip().lower()
+        if name and mode in MODES:
+            routing[name] = mode
+    return routing
+
+
+class InferenceExecutor:
+    """
+    Runs CPU-bound NLU work (intent models, entity extraction) off the asyncio event loop.
+    - Each registered backend is routed to "inline", a bounded thread pool, or a process pool
+    - Process workers build their own model instance (class + constructor arguments) on first use
+    - In-flight calls are counted per backend and in total, split into running and queued (waiting for
+      a pool worker). A process-pool call counts as running once it is handed to the worker processes.
+    - `reload()` reloads a backend's model and bumps its version; reload listeners (caches) are notified
+    """
+
+    def __init__(
+        self,
+        routing: dict[str, str] | None = None,
+        thread_workers: int | None = None,
+        process_workers: int | None = None,
+    ):
+        self.routing = routing if routing is not None else parse_routing(settings.inference_routing)
+        self.thread_workers = max(1, thread_workers or settings.inference_thread_workers)
+        self.process_workers = max(1, process_workers or settings.inference_process_workers)
+        self._backends: dict[str, tuple[Any, Any, InitKwargs]] = {}
+        self._threads: ThreadPoolExecutor | None = None
+        self._processes: ProcessPoolExecutor | None = None
+        self._in_flight: dict[str, int] = {}
+        self._jobs: dict[str, set[Future[Any]]] = {}
+        self.completed: dict[str, int] = {}
+        self._generations: dict[str, int] = {}
+        self._versions: dict[str, str] = {}
+        self._reload_listeners: list[Callable[[str], None]] = []
+
+    def register(self, backend: str, obj: Any, init_arg: Any = None, init_kwargs: dict[str, Any] | None = None) -> None:
+        """
+        `obj` serves inline/thread calls; process workers build `type(obj)(init_arg, **init_kwargs)`
+        themselves, so `init_kwargs` must carry every constructor option `obj` was built with.
+        `init_arg` is the model artifact path (it also fingerprints the version).
+        """
+        self._backends[backend] = (obj, init_arg, tuple(sorted((init_kwargs or {}).items())))
+        self._in_flight.setdefault(backend, 0)
+        self._jobs.setdefault(backend, set())
+        self.completed.setdefault(backend, 0)
+        self._generations.setdefault(backend, 0)
+        self._versions[backend] = f"{backend}@{self._generations[backend]}:{artifact_version(init_arg)}"
+
+    def version(self, backend: str) -> str:
+        """`"name@generation:artifact"`; changes whenever the backend's model is reloaded."""
+        return self._versions[backend]
+
+    def add_reload_listener(self, listener: Callable[[str], None]) -> None:
+        self._reload_listeners.append(listener)
+
+    async def reload(self, backend: str) -> None:
+        """Reload a backend's model (its `reload()` runs in a worker thread; process workers rebuild lazily)."""
+        obj, init_arg, _ = self._backends[backend]
+        self._generations[backend] += 1
+        try:
+            if self.mode(backend) != "process" and hasattr(obj, "reload"):
+                await asyncio.to_thread(obj.reload)
+        finally:
+            self._versions[backend] = f"{backend}@{self._generations[backend]}:{artifact_version(init_arg)}"
+            for listener in self._reload_listeners:
+                listener(backend)
+
+    def mode(self, backend: str) -> str:
+        return self.routing.get(backend, "thread")
+
+    def _pool(self, mode: str) -> Executor:
+        if mode == "process":
+            if self._processes is None:
+                # spawn: forking a process that runs an event loop and threads is unsafe
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.process_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._processes
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="inference")
+        return self._threads
+
+    async def run(self, backend: str, method: str, *args: Any) -> Any:
+        obj, init_arg, init_kwargs = self._backends[backend]
+        mode = self.mode(backend)
+        if mode == "inline":
+            return getattr(obj, method)(*args)
+
+        pool = self._pool(mode)
+        if mode == "process":
+            job = pool.submit(
+                _worker_call, type(obj), init_arg, init_kwargs, self._generations[backend], method, *args
+            )
+        else:
+            job = pool.submit(getattr(obj, method), *args)
+        self._in_flight[backend] += 1
+        self._jobs[backend].add(job)
+        try:
+            return await asyncio.wrap_future(job)
+        finally:
+            self._jobs[backend].discard(job)
+            self._in_flight[backend] -= 1
+            self.completed[backend] += 1
+
+    def in_flight(self) -> int:
+        return sum(self._in_flight.values())
+
+    def running(self, backend: str | None = None) -> int:
+        names = [backend] if backend is not None else list(self._jobs)
+        return sum(1 for name in names for job in list(self._jobs[name]) if job.running())
+
+    def queued(self, backend: str | None = None) -> int:
+        """Calls waiting for a pool worker (the pool's queue depth)."""
+        in_flight = self._in_flight[backend] if backend is not None else self.in_flight()
+        return max(0, in_flight - self.running(backend))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "in_flight": self.in_flight(),
+            "queued": self.queued(),
+            "thread_workers": self.thread_workers,
+            "process_workers": self.process_workers,
+            "backends": {
+                name: {
+                    "mode": self.mode(name),
+                    "in_flight": self._in_flight[name],
+                    "queued": self.queued(name),
+                    "completed": self.completed[name],
+                    "version": self._versions[name],
+                }
+                for name in self._backends
+            },
+        }
+
+    def shutdown(self) -> None:
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._threads = None
+        self._processes = None
@@ -1,11 +1,22 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json as jsonlib
+import random
+import time
 from dataclasses import dataclass
-from typing import Any
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Collection
 
 import httpx
 
 from config import settings
+from deadline import Deadline
+from resilience import EndpointResilience
+from response_cache import ResponseCache
+from streaming import read_top_k
+from utils import record_probability
 
 
 @dataclass(frozen=True)
@@ -14,44 +25,463 @@ class IntegrationResult:
     data: dict[str, Any] | None = None
     error: str | None = None
     status_code: int | None = None
+    # served from cache after its TTL (while revalidating, or because the backend errored: see `error`)
+    stale: bool = False
+    # streamed response cut off at `max_response_bytes`; `data` holds the best records read so far
+    truncated: bool = False
+    # epoch seconds the backend produced a live answer (its `Date` header); None for cached answers
+    fetched_at: float | None = None
+
+
+def _response_time(r: httpx.Response) -> float:
+    """When the backend produced `r`, from its `Date` header (local receive time without a usable one)."""
+    try:
+        return parsedate_to_datetime(r.headers["date"]).timestamp()
+    except (KeyError, TypeError, ValueError, IndexError):
+        return time.time()
+
+
+def auth_scope(headers: dict[str, str] | None) -> str:
+    """
+    Stable, non-reversible identifier of the caller credentials forwarded downstream.
+    Requests are only shared (or cached) between callers with the same scope.
+    """
+    if not headers:
+        return "anon"
+    creds = "\n".join(f"{k.lower()}={v}" for k, v in sorted(headers.items()) if k.lower() in {"cookie", "authorization"})
+    if not creds:
+        return "anon"
+    return hashlib.sha256(creds.encode("utf-8")).hexdigest()[:32]
+
+
+def canonical_json(value: Any) -> str:
+    return jsonlib.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _bucket_cutoff(value: dict[str, Any] | None) -> dict[str, Any] | None:
+    """Round cutoff/marks to `cache_cutoff_bucket` so near-identical scores share a cache entry."""
+    bucket = settings.cache_cutoff_bucket
+    if not value or bucket <= 0:
+        return value
+    out = dict(value)
+    for k in ("cutoff", "marks"):
+        v = out.get(k)
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[k] = round(round(v / bucket) * bucket, 4)
+    return out
+
+
+async def fan_out(
+    calls: dict[str, Awaitable[IntegrationResult]],
+    optional: Collection[str] = (),
+    deadline: Deadline | None = None,
+) -> dict[str, IntegrationResult]:
+    """
+    Run independent downstream calls concurrently and return their results by name.
+    - Latency is the slowest required call, not the sum of all calls
+    - Failures are isolated: a call that raises becomes `IntegrationResult(ok=False)` for that name only
+    - Calls named in `optional` are only waited for while the `deadline` still allows optional work;
+      anything still running after that is cancelled and reported as skipped
+    """
+    if not calls:
+        return {}
+    tasks = {name: asyncio.ensure_future(call) for name, call in calls.items()}
+    required = [t for name, t in tasks.items() if name not in optional]
+    try:
+        if required:
+            await asyncio.wait(required)
+        late = [t for t in tasks.values() if not t.done()]
+        if late:
+            if deadline is None:
+                await asyncio.wait(late)
+            else:
+                grace = deadline.remaining() - settings.optional_work_min_budget_ms / 1000.0
+                if grace > 0:
+                    await asyncio.wait(late, timeout=grace)
+    except BaseException:
+        for t in tasks.values():
+            t.cancel()
+        raise
+    late = [t for t in tasks.values() if not t.done()]
+    for t in late:
+        t.cancel()
+    if late:
+        await asyncio.wait(late)
+
+    results: dict[str, IntegrationResult] = {}
+    for name, t in tasks.items():
+        if t.cancelled():
+            results[name] = IntegrationResult(ok=False, error="skipped: latency budget exhausted")
+        elif t.exception() is not None:
+            exc = t.exception()
+            results[name] = IntegrationResult(ok=False, error=str(exc) or type(exc).__name__)
+        else:
+            results[name] = t.result()
+    return results
+
+
+def _batch_labels(result: IntegrationResult, expected: int) -> list[str | None]:
+    """Labels from a batched Safe/Target/Dream answer, aligned with the request items (all None if unusable)."""
+    data: Any = result.data if result.ok else None
+    if isinstance(data, dict):
+        data = data.get("results") or data.get("labels")
+    if not isinstance(data, list) or len(data) != expected:
+        return [None] * expected
+    labels: list[str | None] = []
+    for item in data:
+        if isinstance(item, dict):
+            item = item.get("classification") or item.get("label")
+        labels.append(str(item) if item else None)
+    return labels
+
+
+class _Flight:
+    """One shared in-flight downstream request and the number of callers awaiting it."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task[IntegrationResult]):
+        self.task = task
+        self.waiters = 0
 
 
 class TneaApiClient:
     """
     Internal REST client to your existing ML/model APIs.
     This service must NOT re-implement model logic; it calls your existing endpoints.
+
+    A single `httpx.AsyncClient` (and its connection pool) is shared by all calls.
+    The app lifespan calls `start()` / `aclose()`; outside of it the client is created lazily.
+
+    Identical concurrent requests (same method, path, canonical payload and auth scope) are
+    coalesced: one request goes downstream and every waiter receives its result.
+    Each waiter only waits as long as its own `Deadline` allows; the shared request
+    is cancelled once nobody is waiting for it any more.
+
+    Each endpoint path has its own circuit breaker, retry budget and latency window
+    (see `resilience.py`); `resilience_state()` exposes them for inspection.
+
+    Recommendation, comparison and cutoff-history results are cached per auth scope
+    (see `response_cache.py`) with stale-while-revalidate and stale-if-error serving.
     """
 
-    def __init__(self, base_url: str | None = None, timeout_seconds: float = 15.0):
+    def __init__(
+        self,
+        base_url: str | None = None,
+        timeout_seconds: float | None = None,
+        limits: httpx.Limits | None = None,
+        http2: bool | None = None,
+    ):
         self.base_url = (base_url or settings.tnea_api_base_url).rstrip("/")
-        self.timeout_seconds = timeout_seconds
+        self.timeout_seconds = timeout_seconds if timeout_seconds is not None else settings.tnea_api_timeout_seconds
+        self.limits = limits or httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry_seconds,
+        )
+        self.http2 = settings.http2_enabled if http2 is None else http2
+        self._client: httpx.AsyncClient | None = None
+        self._inflight: dict[str, _Flight] = {}
+        self.coalesced_requests = 0
+        self._endpoints: dict[str, EndpointResilience] = {}
+        self.cache: ResponseCache | None = None
+        if settings.response_cache_enabled:
+            self.cache = ResponseCache(
+                max_entries=settings.response_cache_max_entries,
+                max_bytes=settings.response_cache_max_bytes,
+                stale_seconds=max(settings.cache_stale_while_revalidate_seconds, settings.cache_stale_if_error_seconds),
+            )
+        self._revalidating: dict[str, asyncio.Task[None]] = {}
+
+    async def start(self) -> None:
+        self._http()
 
-    async def _post(self, path: str, json: dict[str, Any], headers: dict[str, str] | None = None) -> IntegrationResult:
-        url = f"{self.base_url}{path}"
+    async def aclose(self) -> None:
+        for task in list(self._revalidating.values()):
+            task.cancel()
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout_seconds,
+                limits=self.limits,
+                http2=self.http2,
+            )
+        return self._client
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        *,
+        json: dict[str, Any] | None = None,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+        deadline: Deadline | None = None,
+        top_k: int | None = None,
+    ) -> IntegrationResult:
+        if deadline is not None and deadline.expired():
+            return IntegrationResult(ok=False, error=f"deadline exceeded before calling {path}")
+
+        key = f"{method} {path} {auth_scope(headers)} " + canonical_json({"json": json, "params": params, "top_k": top_k})
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = self._inflight[key] = _Flight(
+                asyncio.ensure_future(self._send(method, path, json=json, params=params, headers=headers, top_k=top_k))
+            )
+            flight.task.add_done_callback(lambda _, f=flight: self._forget(key, f))
+        else:
+            self.coalesced_requests += 1
+
+        flight.waiters += 1
         try:
-            async with httpx.AsyncClient(timeout=self.timeout_seconds) as client:
-                r = await client.post(url, json=json, headers=headers)
-            if r.status_code >= 400:
-                return IntegrationResult(ok=False, error=r.text, status_code=r.status_code)
-            return IntegrationResult(ok=True, data=r.json(), status_code=r.status_code)
-        except Exception as e:
-            return IntegrationResult(ok=False, error=str(e))
+            # Shielded so one waiter leaving never cancels the request other waiters share
+            if deadline is None:
+                return await asyncio.shield(flight.task)
+            return await asyncio.wait_for(asyncio.shield(flight.task), timeout=deadline.remaining())
+        except asyncio.TimeoutError:
+            return IntegrationResult(ok=False, error=f"deadline exceeded waiting for {path}")
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    async def _cached(
+        self,
+        ttl_seconds: float,
+        method: str,
+        path: str,
+        *,
+        json: dict[str, Any] | None = None,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+        deadline: Deadline | None = None,
+        top_k: int | None = None,
+    ) -> IntegrationResult:
+        cache = self.cache
+        if cache is None or ttl_seconds <= 0:
+            return await self._request(
+                method, path, json=json, params=params, headers=headers, deadline=deadline, top_k=top_k
+            )
+
+        key = f"{method} {path} {auth_scope(headers)} " + canonical_json(
+            {"json": _bucket_cutoff(json), "params": _bucket_cutoff(params), "top_k": top_k}
+        )
+        entry = cache.get(key)
+        now = time.monotonic()
+        if entry is not None and entry.is_fresh(now):
+            cache.hits += 1
+            return IntegrationResult(ok=True, data=entry.data, status_code=200)
+        if entry is not None and now < entry.fresh_until + settings.cache_stale_while_revalidate_seconds:
+            cache.stale_hits += 1
+            self._revalidate(key, ttl_seconds, method, path, json=json, params=params, headers=headers, top_k=top_k)
+            return IntegrationResult(ok=True, data=entry.data, status_code=200, stale=True)
+
+        cache.misses += 1
+        result = await self._request(
+            method, path, json=json, params=params, headers=headers, deadline=deadline, top_k=top_k
+        )
+        if result.ok:
+            # a truncated answer is served once but never cached
+            if not result.truncated:
+                self._store(key, result, ttl_seconds)
+            return result
+        # stale-if-error: an older answer beats "couldn't reach the engine"
+        entry = cache.get(key)
+        if entry is not None:
+            cache.stale_hits += 1
+            return IntegrationResult(ok=True, data=entry.data, status_code=200, error=result.error, stale=True)
+        return result
+
+    def _store(self, key: str, result: IntegrationResult, ttl_seconds: float) -> None:
+        if self.cache is not None:
+            size = len(canonical_json(result.data).encode("utf-8"))
+            self.cache.put(key, result.data, size=size, ttl_seconds=ttl_seconds)
+
+    def _revalidate(self, key: str, ttl_seconds: float, method: str, path: str, **kwargs: Any) -> None:
+        if key in self._revalidating:
+            return
+
+        async def refresh() -> None:
+            result = await self._request(method, path, **kwargs)
+            if result.ok and not result.truncated:
+                self._store(key, result, ttl_seconds)
+
+        task = self._revalidating[key] = asyncio.ensure_future(refresh())
+        task.add_done_callback(lambda _: self._revalidating.pop(key, None))
 
-    async def _get(self, path: str, params: dict[str, Any] | None = None, headers: dict[str, str] | None = None) -> IntegrationResult:
-        url = f"{self.base_url}{path}"
+    def _resilience(self, path: str) -> EndpointResilience:
+        policy = self._endpoints.get(path)
+        if policy is None:
+            hedge = settings.hedge_cutoff_history and path == settings.cutoff_history_path
+            policy = self._endpoints[path] = EndpointResilience(path, hedge=hedge)
+        return policy
+
+    def resilience_state(self) -> dict[str, dict[str, Any]]:
+        return {path: policy.snapshot() for path, policy in self._endpoints.items()}
+
+    async def _send(
+        self,
+        method: str,
+        path: str,
+        *,
+        json: dict[str, Any] | None = None,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+        top_k: int | None = None,
+    ) -> IntegrationResult:
+        policy = self._resilience(path)
+        if not policy.breaker.allow():
+            return IntegrationResult(ok=False, error=f"circuit open for {path}")
+
+        policy.budget.deposit()
+        attempt = 0
+        started = time.monotonic()
+        try:
+            while True:
+                result, retryable = await self._attempt(
+                    policy, method, path, json=json, params=params, headers=headers, top_k=top_k
+                )
+                if (
+                    result.ok
+                    or not retryable
+                    or attempt >= settings.retry_max_attempts
+                    or not policy.budget.try_withdraw()
+                ):
+                    break
+                attempt += 1
+                policy.retries += 1
+                # jittered exponential backoff: ~50ms, ~100ms, ...
+                await asyncio.sleep(min(1.0, 0.05 * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0))
+        except asyncio.CancelledError:
+            # Cancelled by our side: a caller's latency budget, fan_out dropping optional work, a client
+            # disconnect or shutdown. Those say nothing about the backend, so only a call that had
+            # already outlived its own configured timeout counts; otherwise just free a probe slot.
+            if time.monotonic() - started >= self.timeout_seconds:
+                policy.breaker.record_failure()
+            else:
+                policy.breaker.release_probe()
+            raise
+
+        # 4xx answers mean the backend is healthy; only transport errors and 5xx count against it
+        if result.ok or (result.status_code is not None and result.status_code < 500):
+            policy.breaker.record_success()
+        else:
+            policy.breaker.record_failure()
+        return result
+
+    async def _attempt(
+        self, policy: EndpointResilience, method: str, path: str, **kwargs: Any
+    ) -> tuple[IntegrationResult, bool]:
+        delay = policy.hedge_delay() if method == "GET" else None
+        if delay is None:
+            return await self._exchange(policy, method, path, **kwargs)
+
+        # Hedging: if the first GET is slower than the recent latency percentile, race a duplicate
+        pending = {asyncio.ensure_future(self._exchange(policy, method, path, **kwargs))}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done and policy.budget.try_withdraw():
+                policy.hedges += 1
+                pending.add(asyncio.ensure_future(self._exchange(policy, method, path, **kwargs)))
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                outcomes = [t.result() for t in done]
+                for outcome in outcomes:
+                    if outcome[0].ok:
+                        return outcome
+                if not pending:
+                    return outcomes[0]
+        finally:
+            for t in pending:
+                t.cancel()
+
+    async def _exchange(
+        self,
+        policy: EndpointResilience,
+        method: str,
+        path: str,
+        *,
+        json: dict[str, Any] | None = None,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+        top_k: int | None = None,
+    ) -> tuple[IntegrationResult, bool]:
+        """
+        One HTTP exchange. Returns the result and whether it is safe and useful to retry.
+        With `top_k`, the body is streamed and only the best `top_k` records (by probability /
+        matchScore) are kept, reading at most `max_response_bytes`.
+        """
+        idempotent = method == "GET"
+        started = time.monotonic()
         try:
-            async with httpx.AsyncClient(timeout=self.timeout_seconds) as client:
-                r = await client.get(url, params=params, headers=headers)
-            if r.status_code >= 400:
-                return IntegrationResult(ok=False, error=r.text, status_code=r.status_code)
-            return IntegrationResult(ok=True, data=r.json(), status_code=r.status_code)
+            if top_k is None:
+                r = await self._http().request(method, path, json=json, params=params, headers=headers)
+                if r.status_code >= 400:
+                    return IntegrationResult(ok=False, error=r.text, status_code=r.status_code), (
+                        idempotent and r.status_code in {502, 503, 504}
+                    )
+                result = IntegrationResult(
+                    ok=True, data=r.json(), status_code=r.status_code, fetched_at=_response_time(r)
+                )
+            else:
+                async with self._http().stream(method, path, json=json, params=params, headers=headers) as r:
+                    if r.status_code >= 400:
+                        await r.aread()
+                        return IntegrationResult(ok=False, error=r.text, status_code=r.status_code), (
+                            idempotent and r.status_code in {502, 503, 504}
+                        )
+                    data, truncated = await read_top_k(
+                        r.aiter_bytes(), top_k, record_probability, settings.max_response_bytes
+                    )
+                result = IntegrationResult(
+                    ok=True, data=data, status_code=r.status_code, truncated=truncated, fetched_at=_response_time(r)
+                )
+        except httpx.ConnectError as e:
+            # nothing reached the backend, so any method can be retried
+            return IntegrationResult(ok=False, error=str(e)), True
+        except httpx.TransportError as e:
+            return IntegrationResult(ok=False, error=str(e)), idempotent
         except Exception as e:
-            return IntegrationResult(ok=False, error=str(e))
+            return IntegrationResult(ok=False, error=str(e)), False
+        policy.latency.observe(time.monotonic() - started)
+        return result, False
 
-    async def predict_cutoff(self, payload: dict[str, Any], headers: dict[str, str] | None = None) -> IntegrationResult:
-        return await self._post(settings.predict_cutoff_path, json=payload, headers=headers)
+    async def _post(
+        self,
+        path: str,
+        json: dict[str, Any],
+        headers: dict[str, str] | None = None,
+        deadline: Deadline | None = None,
+    ) -> IntegrationResult:
+        return await self._request("POST", path, json=json, headers=headers, deadline=deadline)
 
-    async def recommend_colleges(self, payload: dict[str, Any], headers: dict[str, str] | None = None) -> IntegrationResult:
+    async def _get(
+        self,
+        path: str,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+        deadline: Deadline | None = None,
+    ) -> IntegrationResult:
+        return await self._request("GET", path, params=params, headers=headers, deadline=deadline)
+
+    async def predict_cutoff(
+        self, payload: dict[str, Any], headers: dict[str, str] | None = None, deadline: Deadline | None = None
+    ) -> IntegrationResult:
+        return await self._post(settings.predict_cutoff_path, json=payload, headers=headers, deadline=deadline)
+
+    async def recommend_colleges(
+        self, payload: dict[str, Any], headers: dict[str, str] | None = None, deadline: Deadline | None = None
+    ) -> IntegrationResult:
         # Adapter: this repo’s Node backend expects {marks, category, preferences} on /api/college-suggestions
         if settings.recommend_colleges_path.rstrip("/") == "/api/college-suggestions":
             adapted = {
@@ -59,16 +489,84 @@ class TneaApiClient:
                 "category": payload.get("category"),
                 "preferences": payload.get("branch") or payload.get("preferences"),
             }
-            return await self._post(settings.recommend_colleges_path, json=adapted, headers=headers)
+            payload = adapted
+        return await self._cached(
+            settings.cache_ttl_recommend_seconds,
+            "POST",
+            settings.recommend_colleges_path,
+            json=payload,
+            headers=headers,
+            deadline=deadline,
+            top_k=settings.recommendation_top_k or None,
+        )
+
+    async def compare_colleges(
+        self, payload: dict[str, Any], headers: dict[str, str] | None = None, deadline: Deadline | None = None
+    ) -> IntegrationResult:
+        return await self._cached(
+            settings.cache_ttl_compare_seconds,
+            "POST",
+            settings.compare_colleges_path,
+            json=payload,
+            headers=headers,
+            deadline=deadline,
+        )
 
-        return await self._post(settings.recommend_colleges_path, json=payload, headers=headers)
+    async def safe_target_dream(
+        self, payload: dict[str, Any], headers: dict[str, str] | None = None, deadline: Deadline | None = None
+    ) -> IntegrationResult:
+        return await self._post(settings.safe_target_dream_path, json=payload, headers=headers, deadline=deadline)
 
-    async def compare_colleges(self, payload: dict[str, Any], headers: dict[str, str] | None = None) -> IntegrationResult:
-        return await self._post(settings.compare_colleges_path, json=payload, headers=headers)
+    async def safe_target_dream_batch(
+        self,
+        items: list[dict[str, Any]],
+        entities: dict[str, Any],
+        headers: dict[str, str] | None = None,
+        deadline: Deadline | None = None,
+    ) -> IntegrationResult:
+        """
+        Classify many (college, branch) pairs for one student instead of one free-text query per turn.
+        - Items are sent in chunks of `safe_target_dream_batch_size` as `{"items": [...], "entities": {...}}`
+        - Up to `safe_target_dream_max_in_flight` chunks are in flight at once (pipelined, order preserved)
+        - `data["labels"]` is aligned with `items`; a failed chunk yields None for its items
+        """
+        size = max(1, settings.safe_target_dream_batch_size)
+        gate = asyncio.Semaphore(max(1, settings.safe_target_dream_max_in_flight))
+        errors: list[str] = []
 
-    async def safe_target_dream(self, payload: dict[str, Any], headers: dict[str, str] | None = None) -> IntegrationResult:
-        return await self._post(settings.safe_target_dream_path, json=payload, headers=headers)
+        async def classify(chunk: list[dict[str, Any]]) -> list[str | None]:
+            async with gate:
+                res = await self._post(
+                    settings.safe_target_dream_path,
+                    json={"items": chunk, "entities": entities},
+                    headers=headers,
+                    deadline=deadline,
+                )
+            if not res.ok:
+                errors.append(res.error or f"HTTP {res.status_code}")
+            return _batch_labels(res, len(chunk))
 
-    async def cutoff_history(self, params: dict[str, Any] | None = None, headers: dict[str, str] | None = None) -> IntegrationResult:
-        return await self._get(settings.cutoff_history_path, params=params, headers=headers)
+        chunks = [items[i : i + size] for i in range(0, len(items), size)]
+        outcomes = await asyncio.gather(*(classify(chunk) for chunk in chunks))
+        labels = [label for chunk_labels in outcomes for label in chunk_labels]
+        ok = any(label is not None for label in labels)
+        return IntegrationResult(ok=ok, data={"labels": labels}, error="; ".join(errors) or None)
 
+    async def cutoff_history(
+        self,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+        deadline: Deadline | None = None,
+        cached: bool = True,
+    ) -> IntegrationResult:
+        """`cached=False` always asks the backend (no stale-while-revalidate / stale-if-error answers)."""
+        if not cached:
+            return await self._get(settings.cutoff_history_path, params=params, headers=headers, deadline=deadline)
+        return await self._cached(
+            settings.cache_ttl_history_seconds,
+            "GET",
+            settings.cutoff_history_path,
+            params=params,
+            headers=headers,
+            deadline=deadline,
+        )
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Awaitable, Callable, Sequence
+
+from intent_model.baseline import IntentPrediction
+from resilience import LatencyTracker
+
+
+# "baseline_fallback": the baseline's unsure answer, kept because the transformer tier failed
+TIERS = ("baseline", "rules", "transformer", "baseline_fallback")
+
+# Confidence reported for a rule-only answer, as in the single-backend blend
+RULE_CONFIDENCE = 0.6
+
+Predictor = Callable[[str], Awaitable[Any]]
+
+
+def calibrate_threshold(
+    confidences: Sequence[float], correct: Sequence[bool], target_precision: float = 0.95, min_samples: int = 5
+) -> float | None:
+    """
+    Lowest confidence threshold at which the cheap tier's accepted answers reach `target_precision`
+    on held-out data (at least `min_samples` accepted). None when no threshold reaches it.
+    """
+    ranked = sorted(zip(confidences, correct), key=lambda p: p[0], reverse=True)
+    best: float | None = None
+    hits = 0
+    for n, (conf, ok) in enumerate(ranked, start=1):
+        hits += bool(ok)
+        # only cut between distinct confidences, so every sample at the threshold is counted
+        if n < len(ranked) and ranked[n][0] == conf:
+            continue
+        if n >= min_samples and hits / n >= target_precision:
+            best = conf
+    return best
+
+
+class IntentCascade:
+    """
+    Confidence-cascaded intent classification.
+    - The baseline answers when its confidence reaches `threshold`
+    - Otherwise a rule intent (when one matched) answers
+    - Only the remaining messages escalate to the transformer tier (BERT/ONNX); if that
+      fails, the baseline's answer is kept and reported as tier "baseline_fallback" (a degraded
+      answer callers should not memoize)
+    Per-tier answer counts and latencies are kept for `/health/inference`.
+    """
+
+    def __init__(self, baseline: Predictor, transformer: Predictor, threshold: float):
+        self.baseline = baseline
+        self.transformer = transformer
+        self.threshold = threshold
+        self.requests = 0
+        self.answered = {tier: 0 for tier in TIERS}
+        self.transformer_errors = 0
+        self._latency = {"baseline": LatencyTracker(), "transformer": LatencyTracker()}
+
+    async def _timed(self, tier: str, predictor: Predictor, text: str) -> Any:
+        start = time.perf_counter()
+        try:
+            return await predictor(text)
+        finally:
+            self._latency[tier].observe(time.perf_counter() - start)
+
+    async def classify(self, text: str, rule_intent: str | None = None) -> tuple[Any, str]:
+        """Returns `(prediction, tier)`; raises only if neither model tier nor the rules can answer."""
+        self.requests += 1
+        base = None
+        try:
+            base = await self._timed("baseline", self.baseline, text)
+        except Exception:
+            pass
+        if base is not None and base.confidence >= self.threshold:
+            self.answered["baseline"] += 1
+            return base, "baseline"
+        if rule_intent is not None:
+            self.answered["rules"] += 1
+            confidence = max(base.confidence if base is not None else 0.0, RULE_CONFIDENCE)
+            return IntentPrediction(intent=rule_intent, confidence=confidence), "rules"
+
+        try:
+            pred = await self._timed("transformer", self.transformer, text)
+        except Exception:
+            self.transformer_errors += 1
+            if base is None:
+                raise
+            self.answered["baseline_fallback"] += 1
+            return base, "baseline_fallback"
+        self.answered["transformer"] += 1
+        return pred, "transformer"
+
+    def stats(self) -> dict[str, Any]:
+        tiers: dict[str, Any] = {}
+        for tier in TIERS:
+            entry: dict[str, Any] = {
+                "answered": self.answered[tier],
+                "hit_rate": round(self.answered[tier] / self.requests, 4) if self.requests else None,
+            }
+            latency = self._latency.get(tier)
+            if latency is not None:
+                p50, p95 = latency.percentile(50), latency.percentile(95)
+                entry["latency_p50_ms"] = round(p50 * 1000, 2) if p50 is not None else None
+                entry["latency_p95_ms"] = round(p95 * 1000, 2) if p95 is not None else None
+            tiers[tier] = entry
+        return {
+            "threshold": self.threshold,
+            "requests": self.requests,
+            "transformer_errors": self.transformer_errors,
+            "tiers": tiers,
+        }
@@ -16,14 +16,32 @@ class BaselineIntentClassifier:
     """
     Loads a scikit-learn Pipeline saved via joblib.
     Expected pipeline: TF-IDF vectorizer + LogisticRegression.
+    When a compiled export (see `intent_model/compiled.py`) built from this joblib file sits
+    next to it, it is scored with NumPy instead and sklearn is never imported. An export whose
+    recorded source digest does not match the joblib file is stale and ignored.
     """
 
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, use_compiled: bool = True):
         self.model_path = model_path
+        self.use_compiled = use_compiled
         self._pipeline = None
+        self._compiled = None
+        self._classes: list[str] = []
 
     def load(self) -> None:
-        if self._pipeline is not None:
+        if self._pipeline is not None or self._compiled is not None:
+            return
+        from intent_model.compiled import CompiledIntentClassifier, compiled_dir_for
+
+        compiled_dir = compiled_dir_for(self.model_path)
+        if (
+            self.use_compiled
+            and CompiledIntentClassifier.available(compiled_dir)
+            and CompiledIntentClassifier.matches_source(compiled_dir, self.model_path)
+        ):
+            compiled = CompiledIntentClassifier(compiled_dir)
+            compiled.load()
+            self._compiled = compiled
             return
         if not os.path.exists(self.model_path):
             raise FileNotFoundError(
@@ -31,11 +49,24 @@ class BaselineIntentClassifier:
                 "Train it with `python scripts/train_intent_baseline.py`."
             )
         self._pipeline = joblib.load(self.model_path)
+        self._classes = [str(c) for c in self._pipeline.classes_]
 
-    def predict(self, text: str) -> IntentPrediction:
+    def reload(self) -> None:
+        self._pipeline = None
+        self._compiled = None
         self.load()
-        proba = self._pipeline.predict_proba([text])[0]
-        classes = list(self._pipeline.classes_)
-        best_i = int(proba.argmax())
-        return IntentPrediction(intent=classes[best_i], confidence=float(proba[best_i]))
 
+    def predict(self, text: str) -> IntentPrediction:
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts: list[str]) -> list[IntentPrediction]:
+        self.load()
+        if self._compiled is not None:
+            return self._compiled.predict_batch(texts)
+        if not texts:
+            return []
+        proba = self._pipeline.predict_proba(list(texts))
+        best = proba.argmax(axis=1)
+        return [
+            IntentPrediction(intent=self._classes[i], confidence=float(proba[row, i])) for row, i in enumerate(best)
+        ]
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Generic, TypeVar
+
+
+T = TypeVar("T")
+
+
+class MicroBatcher(Generic[T]):
+    """
+    Dynamic micro-batching front end for a batch predictor.
+    - Concurrent `submit()` calls are queued and collected into batches of up to `max_batch`
+      items, waiting at most `max_wait_ms` after the first item of a batch
+    - At most `max_concurrent_batches` batches run at once; while they run, new items keep
+      queueing, so batches grow with load
+    - `batch_fn(texts)` must return one result per text, in order; a batch that comes back with
+      the wrong number of results fails every waiter in it
+    - `stop()` cancels every waiter that has not been answered yet, queued or in a running batch
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[list[str]], Awaitable[list[T]]],
+        max_batch: int,
+        max_wait_ms: float,
+        max_concurrent_batches: int = 1,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self._queue: asyncio.Queue[tuple[str, asyncio.Future[T]]] | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._collector: asyncio.Task[None] | None = None
+        self._running: set[asyncio.Task[None]] = set()
+        self._waiting: set[asyncio.Future[T]] = set()
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, text: str) -> T:
+        if self._collector is None or self._collector.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._collector = asyncio.create_task(self._collect())
+        fut: asyncio.Future[T] = asyncio.get_running_loop().create_future()
+        self._waiting.add(fut)
+        fut.add_done_callback(self._waiting.discard)
+        assert self._queue is not None
+        self._queue.put_nowait((text, fut))
+        return await fut
+
+    async def _collect(self) -> None:
+        assert self._queue is not None and self._slots is not None
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future[T]]]) -> None:
+        assert self._slots is not None
+        try:
+            live = [(text, fut) for text, fut in batch if not fut.done()]
+            if not live:
+                return
+            self.batches += 1
+            self.items += len(live)
+            try:
+                results = await self.batch_fn([text for text, _ in live])
+            except Exception as e:
+                self._fail(live, e)
+                return
+            if len(results) != len(live):
+                # results can't be matched to texts any more, so none of them are trusted
+                self._fail(live, RuntimeError(f"batch_fn returned {len(results)} results for {len(live)} texts"))
+                return
+            for (_, fut), result in zip(live, results):
+                if not fut.done():
+                    fut.set_result(result)
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _fail(batch: list[tuple[str, asyncio.Future[T]]], error: BaseException) -> None:
+        for _, fut in batch:
+            if not fut.done():
+                fut.set_exception(error)
+
+    async def stop(self) -> None:
+        tasks = [t for t in [self._collector, *self._running] if t is not None]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._collector = None
+        # queued items, a batch the collector was still filling and batches cut off mid-run
+        for fut in list(self._waiting):
+            fut.cancel()
+        while self._queue is not None and not self._queue.empty():
+            self._queue.get_nowait()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
@@ -34,18 +34,38 @@ class BertIntentClassifier:
         self._tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
         self._model = AutoModelForSequenceClassification.from_pretrained(self.model_dir)
 
+    def reload(self) -> None:
+        self._tokenizer = None
+        self._model = None
+        self.load()
+
     def predict(self, text: str) -> IntentPrediction:
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts: list[str], bucket_size: int = 16) -> list[IntentPrediction]:
+        """
+        Classify many texts with one `no_grad` forward pass per bucket.
+        Texts are tokenized once, sorted by token length and padded per bucket of
+        `bucket_size`, so short messages are not padded to the longest one in the batch.
+        """
         import torch
 
         self.load()
-        inputs = self._tokenizer(text, return_tensors="pt", truncation=True, padding=True)
-        with torch.no_grad():
-            outputs = self._model(**inputs)
-            logits = outputs.logits[0]
-            probs = torch.softmax(logits, dim=-1)
-            idx = int(torch.argmax(probs).item())
-            conf = float(probs[idx].item())
+        if not texts:
+            return []
+        encoded = self._tokenizer(list(texts), truncation=True)
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
         labels = self._model.config.id2label
-        intent = labels.get(idx, "fallback_unknown")
-        return IntentPrediction(intent=intent, confidence=conf)
-
+        preds: list[IntentPrediction | None] = [None] * len(texts)
+        with torch.no_grad():
+            for start in range(0, len(order), max(1, bucket_size)):
+                bucket = order[start : start + max(1, bucket_size)]
+                features = [{key: encoded[key][i] for key in encoded.keys()} for i in bucket]
+                inputs = self._tokenizer.pad(features, return_tensors="pt")
+                probs = torch.softmax(self._model(**inputs).logits, dim=-1)
+                confs, idxs = probs.max(dim=-1)
+                for row, i in enumerate(bucket):
+                    intent = labels.get(int(idxs[row].item()), "fallback_unknown")
+                    preds[i] = IntentPrediction(intent=intent, confidence=float(confs[row].item()))
+        return [p for p in preds if p is not None]
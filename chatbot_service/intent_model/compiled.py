@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Any
+
+import numpy as np
+
+from intent_model.baseline import IntentPrediction
+
+
+FORMAT_VERSION = 1
+
+
+def compiled_dir_for(model_path: str) -> str:
+    """`.../baseline_intent.joblib` -> `.../baseline_intent_compiled` (where the compiled export lives)."""
+    return os.path.splitext(model_path)[0] + "_compiled"
+
+
+def source_digest(model_path: str) -> str:
+    """SHA-256 of the joblib file an export was built from (recorded in, and checked against, `meta.json`)."""
+    h = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def export_compiled(pipeline: Any, out_dir: str, source_path: str | None = None) -> str:
+    """
+    Export a fitted TF-IDF + LogisticRegression pipeline to a sklearn-free artifact:
+    - `meta.json`: tokenizer settings, classes, how scores become probabilities and
+      the digest of `source_path` (the joblib file the pipeline was saved to)
+    - `vocab.json`: term -> column hash map
+    - `idf.npy` (features,), `coef.npy` (features x classes), `intercept.npy` (classes,)
+    Arrays are plain `.npy` files so `CompiledIntentClassifier` can memory-map them.
+    """
+    tfidf = pipeline.steps[0][1]
+    clf = pipeline.steps[-1][1]
+    params = tfidf.get_params()
+    if params.get("analyzer") != "word" or params.get("tokenizer") or params.get("preprocessor"):
+        raise ValueError("only word-analyzer TF-IDF with the default tokenizer/preprocessor can be compiled")
+    if params.get("strip_accents"):
+        raise ValueError("strip_accents is not supported by the compiled scorer")
+
+    multi_class = getattr(clf, "multi_class", "auto")
+    if clf.coef_.shape[0] == 1:
+        mode = "binary"
+    elif multi_class == "ovr" or (multi_class == "auto" and getattr(clf, "solver", "") == "liblinear"):
+        mode = "ovr"
+    else:
+        mode = "multinomial"
+
+    n_features = len(tfidf.vocabulary_)
+    idf = np.asarray(tfidf.idf_, dtype=np.float64) if params.get("use_idf", True) else np.ones(n_features)
+    stop_words = tfidf.get_stop_words()
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "classes": [str(c) for c in clf.classes_],
+        "mode": mode,
+        "lowercase": bool(params.get("lowercase", True)),
+        "token_pattern": params.get("token_pattern"),
+        "ngram_range": list(params.get("ngram_range", (1, 1))),
+        "stop_words": sorted(stop_words) if stop_words else [],
+        "binary": bool(params.get("binary", False)),
+        "sublinear_tf": bool(params.get("sublinear_tf", False)),
+        "norm": params.get("norm"),
+        "source_sha256": source_digest(source_path) if source_path else None,
+    }
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "idf.npy"), idf)
+    np.save(os.path.join(out_dir, "coef.npy"), np.ascontiguousarray(np.asarray(clf.coef_, dtype=np.float64).T))
+    np.save(os.path.join(out_dir, "intercept.npy"), np.asarray(clf.intercept_, dtype=np.float64))
+    with open(os.path.join(out_dir, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump({term: int(i) for term, i in tfidf.vocabulary_.items()}, f, ensure_ascii=False)
+    # meta.json last: its presence marks a complete export
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return out_dir
+
+
+class CompiledIntentClassifier:
+    """
+    NumPy-only scorer for an exported TF-IDF + LogisticRegression intent model.
+    Reproduces sklearn's tokenization, n-grams, tf-idf weighting/normalisation and
+    predict_proba without importing sklearn; weights are memory-mapped.
+    """
+
+    def __init__(self, model_dir: str, mmap: bool = True):
+        self.model_dir = model_dir
+        self.mmap = mmap
+        self.classes: list[str] = []
+        self._vocab: dict[str, int] = {}
+        self._idf: np.ndarray | None = None
+        self._coef: np.ndarray | None = None
+        self._intercept: np.ndarray | None = None
+        self._meta: dict[str, Any] = {}
+        self._token_re: re.Pattern[str] | None = None
+        self._stop_words: frozenset[str] = frozenset()
+
+    @staticmethod
+    def available(model_dir: str) -> bool:
+        return os.path.exists(os.path.join(model_dir, "meta.json"))
+
+    @staticmethod
+    def matches_source(model_dir: str, model_path: str) -> bool:
+        """
+        False when the export was built from a different joblib file than `model_path`
+        (e.g. the model was retrained without re-exporting). A missing joblib is not a mismatch:
+        deployments may ship only the compiled export.
+        """
+        if not os.path.exists(model_path):
+            return True
+        with open(os.path.join(model_dir, "meta.json"), "r", encoding="utf-8") as f:
+            recorded = json.load(f).get("source_sha256")
+        return recorded is not None and recorded == source_digest(model_path)
+
+    def load(self) -> None:
+        if self._coef is not None:
+            return
+        if not self.available(self.model_dir):
+            raise FileNotFoundError(
+                f"Compiled baseline intent model not found at: {self.model_dir}. "
+                "Export it with `python scripts/train_intent_baseline.py --export_only`."
+            )
+        with open(os.path.join(self.model_dir, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported compiled model format: {meta.get('format_version')}")
+        with open(os.path.join(self.model_dir, "vocab.json"), "r", encoding="utf-8") as f:
+            self._vocab = json.load(f)
+        mode = "r" if self.mmap else None
+        self._idf = np.load(os.path.join(self.model_dir, "idf.npy"), mmap_mode=mode)
+        self._intercept = np.load(os.path.join(self.model_dir, "intercept.npy"), mmap_mode=mode)
+        self._token_re = re.compile(meta["token_pattern"])
+        self._stop_words = frozenset(meta.get("stop_words") or ())
+        self._meta = meta
+        self.classes = list(meta["classes"])
+        self._coef = np.load(os.path.join(self.model_dir, "coef.npy"), mmap_mode=mode)
+
+    def _terms(self, text: str) -> list[str]:
+        if self._meta["lowercase"]:
+            text = text.lower()
+        tokens = [t for t in self._token_re.findall(text) if t not in self._stop_words]
+        min_n, max_n = self._meta["ngram_range"]
+        if max_n == 1:
+            return tokens
+        terms = list(tokens) if min_n == 1 else []
+        for n in range(max(2, min_n), min(max_n, len(tokens)) + 1):
+            terms.extend(" ".join(tokens[i : i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def _vectorize(self, texts: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """TF-IDF rows as CSR arrays `(indptr, indices, data)`."""
+        indptr = [0]
+        indices: list[int] = []
+        data: list[float] = []
+        binary, sublinear, norm = self._meta["binary"], self._meta["sublinear_tf"], self._meta["norm"]
+        for text in texts:
+            counts = Counter(i for i in map(self._vocab.get, self._terms(text)) if i is not None)
+            cols = list(counts)
+            tf = [1.0 if binary else float(counts[c]) for c in cols]
+            if sublinear:
+                tf = [1.0 + math.log(v) for v in tf]
+            weights = np.asarray(tf, dtype=np.float64) * self._idf[cols] if cols else np.zeros(0)
+            if norm == "l2" and weights.size:
+                weights /= np.sqrt(np.dot(weights, weights)) or 1.0
+            elif norm == "l1" and weights.size:
+                weights /= np.abs(weights).sum() or 1.0
+            indices.extend(cols)
+            data.extend(weights.tolist())
+            indptr.append(len(indices))
+        return np.asarray(indptr), np.asarray(indices, dtype=np.int64), np.asarray(data, dtype=np.float64)
+
+    def predict_proba(self, texts: list[str]) -> np.ndarray:
+        """Class probabilities (rows x classes), matching `Pipeline.predict_proba`."""
+        self.load()
+        indptr, indices, data = self._vectorize(list(texts))
+        scores = np.tile(np.asarray(self._intercept), (len(texts), 1))
+        if indices.size:
+            rows = np.repeat(np.arange(len(texts)), np.diff(indptr))
+            np.add.at(scores, rows, self._coef[indices] * data[:, None])
+        mode = self._meta["mode"]
+        if mode == "binary":
+            p = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        if mode == "ovr":
+            p = 1.0 / (1.0 + np.exp(-scores))
+            return p / p.sum(axis=1, keepdims=True)
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        return scores / scores.sum(axis=1, keepdims=True)
+
+    def predict_batch(self, texts: list[str]) -> list[IntentPrediction]:
+        if not texts:
+            return []
+        proba = self.predict_proba(texts)
+        best = proba.argmax(axis=1)
+        return [IntentPrediction(intent=self.classes[i], confidence=float(proba[row, i])) for row, i in enumerate(best)]
+
+    def predict(self, text: str) -> IntentPrediction:
+        return self.predict_batch([text])[0]
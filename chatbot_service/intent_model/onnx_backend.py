@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import json
+import os
+from typing import Any
+
+import numpy as np
+
+from intent_model.bert import BertIntentClassifier, IntentPrediction
+
+
+ONNX_SUBDIR = "onnx"
+ONNX_FP32 = "model.onnx"
+ONNX_INT8 = "model.int8.onnx"
+
+# Model inputs in forward() positional order, as exported
+_INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def default_onnx_path(model_dir: str, quantized: bool = True) -> str:
+    return os.path.join(model_dir, ONNX_SUBDIR, ONNX_INT8 if quantized else ONNX_FP32)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    z = logits - logits.max(axis=-1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+class OnnxIntentClassifier:
+    """
+    Runs an ONNX export of the fine-tuned intent model on ONNX Runtime (CPU).
+    `model_path` is the exported `.onnx` file (fp32 or int8-quantized); the tokenizer and
+    `config.json` labels are read from the same directory, so torch is not needed at serve time.
+    Enable via INTENT_BACKEND=onnx.
+    """
+
+    def __init__(self, model_path: str, intra_op_threads: int = 1):
+        self.model_path = model_path
+        self.intra_op_threads = intra_op_threads
+        self._session = None
+        self._tokenizer = None
+        self._input_names: list[str] = []
+        self._labels: dict[int, str] = {}
+
+    def load(self) -> None:
+        if self._session is not None:
+            return
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(
+                f"ONNX intent model not found at: {self.model_path}. "
+                "Export it with `python scripts/train_intent_bert.py --export_only`."
+            )
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_dir = os.path.dirname(self.model_path)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = max(1, self.intra_op_threads)
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = ort.InferenceSession(self.model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_names = [i.name for i in session.get_inputs()]
+        self._tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        with open(os.path.join(model_dir, "config.json"), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        self._labels = {int(k): v for k, v in (config.get("id2label") or {}).items()}
+        self._session = session
+
+    def reload(self) -> None:
+        self._session = None
+        self.load()
+
+    def predict(self, text: str) -> IntentPrediction:
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts: list[str], bucket_size: int = 16) -> list[IntentPrediction]:
+        """Same length-bucketed batching as `BertIntentClassifier.predict_batch`, scored by ONNX Runtime."""
+        self.load()
+        if not texts:
+            return []
+        encoded = self._tokenizer(list(texts), truncation=True)
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+        preds: list[IntentPrediction | None] = [None] * len(texts)
+        for start in range(0, len(order), max(1, bucket_size)):
+            bucket = order[start : start + max(1, bucket_size)]
+            features = [{key: encoded[key][i] for key in encoded.keys()} for i in bucket]
+            padded = self._tokenizer.pad(features, return_tensors="np")
+            feeds = {name: np.asarray(padded[name], dtype=np.int64) for name in self._input_names if name in padded}
+            probs = _softmax(self._session.run(None, feeds)[0])
+            idxs = probs.argmax(axis=-1)
+            for row, i in enumerate(bucket):
+                idx = int(idxs[row])
+                preds[i] = IntentPrediction(
+                    intent=self._labels.get(idx, "fallback_unknown"), confidence=float(probs[row, idx])
+                )
+        return [p for p in preds if p is not None]
+
+
+def export_onnx(model_dir: str, out_dir: str | None = None, quantize: bool = True, opset: int = 17) -> dict[str, str]:
+    """
+    Export a transformers sequence classifier to ONNX (dynamic batch/sequence axes), copy its
+    tokenizer and config next to it, and optionally write a dynamic int8-quantized variant.
+    Returns the written model paths keyed by "fp32" / "int8".
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    out_dir = out_dir or os.path.join(model_dir, ONNX_SUBDIR)
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    model.eval()
+
+    sample = tokenizer(["which college can I get with 190 cutoff"], return_tensors="pt")
+    names = [name for name in _INPUT_NAMES if name in sample]
+    paths = {"fp32": os.path.join(out_dir, ONNX_FP32)}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in names),
+            paths["fp32"],
+            input_names=names,
+            output_names=["logits"],
+            dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in names}, "logits": {0: "batch"}},
+            opset_version=opset,
+        )
+    tokenizer.save_pretrained(out_dir)
+    model.config.save_pretrained(out_dir)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        paths["int8"] = os.path.join(out_dir, ONNX_INT8)
+        quantize_dynamic(paths["fp32"], paths["int8"], weight_type=QuantType.QInt8)
+    return paths
+
+
+def parity_check(
+    model_dir: str, onnx_path: str, texts: list[str], min_agreement: float = 0.98
+) -> dict[str, Any]:
+    """Compare ONNX predictions against `BertIntentClassifier` on `texts` (labels and confidences)."""
+    reference = BertIntentClassifier(model_dir).predict_batch(texts)
+    candidate = OnnxIntentClassifier(onnx_path).predict_batch(texts)
+    n = len(texts)
+    agree = sum(1 for a, b in zip(reference, candidate) if a.intent == b.intent)
+    diffs = [abs(a.confidence - b.confidence) for a, b in zip(reference, candidate)]
+    agreement = agree / n if n else 1.0
+    return {
+        "onnx_path": onnx_path,
+        "samples": n,
+        "label_agreement": round(agreement, 4),
+        "max_confidence_diff": round(max(diffs), 4) if diffs else 0.0,
+        "mean_confidence_diff": round(sum(diffs) / n, 4) if n else 0.0,
+        "ok": agreement >= min_agreement,
+    }
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import unicodedata
+from collections import deque
+from dataclasses import dataclass
+
+
+# Rule intents in priority order (first wins when several match).
+# A trailing "*" lets a keyword take suffixes ("recommend*" matches "recommendations"); it is
+# used for inflected English stems and for Tamil, where particles attach to the word.
+INTENT_KEYWORDS: tuple[tuple[str, tuple[str, ...]], ...] = (
+    ("greeting", ("hi", "hello", "hey", "vanakkam", "வணக்க*")),
+    ("goodbye", ("bye", "goodbye", "thanks", "thank you", "nandri", "நன்றி*", "போய் வருகிறேன்")),
+    ("college_comparison", ("compare*", "comparison*", "vs", "versus", "ஒப்பிடு*")),
+    (
+        "college_recommendation",
+        ("recommend*", "suggest*", "best college*", "which college*", "பரிந்துரை*"),
+    ),
+    ("cutoff_prediction", ("predict*", "what cutoff", "cutoff for", "cut off for")),
+    ("safe_target_dream_query", ("safe", "target*", "dream*")),
+    (
+        "counselling_process",
+        ("counselling", "counseling", "choice filling", "allotment*", "round", "rounds", "கலந்தாய்வு*"),
+    ),
+    ("document_verification", ("document*", "certificate*", "verification", "சான்றிதழ்*", "ஆவண*")),
+    ("seat_trend_analysis", ("trend*", "last year", "previous year", "history")),
+)
+
+
+def _is_word_char(c: str) -> bool:
+    # combining marks count as word characters, so Tamil vowel signs never form a boundary
+    return c.isalnum() or c == "_" or unicodedata.category(c).startswith("M")
+
+
+def _fold(c: str) -> str:
+    # lowercase without changing the text length, so match offsets stay valid
+    lower = c.lower()
+    return lower if len(lower) == 1 else c
+
+
+@dataclass(frozen=True)
+class KeywordMatch:
+    intent: str
+    keyword: str
+    start: int
+    end: int
+
+
+@dataclass(frozen=True)
+class RuleResult:
+    intent: str
+    matches: tuple[KeywordMatch, ...]
+
+
+class KeywordRuleEngine:
+    """
+    Aho-Corasick automaton over a declarative keyword table.
+    - Built once; `match()` scans the message in a single pass whatever the number of keywords
+    - Case-insensitive, respects word boundaries (a keyword may not start or end inside a word,
+      except that "*" keywords may be followed by a suffix)
+    - Returns the highest-priority intent plus every matched span
+    """
+
+    def __init__(self, table: tuple[tuple[str, tuple[str, ...]], ...] = INTENT_KEYWORDS):
+        self.priority = {intent: i for i, (intent, _) in enumerate(table)}
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        # per state: (intent, keyword as written, length, allows suffix)
+        self._out: list[list[tuple[str, str, int, bool]]] = [[]]
+        for intent, keywords in table:
+            for keyword in keywords:
+                self._add(intent, keyword)
+        self._build_failure_links()
+
+    def _add(self, intent: str, keyword: str) -> None:
+        allow_suffix = keyword.endswith("*")
+        pattern = "".join(_fold(c) for c in keyword.rstrip("*"))
+        if not pattern:
+            return
+        state = 0
+        for c in pattern:
+            nxt = self._goto[state].get(c)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][c] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((intent, keyword, len(pattern), allow_suffix))
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and c not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(c, 0)
+                # depth-1 states fail to the root, never to themselves
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find_all(self, text: str) -> list[KeywordMatch]:
+        matches: list[KeywordMatch] = []
+        state = 0
+        n = len(text)
+        for i, ch in enumerate(text):
+            c = _fold(ch)
+            while state and c not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(c, 0)
+            for intent, keyword, length, allow_suffix in self._out[state]:
+                start, end = i - length + 1, i + 1
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if not allow_suffix and end < n and _is_word_char(text[end]):
+                    continue
+                matches.append(KeywordMatch(intent=intent, keyword=keyword, start=start, end=end))
+        return matches
+
+    def match(self, text: str) -> RuleResult | None:
+        matches = self.find_all(text)
+        if not matches:
+            return None
+        best = min(matches, key=lambda m: (self.priority[m.intent], m.start))
+        return RuleResult(intent=best.intent, matches=tuple(sorted(matches, key=lambda m: (m.start, -m.end))))
+
+    def intent(self, text: str) -> str | None:
+        result = self.match(text)
+        return result.intent if result is not None else None
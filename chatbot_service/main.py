@@ -1,17 +1,31 @@
 from __future__ import annotations
 
-from typing import Any, Literal
+import asyncio
+import dataclasses
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Literal
 
-from fastapi import FastAPI, Header
+from fastapi import FastAPI, Header, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 from config import settings
+from cutoff_snapshot import CutoffSnapshotStore
+from deadline import Deadline
 from decision_engine import DecisionEngine
+from executors import InferenceExecutor
 from integration_layer import TneaApiClient
+from intent_cascade import IntentCascade
 from intent_model.baseline import BaselineIntentClassifier
-from intent_model.bert import BertIntentClassifier
+from intent_model.batching import MicroBatcher
+from intent_model.bert import BertIntentClassifier, IntentPrediction
+from intent_model.onnx_backend import OnnxIntentClassifier
+from intent_model.rules import KeywordRuleEngine
 from memory_store import MemoryStore
-from ner_model.entity_extractor import EntityExtractor
+from nlu_cache import NluCache
+from ner_model.entity_extractor import EntityExtractor, ExtractedEntities
+from session_backend import RedisSessionBackend
 from utils import normalize_whitespace
 
 
@@ -34,6 +48,20 @@ class ChatRequest(BaseModel):
     message: str = Field(..., min_length=1)
     session_id: str | None = None
     language: Literal["en", "ta"] = "en"
+    # `next_cursor` from a previous recommendation response, to fetch the next page
+    cursor: str | None = None
+
+
+class ChatTurn(BaseModel):
+    """One client frame on `/ws/chat`; user, session and auth come from the connection."""
+
+    message: str = Field(..., min_length=1)
+    language: Literal["en", "ta"] | None = None
+    cursor: str | None = None
+
+
+class ChatBatchRequest(BaseModel):
+    requests: list[ChatRequest] = Field(..., min_length=1, max_length=settings.chat_batch_max_items)
 
 
 class ChatResponse(BaseModel):
@@ -42,86 +70,279 @@ class ChatResponse(BaseModel):
     entities: dict[str, Any]
     results: list[dict[str, Any]] = []
     response_text: str
+    # Parts of the answer skipped to stay within the turn's latency budget (or unavailable downstream)
+    omitted: list[str] = []
+    # Opaque cursor for the next page of recommendations (None when there are no more)
+    next_cursor: str | None = None
+
+
+# Compiled once: single-pass keyword matching for the rule intent tier
+RULES = KeywordRuleEngine()
 
 
 def _simple_rules_intent(text: str) -> str | None:
-    t = text.lower()
-    if any(k in t for k in ["hi", "hello", "hey", "vanakkam", "வணக்கம்"]):
-        return "greeting"
-    if any(k in t for k in ["bye", "goodbye", "thanks", "thank you", "நன்றி"]):
-        return "goodbye"
-    if "compare" in t or "vs" in t:
-        return "college_comparison"
-    if any(k in t for k in ["recommend", "suggest", "best college", "which college"]):
-        return "college_recommendation"
-    if any(k in t for k in ["predict", "prediction", "what cutoff", "cutoff for"]):
-        return "cutoff_prediction"
-    if any(k in t for k in ["safe", "target", "dream"]):
-        return "safe_target_dream_query"
-    if any(k in t for k in ["counselling", "counseling", "choice filling", "allotment", "round"]):
-        return "counselling_process"
-    if any(k in t for k in ["document", "certificate", "verification"]):
-        return "document_verification"
-    if any(k in t for k in ["trend", "last year", "previous year", "history"]):
-        return "seat_trend_analysis"
-    return None
+    return RULES.intent(text)
 
 
-def create_app() -> FastAPI:
-    app = FastAPI(title=settings.service_name)
+def _blend_intent(pred: Any, rule_intent: str | None) -> tuple[str, float]:
+    intent = "fallback_unknown"
+    confidence = 0.25
+    if pred is not None:
+        intent = pred.intent
+        confidence = pred.confidence
 
-    memory = MemoryStore(max_sessions=settings.memory_max_sessions, ttl_seconds=settings.memory_ttl_seconds)
+    # Blend: if model is low-confidence, use rule intent if available
+    if confidence < 0.55 and rule_intent is not None:
+        intent = rule_intent
+        confidence = max(confidence, 0.6)
+
+    if intent not in SUPPORTED_INTENTS:
+        intent = "fallback_unknown"
+    return intent, confidence
+
+
+def _downstream_headers(cookie: str | None, authorization: str | None) -> dict[str, str] | None:
+    if not (cookie or authorization):
+        return None
+    headers: dict[str, str] = {}
+    if cookie:
+        headers["cookie"] = cookie
+    if authorization:
+        headers["authorization"] = authorization
+    return headers
+
+
+def create_app() -> FastAPI:
+    # Sessions live in-process unless a shared backend is configured (several workers/replicas)
+    session_backend = (
+        RedisSessionBackend(
+            settings.memory_redis_url,
+            key_prefix=settings.memory_redis_key_prefix,
+            timeout_ms=settings.memory_redis_timeout_ms,
+            pool_size=settings.memory_redis_pool_size,
+        )
+        if settings.memory_backend == "redis"
+        else None
+    )
+    memory = MemoryStore(
+        max_sessions=settings.memory_max_sessions,
+        ttl_seconds=settings.memory_ttl_seconds,
+        backend=session_backend,
+        max_bytes=settings.memory_max_bytes,
+    )
     extractor = EntityExtractor(spacy_model_path=settings.spacy_model_path)
     api_client = TneaApiClient()
-    engine = DecisionEngine(memory=memory, extractor=extractor, api_client=api_client)
+    cutoff_snapshot = CutoffSnapshotStore(api_client) if settings.cutoff_snapshot_enabled else None
 
-    baseline = BaselineIntentClassifier(settings.baseline_intent_model_path)
+    baseline = BaselineIntentClassifier(
+        settings.baseline_intent_model_path, use_compiled=settings.baseline_compiled_enabled
+    )
     bert = BertIntentClassifier(settings.bert_intent_model_dir)
+    onnx = OnnxIntentClassifier(settings.onnx_intent_model_path, intra_op_threads=settings.onnx_intra_op_threads)
+    # "bert"/"onnx" classify every message; "cascade" only escalates messages the baseline is unsure of
+    transformer_backend: str | None = None
+    if settings.intent_backend in {"bert", "onnx"}:
+        transformer_backend = settings.intent_backend
+    elif settings.intent_backend == "cascade":
+        transformer_backend = "bert" if settings.cascade_escalation_backend == "bert" else "onnx"
+
+    # CPU-bound model work runs in bounded pools so the event loop stays free for I/O
+    inference = InferenceExecutor()
+    inference.register(
+        "baseline",
+        baseline,
+        settings.baseline_intent_model_path,
+        {"use_compiled": settings.baseline_compiled_enabled},
+    )
+    inference.register("bert", bert, settings.bert_intent_model_dir)
+    inference.register(
+        "onnx", onnx, settings.onnx_intent_model_path, {"intra_op_threads": settings.onnx_intra_op_threads}
+    )
+    inference.register("ner", extractor, settings.spacy_model_path)
+
+    # Repeated messages skip classification and entity extraction; reloads drop the affected entries
+    nlu_cache = NluCache(settings.nlu_cache_max_entries) if settings.nlu_cache_enabled else None
+    if nlu_cache is not None:
+        inference.add_reload_listener(nlu_cache.invalidate)
+
+    # Concurrent transformer predictions share one padded forward pass per batch
+    bert_batcher: MicroBatcher[IntentPrediction] | None = None
+    if transformer_backend is not None and settings.bert_batching_enabled:
+        bert_batcher = MicroBatcher(
+            lambda texts: inference.run(transformer_backend, "predict_batch", texts, settings.bert_batch_bucket_size),
+            max_batch=settings.bert_batch_max_size,
+            max_wait_ms=settings.bert_batch_max_wait_ms,
+            max_concurrent_batches=settings.bert_batch_max_concurrent,
+        )
+
+    async def predict_baseline(text: str) -> Any:
+        return await inference.run("baseline", "predict", text)
+
+    async def predict_transformer(text: str) -> Any:
+        if bert_batcher is not None:
+            return await bert_batcher.submit(text)
+        return await inference.run(transformer_backend, "predict", text)
+
+    cascade: IntentCascade | None = None
+    if settings.intent_backend == "cascade":
+        cascade = IntentCascade(predict_baseline, predict_transformer, settings.cascade_confidence_threshold)
+
+    async def predict_intent(text: str) -> tuple[Any, str]:
+        """`(prediction, tier)`; the tier is "baseline_fallback" for a degraded cascade answer."""
+        if cascade is not None:
+            return await cascade.classify(text, _simple_rules_intent(text))
+        if transformer_backend is not None:
+            return await predict_transformer(text), transformer_backend
+        return await predict_baseline(text), "baseline"
+
+    def intent_model_version() -> str:
+        if settings.intent_backend == "cascade":
+            return "|".join(inference.version(b) for b in ("baseline", transformer_backend))
+        return inference.version(transformer_backend or "baseline")
+
+    async def classify(message: str) -> Any:
+        """Model intent prediction (memoized), or None when no model is available."""
+        try:
+            version = intent_model_version()
+            cached = nlu_cache.lookup("intent", settings.intent_backend, version, message) if nlu_cache else None
+            if cached is not None:
+                return cached
+            pred, tier = await predict_intent(message)
+            # a fallback answer is only kept until the transformer recovers, not until the next reload
+            if nlu_cache is not None and tier != "baseline_fallback":
+                nlu_cache.store("intent", settings.intent_backend, version, message, pred)
+            return pred
+        except Exception:
+            # If model artifacts are missing, fall back to rules
+            return None
+
+    async def classify_many(messages: list[str]) -> dict[str, Any]:
+        unique = list(dict.fromkeys(messages))
+        if transformer_backend is not None:
+            # concurrent calls are coalesced by the micro-batcher (the cascade escalates only unsure ones)
+            return dict(zip(unique, await asyncio.gather(*(classify(m) for m in unique))))
+        version = intent_model_version()
+        found = {m: nlu_cache.lookup("intent", settings.intent_backend, version, m) if nlu_cache else None for m in unique}
+        todo = [m for m in unique if found[m] is None]
+        if todo:
+            try:
+                preds = await inference.run("baseline", "predict_batch", todo)
+            except Exception:
+                return found
+            for m, pred in zip(todo, preds):
+                found[m] = pred
+                if nlu_cache is not None:
+                    nlu_cache.store("intent", settings.intent_backend, version, m, pred)
+        return found
+
+    async def extract_many(messages: list[str]) -> dict[str, ExtractedEntities]:
+        version = inference.version("ner")
+        found: dict[str, ExtractedEntities] = {}
+        todo: list[str] = []
+        for m in dict.fromkeys(messages):
+            cached = nlu_cache.lookup("entities", "ner", version, m) if nlu_cache is not None else None
+            if cached is None:
+                todo.append(m)
+            else:
+                found[m] = cached
+        if todo:
+            try:
+                extracted = await inference.run("ner", "extract_many", todo)
+            except Exception:
+                return found  # the engine extracts the rest one message at a time
+            for m, ents in zip(todo, extracted):
+                found[m] = ents
+                if nlu_cache is not None:
+                    nlu_cache.store("entities", "ner", version, m, ents)
+        return found
+
+    engine = DecisionEngine(
+        memory=memory,
+        extractor=extractor,
+        api_client=api_client,
+        cutoff_snapshot=cutoff_snapshot,
+        inference=inference,
+        nlu_cache=nlu_cache,
+    )
+
+    @asynccontextmanager
+    async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+        # One pooled downstream client per worker, kept alive for the app's lifetime
+        await api_client.start()
+        if cutoff_snapshot is not None:
+            cutoff_snapshot.start()
+        try:
+            yield
+        finally:
+            await engine.aclose()
+            if bert_batcher is not None:
+                await bert_batcher.stop()
+            if cutoff_snapshot is not None:
+                await cutoff_snapshot.stop()
+            await api_client.aclose()
+            await memory.aclose()
+            inference.shutdown()
+
+    app = FastAPI(title=settings.service_name, lifespan=lifespan)
+    app.state.api_client = api_client
+    app.state.memory = memory
 
     @app.get("/health")
     async def health() -> dict[str, str]:
         return {"status": "ok", "service": settings.service_name}
 
+    @app.get("/health/inference")
+    async def inference_health() -> dict[str, Any]:
+        stats = inference.stats()
+        stats["bert_batching"] = bert_batcher.stats() if bert_batcher is not None else None
+        stats["cascade"] = cascade.stats() if cascade is not None else None
+        stats["nlu_cache"] = nlu_cache.stats() if nlu_cache is not None else None
+        return stats
+
+    if settings.enable_debug:
+
+        @app.post("/admin/reload-models")
+        async def reload_models() -> dict[str, Any]:
+            # Reload the serving models from disk; cached NLU results for them are invalidated
+            backends = ["baseline", *([transformer_backend] if transformer_backend else []), "ner"]
+            reloaded: dict[str, Any] = {}
+            for backend in backends:
+                try:
+                    await inference.reload(backend)
+                    reloaded[backend] = {"ok": True, "version": inference.version(backend)}
+                except Exception as e:
+                    reloaded[backend] = {"ok": False, "error": str(e), "version": inference.version(backend)}
+            return reloaded
+
+    @app.get("/health/memory")
+    async def memory_health() -> dict[str, Any]:
+        return memory.stats()
+
+    @app.get("/health/downstream")
+    async def downstream_health() -> dict[str, Any]:
+        return {
+            "endpoints": api_client.resilience_state(),
+            "coalesced_requests": api_client.coalesced_requests,
+            "cache": api_client.cache.stats() if api_client.cache is not None else None,
+            "cutoff_snapshot": cutoff_snapshot.stats() if cutoff_snapshot is not None else None,
+            "prefetch": engine.prefetch_stats(),
+        }
+
     @app.post("/chat", response_model=ChatResponse)
     async def chat(
         req: ChatRequest,
         cookie: str | None = Header(default=None),
         authorization: str | None = Header(default=None),
+        x_latency_budget_ms: str | None = Header(default=None),
     ) -> dict[str, Any]:
+        deadline = Deadline.from_header(x_latency_budget_ms)
         message = normalize_whitespace(req.message)
 
         # 1) quick rule intent (very fast + robust)
         rule_intent = _simple_rules_intent(message)
 
-        # 2) model intent
-        intent = "fallback_unknown"
-        confidence = 0.25
-        try:
-            if settings.intent_backend == "bert":
-                pred = bert.predict(message)
-            else:
-                pred = baseline.predict(message)
-            intent = pred.intent
-            confidence = pred.confidence
-        except Exception:
-            # If model artifacts are missing, fall back to rules
-            pass
-
-        # 3) Blend: if model is low-confidence, use rule intent if available
-        if confidence < 0.55 and rule_intent is not None:
-            intent = rule_intent
-            confidence = max(confidence, 0.6)
-
-        if intent not in SUPPORTED_INTENTS:
-            intent = "fallback_unknown"
-
-        downstream_headers: dict[str, str] | None = None
-        if cookie or authorization:
-            downstream_headers = {}
-            if cookie:
-                downstream_headers["cookie"] = cookie
-            if authorization:
-                downstream_headers["authorization"] = authorization
+        # 2) model intent, 3) blended with the rule intent
+        intent, confidence = _blend_intent(await classify(message), rule_intent)
 
         result = await engine.handle(
             user_id=req.user_id,
@@ -130,10 +351,182 @@ def create_app() -> FastAPI:
             intent=intent,
             intent_confidence=confidence,
             language=req.language,
-            downstream_headers=downstream_headers,
+            downstream_headers=_downstream_headers(cookie, authorization),
+            deadline=deadline,
+            cursor=req.cursor,
         )
         return result
 
+    @app.post("/chat/stream")
+    async def chat_stream(
+        req: ChatRequest,
+        cookie: str | None = Header(default=None),
+        authorization: str | None = Header(default=None),
+        x_latency_budget_ms: str | None = Header(default=None),
+    ) -> StreamingResponse:
+        """
+        `/chat` as Server-Sent Events, so the widget can render while downstream calls are in flight:
+        `nlu` (intent + entities), then `clarification` or `progress`, one `result` per ranked row,
+        and `final` with the full ChatResponse (or `error`).
+        """
+        deadline = Deadline.from_header(x_latency_budget_ms)
+        message = normalize_whitespace(req.message)
+        downstream_headers = _downstream_headers(cookie, authorization)
+        events: asyncio.Queue[tuple[str, dict[str, Any]] | None] = asyncio.Queue()
+
+        async def progress(event: str, data: dict[str, Any]) -> None:
+            events.put_nowait((event, data))
+
+        async def run_turn() -> None:
+            try:
+                intent, confidence = _blend_intent(await classify(message), _simple_rules_intent(message))
+                result = await engine.handle(
+                    user_id=req.user_id,
+                    session_id=req.session_id,
+                    message=message,
+                    intent=intent,
+                    intent_confidence=confidence,
+                    language=req.language,
+                    downstream_headers=downstream_headers,
+                    deadline=deadline,
+                    cursor=req.cursor,
+                    progress=progress,
+                )
+                events.put_nowait(("final", ChatResponse.model_validate(result).model_dump()))
+            except Exception as e:
+                events.put_nowait(("error", {"error": str(e) or type(e).__name__}))
+            finally:
+                events.put_nowait(None)
+
+        async def stream() -> AsyncIterator[str]:
+            task = asyncio.create_task(run_turn())
+            try:
+                while (item := await events.get()) is not None:
+                    event, data = item
+                    yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+            finally:
+                task.cancel()
+
+        return StreamingResponse(
+            stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.websocket("/ws/chat")
+    async def chat_socket(
+        websocket: WebSocket,
+        user_id: str = Query(..., min_length=1),
+        session_id: str | None = None,
+        language: Literal["en", "ta"] = "en",
+    ) -> None:
+        """
+        Persistent chat channel bound to one `(user_id, session_id)`.
+        Downstream auth headers are resolved at the handshake and reused by every turn. The session
+        is re-read through the memory store each turn (an L1 hit, or one backend round trip that
+        skips decoding when unchanged), so turns sent through `/chat` or another worker are kept.
+        Each client frame is a `ChatTurn`; the server pushes `{"turn", "event", "data"}` frames
+        with the `/chat/stream` events, ending each turn with `final` (or `error`).
+        """
+        downstream_headers = _downstream_headers(websocket.headers.get("cookie"), websocket.headers.get("authorization"))
+        await websocket.accept()
+        turn = 0
+
+        async def push(event: str, data: dict[str, Any]) -> None:
+            await websocket.send_json({"turn": turn, "event": event, "data": data})
+
+        try:
+            while True:
+                raw = await websocket.receive_text()
+                turn += 1
+                try:
+                    msg = ChatTurn.model_validate_json(raw)
+                except ValueError as e:
+                    await push("error", {"error": str(e)})
+                    continue
+                message = normalize_whitespace(msg.message)
+                try:
+                    intent, confidence = _blend_intent(await classify(message), _simple_rules_intent(message))
+                    result = await engine.handle(
+                        user_id=user_id,
+                        session_id=session_id,
+                        message=message,
+                        intent=intent,
+                        intent_confidence=confidence,
+                        language=msg.language or language,
+                        downstream_headers=downstream_headers,
+                        deadline=Deadline.from_header(None),
+                        cursor=msg.cursor,
+                        progress=push,
+                    )
+                except WebSocketDisconnect:
+                    raise
+                except Exception as e:
+                    await push("error", {"error": str(e) or type(e).__name__})
+                    continue
+                await push("final", ChatResponse.model_validate(result).model_dump())
+        except WebSocketDisconnect:
+            return
+
+    @app.post("/chat/batch")
+    async def chat_batch(
+        body: ChatBatchRequest,
+        cookie: str | None = Header(default=None),
+        authorization: str | None = Header(default=None),
+        x_latency_budget_ms: str | None = Header(default=None),
+    ) -> StreamingResponse:
+        """
+        Bulk chat turns, streamed back as NDJSON in completion order: one
+        `{"index", "ok", "response" | "error"}` line per request.
+        NLU runs batched before the response starts; each session's messages run in order, sessions
+        run concurrently, and identical downstream payloads are coalesced by the API client.
+        `X-Latency-Budget-Ms` applies to each turn.
+        """
+        downstream_headers = _downstream_headers(cookie, authorization)
+        messages = [normalize_whitespace(r.message) for r in body.requests]
+        sessions: dict[str, list[int]] = {}
+        for i, r in enumerate(body.requests):
+            sessions.setdefault(memory.key(r.user_id, r.session_id), []).append(i)
+        slots = asyncio.Semaphore(max(1, settings.chat_batch_max_concurrency))
+        lines: asyncio.Queue[str] = asyncio.Queue()
+
+        async def run_session(indexes: list[int], preds: dict[str, Any], ents: dict[str, ExtractedEntities]) -> None:
+            async with slots:
+                for i in indexes:
+                    req, message = body.requests[i], messages[i]
+                    try:
+                        intent, confidence = _blend_intent(preds.get(message), _simple_rules_intent(message))
+                        result = await engine.handle(
+                            user_id=req.user_id,
+                            session_id=req.session_id,
+                            message=message,
+                            intent=intent,
+                            intent_confidence=confidence,
+                            language=req.language,
+                            downstream_headers=downstream_headers,
+                            deadline=Deadline.from_header(x_latency_budget_ms),
+                            cursor=req.cursor,
+                            entities=dataclasses.replace(ents[message]) if message in ents else None,
+                        )
+                        line = {"index": i, "ok": True, "response": ChatResponse.model_validate(result).model_dump()}
+                    except Exception as e:
+                        line = {"index": i, "ok": False, "error": str(e) or type(e).__name__}
+                    lines.put_nowait(json.dumps(line, ensure_ascii=False) + "\n")
+
+        # before the 200 goes out, so an NLU failure can't leave a truncated stream
+        preds, ents = await asyncio.gather(classify_many(messages), extract_many(messages))
+
+        async def stream() -> AsyncIterator[str]:
+            tasks = [asyncio.create_task(run_session(indexes, preds, ents)) for indexes in sessions.values()]
+            try:
+                for _ in messages:
+                    yield await lines.get()
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
     return app
 
 
@@ -1,12 +1,55 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import Any
+import hashlib
+import json
+import sys
+from dataclasses import dataclass
+from typing import Any, Callable
 
 from cachetools import TTLCache
 
+from session_backend import SessionBackend, SessionBackendError
+from utils import pct
 
-@dataclass
+
+# Column order of the compact rows kept for paging
+RESULT_ROW_FIELDS = ("college", "branch", "location", "probability", "classification", "last_year_cutoff")
+
+# Low-cardinality session fields; their values are interned so every session shares one copy
+INTERNED_FIELDS = frozenset({"category", "preferred_branch", "location", "gender_quota", "last_intent"})
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@dataclass(slots=True)
+class RankedResults:
+    """
+    Ranked recommendation rows kept in the session so "show more" pages are served locally.
+    Rows are plain tuples in `RESULT_ROW_FIELDS` order; `set_id` ties cursors to this result set.
+    """
+
+    set_id: str
+    rows: tuple[tuple[Any, ...], ...]
+    next_offset: int = 0
+
+    @classmethod
+    def from_results(cls, set_id: str, results: list[dict[str, Any]], max_rows: int) -> "RankedResults":
+        # college/branch/location/label strings repeat across sessions: interned, they are stored once
+        rows = tuple(tuple(_intern(r.get(f)) for f in RESULT_ROW_FIELDS) for r in results[: max(0, max_rows)])
+        return cls(set_id=set_id, rows=rows)
+
+    def page(self, offset: int, size: int) -> list[dict[str, Any]]:
+        out = []
+        for row in self.rows[offset : offset + size]:
+            item = dict(zip(RESULT_ROW_FIELDS, row))
+            item["probability_percent"] = pct(float(item["probability"] or 0.0))
+            out.append(item)
+        return out
+
+
+@dataclass(slots=True)
 class SessionState:
     cutoff_score: float | None = None
     category: str | None = None
@@ -15,24 +58,211 @@ class SessionState:
     gender_quota: str | None = None
     first_graduate_quota: bool | None = None
     last_intent: str | None = None
-    # free-form bag for future signals
-    extras: dict[str, Any] = field(default_factory=dict)
+    # last recommendation list, for cursor-based paging
+    ranked_results: RankedResults | None = None
+    # free-form bag for future signals; None until first used
+    extras: dict[str, Any] | None = None
+
+
+_FLOAT_BYTES = sys.getsizeof(0.0)
+# Amortized cost of one dict entry (hash index + entry + growth headroom), measured on this interpreter
+_DICT_SLOT_BYTES = -(-sys.getsizeof(dict.fromkeys(range(1024))) // 1024)
+# Session cache bookkeeping per key: cachetools' TTL link (a 4-slot object, 64 bytes on CPython 3.11),
+# one slot in each of its three dicts (values, sizes, links) and the boxed size it records
+_ENTRY_OVERHEAD_BYTES = 64 + 3 * _DICT_SLOT_BYTES + sys.getsizeof(2**20)
+# With a shared backend, the L1 also keeps each session's last blob digest (plus its own key copy)
+_DIGEST_ENTRY_BYTES = sys.getsizeof(bytes(16)) + _DICT_SLOT_BYTES
+
+
+def session_bytes(state: SessionState) -> int:
+    """
+    Approximate resident size of one session object, for the store's byte budget.
+    Interned strings are shared by every session, so only per-session objects are counted.
+    """
+    size = sys.getsizeof(state)
+    if state.cutoff_score is not None:
+        size += _FLOAT_BYTES
+    ranked = state.ranked_results
+    if ranked is not None:
+        size += sys.getsizeof(ranked) + sys.getsizeof(ranked.set_id) + sys.getsizeof(ranked.rows)
+        for row in ranked.rows:
+            size += sys.getsizeof(row) + _FLOAT_BYTES * sum(1 for v in row if isinstance(v, float))
+    if state.extras:
+        size += sys.getsizeof(state.extras)
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in state.extras.items())
+    return size
+
+
+# Version tag leading every serialized session
+SESSION_FORMAT = 1
+
+
+def encode_state(state: SessionState) -> bytes:
+    """Compact positional JSON for the shared backend (no field names; ranked rows stay tuples of values)."""
+    ranked = state.ranked_results
+    packed = [
+        SESSION_FORMAT,
+        state.cutoff_score,
+        state.category,
+        state.preferred_branch,
+        state.location,
+        state.gender_quota,
+        state.first_graduate_quota,
+        state.last_intent,
+        [ranked.set_id, ranked.next_offset, ranked.rows] if ranked is not None else None,
+        state.extras or None,
+    ]
+    return json.dumps(packed, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def decode_state(blob: bytes) -> SessionState:
+    packed = json.loads(blob)
+    if not isinstance(packed, list) or not packed or packed[0] != SESSION_FORMAT:
+        raise ValueError("unsupported session format")
+    _, cutoff, category, branch, location, gender, first_graduate, last_intent, ranked, extras = packed
+    return SessionState(
+        cutoff_score=cutoff,
+        category=_intern(category),
+        preferred_branch=_intern(branch),
+        location=_intern(location),
+        gender_quota=_intern(gender),
+        first_graduate_quota=first_graduate,
+        last_intent=_intern(last_intent),
+        ranked_results=(
+            RankedResults(
+                set_id=ranked[0], next_offset=ranked[1], rows=tuple(tuple(map(_intern, row)) for row in ranked[2])
+            )
+            if ranked is not None
+            else None
+        ),
+        extras=extras or None,
+    )
+
+
+def _digest(blob: bytes) -> bytes:
+    return hashlib.blake2b(blob, digest_size=16).digest()
+
+
+class _SessionCache(TTLCache):
+    """
+    TTLCache bounded by estimated bytes (`maxsize`) and by session count (`max_entries`),
+    that reports every key it drops (TTL expiry or eviction).
+    An entry's size is its session, its key string(s) and the per-entry bookkeeping.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: int,
+        on_evict: Callable[[str], None],
+        max_entries: int,
+        entry_overhead: int = _ENTRY_OVERHEAD_BYTES,
+        key_copies: int = 1,
+    ):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self._on_evict = on_evict
+        self.max_entries = max(1, max_entries)
+        self.entry_overhead = entry_overhead
+        self.key_copies = key_copies
+        self._sizing_key = ""
+        self.expirations = 0
+        self.evictions = 0
+        self.trimmed = 0
+        self.rejected = 0
+
+    def getsizeof(self, value: SessionState) -> int:
+        # cachetools only passes the value; __setitem__ records which key is being sized
+        return session_bytes(value) + self.key_copies * sys.getsizeof(self._sizing_key) + self.entry_overhead
+
+    def __setitem__(self, key, value):
+        self._sizing_key = key
+        if self.getsizeof(value) > self.maxsize and (value.ranked_results is not None or value.extras):
+            # larger than the whole budget: keep the profile, drop the stored list (a "show more" searches again)
+            value.ranked_results = None
+            value.extras = None
+            self.trimmed += 1
+        if self.getsizeof(value) > self.maxsize:
+            # not even a bare session fits: leave it uncached rather than fail the turn
+            self.pop(key, None)
+            self.rejected += 1
+            return
+        if key not in self:
+            while len(self) >= self.max_entries:
+                self.popitem()
+        super().__setitem__(key, value)
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        for key, _ in expired or ():
+            self.expirations += 1
+            self._on_evict(key)
+        return expired
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.evictions += 1
+        self._on_evict(key)
+        return key, value
+
+
+# Count cap when neither MEMORY_MAX_SESSIONS nor a byte budget bounds the in-process sessions
+DEFAULT_MAX_SESSIONS = 5000
 
 
 class MemoryStore:
     """
     Session memory keyed by (user_id, session_id).
-    - In production you can swap this for Redis without changing the interface.
+    - With a shared `backend` (e.g. Redis), `load()` reads a session at the start of a turn and
+      `persist()` writes it back at the end, so any worker can serve the next turn; the in-process
+      cache stays in front as L1 and serves every read within the turn
+    - A blob identical to the one this worker last saw is neither decoded nor written again
+    - If the backend fails, the turn carries on with this worker's copy
+    - The longest-idle sessions are evicted to stay within `max_bytes` of estimated memory (session
+      object, key and cache bookkeeping) and, when set, `max_sessions`. `max_sessions=0` means no count
+      cap under a byte budget, and `DEFAULT_MAX_SESSIONS` without one. Sizes are re-measured whenever
+      a session is written back (`persist`/`save`/`update`); a session larger than the whole budget
+      loses its stored recommendation list instead of failing the turn
+    - Expiry is lazy (checked on writes); listeners are told when a session is dropped.
     """
 
-    def __init__(self, max_sessions: int, ttl_seconds: int):
-        self._cache: TTLCache[str, SessionState] = TTLCache(maxsize=max_sessions, ttl=ttl_seconds)
+    def __init__(
+        self, max_sessions: int, ttl_seconds: int, backend: SessionBackend | None = None, max_bytes: int = 0
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self.max_bytes = max(0, max_bytes)
+        self._expiry_listeners: list[Callable[[str], None]] = []
+        self._cache: _SessionCache = _SessionCache(
+            maxsize=self.max_bytes or sys.maxsize,
+            ttl=ttl_seconds,
+            on_evict=self._notify_expired,
+            max_entries=max_sessions or (sys.maxsize if self.max_bytes else DEFAULT_MAX_SESSIONS),
+            entry_overhead=_ENTRY_OVERHEAD_BYTES + (_DIGEST_ENTRY_BYTES if backend is not None else 0),
+            key_copies=2 if backend is not None else 1,
+        )
+        # digest of the last blob read from / written to the backend, per L1 session
+        self._blobs: dict[str, bytes] = {}
+        self.backend_reads = 0
+        self.backend_writes = 0
+        self.backend_errors = 0
 
     @staticmethod
     def _key(user_id: str, session_id: str | None) -> str:
         sid = session_id or "default"
         return f"{user_id}::{sid}"
 
+    def key(self, user_id: str, session_id: str | None = None) -> str:
+        return self._key(user_id, session_id)
+
+    def add_expiry_listener(self, listener: Callable[[str], None]) -> None:
+        """`listener(session_key)` is called whenever a session expires or is evicted."""
+        self._expiry_listeners.append(listener)
+
+    def _notify_expired(self, key: str) -> None:
+        self._blobs.pop(key, None)
+        for listener in self._expiry_listeners:
+            listener(key)
+
     def get(self, user_id: str, session_id: str | None = None) -> SessionState:
         key = self._key(user_id, session_id)
         state = self._cache.get(key)
@@ -41,10 +271,95 @@ class MemoryStore:
             self._cache[key] = state
         return state
 
-    def update(self, user_id: str, session_id: str | None, **kwargs) -> SessionState:
-        state = self.get(user_id, session_id)
+    def save(self, user_id: str, session_id: str | None, state: SessionState) -> None:
+        """(Re)store `state`: restarts its TTL and re-measures its size against the byte budget."""
+        self._cache[self._key(user_id, session_id)] = state
+
+    @staticmethod
+    def apply(state: SessionState, **kwargs) -> SessionState:
+        """Set the given fields on `state`, skipping unknown names and None values."""
         for k, v in kwargs.items():
             if hasattr(state, k) and v is not None:
-                setattr(state, k, v)
+                setattr(state, k, _intern(v) if k in INTERNED_FIELDS else v)
         return state
 
+    def update(self, user_id: str, session_id: str | None, **kwargs) -> SessionState:
+        state = self.apply(self.get(user_id, session_id), **kwargs)
+        self.save(user_id, session_id, state)
+        return state
+
+    async def load(self, user_id: str, session_id: str | None = None) -> SessionState:
+        """Session for a new turn: the backend's copy (one pipelined read + TTL refresh), else L1."""
+        if self.backend is None:
+            return self.get(user_id, session_id)
+        key = self._key(user_id, session_id)
+        try:
+            blob = await self.backend.fetch(key, self.ttl_seconds)
+        except SessionBackendError:
+            self.backend_errors += 1
+            return self.get(user_id, session_id)
+        self.backend_reads += 1
+        current = self._cache.get(key)
+        if blob is None or (current is not None and self._blobs.get(key) == _digest(blob)):
+            return self.get(user_id, session_id)
+        try:
+            state = decode_state(blob)
+        except (ValueError, TypeError, IndexError):  # corrupt or foreign blob: keep this worker's copy
+            self.backend_errors += 1
+            return self.get(user_id, session_id)
+        self._cache[key] = state
+        self._blobs[key] = _digest(blob)
+        return state
+
+    async def persist(self, user_id: str, session_id: str | None, state: SessionState) -> None:
+        """End of turn: keep `state` in L1 (restarting its TTL) and write it to the backend if it changed."""
+        self.save(user_id, session_id, state)
+        if self.backend is None:
+            return
+        key = self._key(user_id, session_id)
+        blob = encode_state(state)
+        digest = _digest(blob)
+        if self._blobs.get(key) == digest:
+            return
+        try:
+            await self.backend.store(key, blob, self.ttl_seconds)
+        except SessionBackendError:
+            self.backend_errors += 1
+            return
+        self.backend_writes += 1
+        self._blobs[key] = digest
+
+    async def aclose(self) -> None:
+        if self.backend is not None:
+            await self.backend.aclose()
+
+    def memory_bytes(self) -> int:
+        """Estimated resident size of every session held, including keys and cache bookkeeping."""
+        return int(self._cache.currsize)
+
+    def stats(self) -> dict[str, Any]:
+        sessions = len(self._cache)
+        used = self.memory_bytes()
+        return {
+            "sessions": sessions,
+            "max_sessions": self._cache.max_entries if self._cache.max_entries < sys.maxsize else None,
+            "bytes": used,
+            "max_bytes": self.max_bytes or None,
+            "avg_session_bytes": round(used / sessions) if sessions else None,
+            "evictions": self._cache.evictions,
+            "expirations": self._cache.expirations,
+            "trimmed": self._cache.trimmed,
+            "rejected": self._cache.rejected,
+            "ttl_seconds": self.ttl_seconds,
+            "backend": (
+                {
+                    "type": type(self.backend).__name__,
+                    "reads": self.backend_reads,
+                    "writes": self.backend_writes,
+                    "errors": self.backend_errors,
+                }
+                if self.backend is not None
+                else None
+            ),
+        }
+
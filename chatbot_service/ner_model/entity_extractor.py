@@ -1,20 +1,26 @@
 from __future__ import annotations
 
+import multiprocessing
 import re
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, asdict
-
-import spacy
-from spacy.language import Language
-from spacy.pipeline import EntityRuler
+from typing import TYPE_CHECKING, Any, Iterable
 
 from utils import (
+    BRANCH_ALIASES,
+    CATEGORIES,
+    DISTRICT_ALIASES,
+    GENDER_ALIASES,
     canon_branch,
     canon_category,
-    canon_college_type,
     canon_location,
     detect_first_graduate,
 )
 
+if TYPE_CHECKING:
+    from spacy.language import Language
+
 
 SUPPORTED_BRANCH_HINTS = [
     "cse",
@@ -26,6 +32,38 @@ SUPPORTED_BRANCH_HINTS = [
     "civil",
 ]
 
+# College-type hints in precedence order (an earlier type wins when several appear)
+COLLEGE_TYPE_HINTS = {
+    "Government": ("govt", "government"),
+    "Autonomous": ("autonomous", "auto"),
+    "Private": ("private",),
+}
+# Gender hints in precedence order
+GENDER_PRECEDENCE = ("female", "male")
+
+
+def _build_gazetteer() -> dict[str, tuple[str, str]]:
+    """Lowercased surface form -> (entity kind, canonical value), compiled from the `utils` alias tables."""
+    terms: dict[str, tuple[str, str]] = {}
+    for cat in CATEGORIES:
+        terms[cat.lower()] = ("category", cat)
+    for canon, aliases in BRANCH_ALIASES.items():
+        for alias in {canon.lower(), *aliases}:
+            terms[alias] = ("branch", canon)
+    for canon, aliases in DISTRICT_ALIASES.items():
+        for alias in {canon, *aliases}:
+            terms[alias] = ("district", canon.title())
+    for canon, hints in COLLEGE_TYPE_HINTS.items():
+        for hint in hints:
+            terms[hint] = ("college_type", canon)
+    for canon, aliases in GENDER_ALIASES.items():
+        for alias in aliases:
+            terms[alias] = ("gender_quota", canon)
+    return terms
+
+
+GAZETTEER = _build_gazetteer()
+
 
 @dataclass
 class ExtractedEntities:
@@ -46,90 +84,88 @@ class ExtractedEntities:
 class EntityExtractor:
     """
     Hybrid entity extraction:
-    - Regex for numeric cutoff
-    - spaCy EntityRuler for categories/branches/locations hints
-    - Post-processing canonicalization
+    - One combined regex scans the message once for cutoff, round and every gazetteer term
+      (categories, branch aliases, districts, college-type and gender hints from `utils`)
+    - Precompiled heuristics for "in <place>" locations and college names
+    - A trained spaCy model (only when `spacy_model_path` is set) fills branch/category/location
     """
 
-    CUTOFF_RE = re.compile(r"(?<!\d)(\d{2,3}(?:\.\d{1,2})?)(?!\d)\s*(?:cutoff|cut off|mark|marks)?", re.I)
-    ROUND_RE = re.compile(r"(?:round|rnd)\s*(1|2|3)\b", re.I)
-    CATEGORY_RE = re.compile(r"\b(OC|BCM|BC|MBC|SC|ST|SCA)\b", re.I)
-    # gender hints
-    FEMALE_RE = re.compile(r"\b(female|girls|women)\b", re.I)
-    MALE_RE = re.compile(r"\b(male|boys|men)\b", re.I)
-    # college type hints
-    GOVT_RE = re.compile(r"\b(govt|government)\b", re.I)
-    AUTO_RE = re.compile(r"\b(autonomous|auto)\b", re.I)
-    PRIV_RE = re.compile(r"\b(private)\b", re.I)
+    # Longest terms first so "computer science and engineering" wins over "computer science"
+    SCAN_RE = re.compile(
+        r"(?P<cutoff>(?<!\d)\d{2,3}(?:\.\d{1,2})?(?!\d))"
+        r"|(?:round|rnd)\s*(?P<round>[123])\b"
+        r"|(?<!\w)(?P<term>"
+        + "|".join(re.escape(t) for t in sorted(GAZETTEER, key=len, reverse=True))
+        + r")(?!\w)",
+        re.I,
+    )
+    LOCATION_HINT_RE = re.compile(r"\b(in|at|near)\s+([A-Za-z][A-Za-z .'-]{2,40})\b", re.I)
+    QUOTED_NAME_RE = re.compile(r"\"([^\"]{3,80})\"")
+    COLLEGE_NAME_RE = re.compile(
+        r"\b([A-Za-z][A-Za-z .'-]{2,80}\b(?:college|institute|university)\b[ A-Za-z.&'-]{0,40})", re.I
+    )
 
     def __init__(self, spacy_model_path: str | None = None):
-        self._nlp: Language = self._build_nlp(spacy_model_path)
-
-    def _build_nlp(self, spacy_model_path: str | None) -> Language:
-        if spacy_model_path:
-            return spacy.load(spacy_model_path)
-        nlp = spacy.blank("en")
-        ruler: EntityRuler = nlp.add_pipe("entity_ruler")  # type: ignore[assignment]
-        patterns = []
-
-        # category patterns
-        for cat in ["OC", "BC", "BCM", "MBC", "SC", "ST", "SCA"]:
-            patterns.append({"label": "CATEGORY", "pattern": [{"TEXT": {"REGEX": f"^{cat}$"}}]})
-
-        # branch patterns (simple hints)
-        for b in ["CSE", "ECE", "IT", "AI&DS", "MECH", "CIVIL"]:
-            patterns.append({"label": "BRANCH", "pattern": b})
-        patterns.append({"label": "BRANCH", "pattern": [{"LOWER": "aids"}]})
-        patterns.append({"label": "BRANCH", "pattern": [{"LOWER": "ai"}, {"TEXT": "&"}, {"LOWER": "ds"}]})
-
-        # basic location hints (can be expanded)
-        for loc in ["Chennai", "Coimbatore", "Madurai", "Trichy", "Salem"]:
-            patterns.append({"label": "LOCATION", "pattern": loc})
-
-        ruler.add_patterns(patterns)
-        return nlp
-
-    def extract(self, text: str) -> ExtractedEntities:
-        t = text or ""
-        doc = self._nlp(t)
-
-        out = ExtractedEntities()
-
-        # Regex first: cutoff, category, round
-        m = self.CUTOFF_RE.search(t)
-        if m:
-            try:
-                out.cutoff_score = float(m.group(1))
-            except Exception:
-                pass
-
-        m = self.CATEGORY_RE.search(t)
-        if m:
-            out.category = canon_category(m.group(1))
-
-        m = self.ROUND_RE.search(t)
-        if m:
-            out.round_number = int(m.group(1))
-
-        # Gender quota
-        if self.FEMALE_RE.search(t):
-            out.gender_quota = "female"
-        elif self.MALE_RE.search(t):
-            out.gender_quota = "male"
-
-        # First graduate
-        out.first_graduate_quota = detect_first_graduate(t)
-
-        # College type
-        if self.GOVT_RE.search(t):
-            out.college_type = "Government"
-        elif self.AUTO_RE.search(t):
-            out.college_type = "Autonomous"
-        elif self.PRIV_RE.search(t):
-            out.college_type = "Private"
-
-        # spaCy ruler entities
-        for ent in doc.ents:
+        self.spacy_model_path = spacy_model_path
+        self._nlp: Language | None = self._build_nlp(spacy_model_path)
+
+    def _build_nlp(self, spacy_model_path: str | None) -> Language | None:
+        if not spacy_model_path:
+            return None
+        import spacy
+
+        return spacy.load(spacy_model_path)
+
+    def reload(self) -> None:
+        self._nlp = self._build_nlp(self.spacy_model_path)
+
+    def _scan_many(self, texts: list[str]) -> list[ExtractedEntities]:
+        """
+        Run the combined scanner over a whole batch at once: texts are joined with NUL (which no
+        pattern can cross) and each match is mapped back to its text by offset.
+        """
+        outs = [ExtractedEntities() for _ in texts]
+        college_types: list[set[str]] = [set() for _ in texts]
+        genders: list[set[str]] = [set() for _ in texts]
+        starts: list[int] = []
+        offset = 0
+        for t in texts:
+            starts.append(offset)
+            offset += len(t) + 1
+        buffer = "\0".join(t.replace("\0", " ") for t in texts)
+
+        for m in self.SCAN_RE.finditer(buffer):
+            i = bisect_right(starts, m.start()) - 1
+            out = outs[i]
+            if m.lastgroup == "cutoff":
+                if out.cutoff_score is None:
+                    out.cutoff_score = float(m.group("cutoff"))
+                continue
+            if m.lastgroup == "round":
+                if out.round_number is None:
+                    out.round_number = int(m.group("round"))
+                continue
+            word = m.group("term")
+            kind, value = GAZETTEER[word.lower()]
+            if kind == "branch" and len(word) <= 2 and not word.isupper():
+                # "it", "ai", "cs" are ordinary words unless written as codes
+                continue
+            if kind == "college_type":
+                college_types[i].add(value)
+            elif kind == "gender_quota":
+                genders[i].add(value)
+            elif getattr(out, kind) is None:
+                setattr(out, kind, value)
+
+        for out, types, gender in zip(outs, college_types, genders):
+            out.college_type = next((c for c in COLLEGE_TYPE_HINTS if c in types), None)
+            out.gender_quota = next((g for g in GENDER_PRECEDENCE if g in gender), None)
+        return outs
+
+    @staticmethod
+    def _apply_ents(out: ExtractedEntities, ents: Iterable[Any]) -> None:
+        # Custom NER model entities fill whatever the gazetteer did not find
+        for ent in ents:
             if ent.label_ == "BRANCH" and out.branch is None:
                 out.branch = canon_branch(ent.text)
             elif ent.label_ == "CATEGORY" and out.category is None:
@@ -137,25 +173,61 @@ class EntityExtractor:
             elif ent.label_ == "LOCATION" and out.district is None:
                 out.district = canon_location(ent.text)
 
+    def _finish(self, out: ExtractedEntities, t: str) -> ExtractedEntities:
+        out.first_graduate_quota = detect_first_graduate(t)
+
         # Heuristic location: "in Chennai", "at Coimbatore"
-        loc_match = re.search(r"\b(in|at|near)\s+([A-Za-z][A-Za-z .'-]{2,40})\b", t, re.I)
-        if loc_match and out.district is None:
-            out.district = canon_location(loc_match.group(2))
+        if out.district is None:
+            loc_match = self.LOCATION_HINT_RE.search(t)
+            if loc_match:
+                out.district = canon_location(loc_match.group(2))
 
         # College name heuristic: quoted or contains "College"
-        college_match = re.search(r"\"([^\"]{3,80})\"", t)
+        college_match = self.QUOTED_NAME_RE.search(t)
         if college_match:
             out.college_name = college_match.group(1).strip()
         else:
-            college_match = re.search(r"\b([A-Za-z][A-Za-z .'-]{2,80}\b(?:college|institute|university)\b[ A-Za-z.&'-]{0,40})", t, re.I)
+            college_match = self.COLLEGE_NAME_RE.search(t)
             if college_match:
                 out.college_name = college_match.group(1).strip()
 
-        # Canonicalize remaining fields
-        out.branch = canon_branch(out.branch)
-        out.category = canon_category(out.category)
-        out.college_type = canon_college_type(out.college_type)
-        out.district = canon_location(out.district)
-
         return out
 
+    def extract(self, text: str) -> ExtractedEntities:
+        t = text or ""
+        out = self._scan_many([t])[0]
+        if self._nlp is not None:
+            self._apply_ents(out, self._nlp(t).ents)
+        return self._finish(out, t)
+
+    def extract_many(self, texts: Iterable[str], batch_size: int = 256, n_process: int = 1) -> list[ExtractedEntities]:
+        """
+        Extract entities for many messages (offline log reprocessing, batch chat), in input order.
+        - The regex stage scans `batch_size` texts per pass; with `n_process > 1` chunks are
+          spread over worker processes
+        - A custom spaCy model runs through `nlp.pipe(batch_size=..., n_process=...)`
+        """
+        items = [t or "" for t in texts]
+        batch_size = max(1, batch_size)
+        chunks = [items[i : i + batch_size] for i in range(0, len(items), batch_size)]
+        if n_process > 1 and self._nlp is None and len(chunks) > 1:
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(n_process, len(chunks)), mp_context=ctx) as pool:
+                return [out for part in pool.map(_extract_chunk, chunks) for out in part]
+
+        outs = [out for chunk in chunks for out in self._scan_many(chunk)]
+        if self._nlp is not None:
+            docs = self._nlp.pipe(items, batch_size=batch_size, n_process=max(1, n_process))
+            for out, doc in zip(outs, docs):
+                self._apply_ents(out, doc.ents)
+        return [self._finish(out, t) for out, t in zip(outs, items)]
+
+
+_WORKER_EXTRACTOR: EntityExtractor | None = None
+
+
+def _extract_chunk(texts: list[str]) -> list[ExtractedEntities]:
+    global _WORKER_EXTRACTOR
+    if _WORKER_EXTRACTOR is None:
+        _WORKER_EXTRACTOR = EntityExtractor()
+    return _WORKER_EXTRACTOR.extract_many(texts, batch_size=len(texts) or 1)
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import dataclasses
+from typing import Any, Awaitable, Callable
+
+from cachetools import LRUCache
+
+
+KINDS = ("intent", "entities")
+
+
+class NluCache:
+    """
+    Bounded LRU memo of NLU results for repeated messages ("hi", "thanks", quick-reply chips).
+    - Intent keys use the lowercased normalized text: the intent models are case-insensitive
+    - Entity keys keep case, since the extractor's patterns and college names are case-sensitive
+    - Every key carries the backend name and model version, and `invalidate()` drops a backend's
+      entries when its model is reloaded
+    Cached entity objects are copied on the way in and out, so callers may mutate what they get.
+    """
+
+    def __init__(self, max_entries: int):
+        self._entries: LRUCache[tuple[str, str, str, str], Any] = LRUCache(maxsize=max(1, max_entries))
+        self.hits = {kind: 0 for kind in KINDS}
+        self.misses = {kind: 0 for kind in KINDS}
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(kind: str, backend: str, version: str, text: str) -> tuple[str, str, str, str]:
+        return (kind, backend, version, text.lower() if kind == "intent" else text)
+
+    def lookup(self, kind: str, backend: str, version: str, text: str) -> Any | None:
+        cached = self._entries.get(self._key(kind, backend, version, text))
+        if cached is None:
+            self.misses[kind] += 1
+            return None
+        self.hits[kind] += 1
+        return dataclasses.replace(cached) if kind == "entities" else cached
+
+    def store(self, kind: str, backend: str, version: str, text: str, value: Any) -> None:
+        self._entries[self._key(kind, backend, version, text)] = (
+            dataclasses.replace(value) if kind == "entities" else value
+        )
+
+    async def get_or_compute(
+        self, kind: str, backend: str, version: str, text: str, compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        cached = self.lookup(kind, backend, version, text)
+        if cached is not None:
+            return cached
+        value = await compute()
+        self.store(kind, backend, version, text, value)
+        return value
+
+    def invalidate(self, backend: str | None = None) -> None:
+        """Drop every entry, or those whose version involves `backend` (versions look like "name@gen:artifact|...")."""
+        if backend is None:
+            self._entries.clear()
+        else:
+            stale = [k for k in self._entries if backend in {part.split("@", 1)[0] for part in k[2].split("|")}]
+            for key in stale:
+                self._entries.pop(key, None)
+        self.invalidations += 1
+
+    def stats(self) -> dict[str, Any]:
+        total = {kind: self.hits[kind] + self.misses[kind] for kind in KINDS}
+        return {
+            "entries": len(self._entries),
+            "max_entries": self._entries.maxsize,
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "hit_rate": {kind: round(self.hits[kind] / total[kind], 4) if total[kind] else None for kind in KINDS},
+            "invalidations": self.invalidations,
+        }
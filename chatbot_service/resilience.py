@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import math
+import time
+from collections import deque
+from typing import Any
+
+from config import settings
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    - closed: calls flow; `failure_threshold` consecutive failures open the circuit
+    - open: calls fail fast until `reset_seconds` have passed
+    - half_open: a single probe call is let through; success closes, failure re-opens
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None
+        self.rejected = 0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if self.opened_at is not None and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+            else:
+                self.rejected += 1
+                return False
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """The probe was abandoned by our side (not answered): let the next call probe instead."""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "rejected": self.rejected,
+        }
+
+
+class RetryBudget:
+    """
+    Token bucket that bounds retries (and hedges) to a fraction of regular traffic.
+    Every request deposits `ratio` tokens, every retry withdraws one; a small
+    `min_per_second` trickle keeps retries possible on low-traffic endpoints.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.exhausted = 0
+        self._last_refill = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self._last_refill) * self.min_per_second)
+        self._last_refill = now
+
+    def deposit(self) -> None:
+        self._refill()
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        self._refill()
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        self.exhausted += 1
+        return False
+
+    def snapshot(self) -> dict[str, Any]:
+        self._refill()
+        return {"tokens": round(self.tokens, 2), "exhausted": self.exhausted}
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies (seconds)."""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        idx = min(len(ordered) - 1, max(0, math.ceil(q / 100.0 * len(ordered)) - 1))
+        return ordered[idx]
+
+
+class EndpointResilience:
+    """Breaker + retry budget + latency window for one downstream endpoint path."""
+
+    def __init__(self, path: str, hedge: bool = False):
+        self.path = path
+        self.hedge = hedge
+        self.breaker = CircuitBreaker(settings.breaker_failure_threshold, settings.breaker_reset_seconds)
+        self.budget = RetryBudget(settings.retry_budget_ratio, settings.retry_budget_min_per_second)
+        self.latency = LatencyTracker()
+        self.retries = 0
+        self.hedges = 0
+
+    def hedge_delay(self) -> float | None:
+        """Delay after which a duplicate request is sent, or None while hedging is off / still warming up."""
+        if not self.hedge or len(self.latency) < settings.hedge_min_samples:
+            return None
+        return self.latency.percentile(settings.hedge_percentile)
+
+    def snapshot(self) -> dict[str, Any]:
+        p50 = self.latency.percentile(50)
+        p95 = self.latency.percentile(95)
+        return {
+            "breaker": self.breaker.snapshot(),
+            "retry_budget": self.budget.snapshot(),
+            "retries": self.retries,
+            "hedging": self.hedge,
+            "hedges": self.hedges,
+            "latency_ms": {
+                "p50": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95": round(p95 * 1000, 1) if p95 is not None else None,
+                "samples": len(self.latency),
+            },
+        }
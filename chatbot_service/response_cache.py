@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass
+class CacheEntry:
+    data: Any
+    size: int
+    fresh_until: float
+    stale_until: float
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.fresh_until
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of successful downstream responses.
+    - Entries are fresh for their TTL, then kept for `stale_seconds` more so they can be
+      served while revalidating or when the backend errors
+    - Bounded by entry count and by the (JSON) byte size of the cached payloads
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, stale_seconds: float):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+        self.stale_seconds = stale_seconds
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> CacheEntry | None:
+        """Fresh or stale entry for `key` (LRU-touched), or None once it is past its stale window."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() >= entry.stale_until:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, data: Any, size: int, ttl_seconds: float) -> None:
+        if size > self.max_bytes:
+            return
+        now = time.monotonic()
+        self._drop(key)
+        self._entries[key] = CacheEntry(
+            data=data,
+            size=size,
+            fresh_until=now + ttl_seconds,
+            stale_until=now + ttl_seconds + self.stale_seconds,
+        )
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
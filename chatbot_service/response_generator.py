@@ -3,7 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Any
 
-from utils import pct
+from utils import pct, record_probability
 
 
 @dataclass(frozen=True)
@@ -31,13 +31,7 @@ def generate_college_recommendation_response(
     results: list[dict[str, Any]] = []
     for rec in recommendations:
         # Accept both {probability} and {matchScore} style payloads from downstream services
-        prob = rec.get("probability")
-        if prob is None:
-            match_score = rec.get("matchScore")
-            if isinstance(match_score, (int, float)):
-                prob = float(match_score) / 100.0
-        if prob is None:
-            prob = 0.5
+        prob = record_probability(rec)
 
         results.append(
             {
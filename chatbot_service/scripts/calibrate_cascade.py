@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from intent_cascade import calibrate_threshold  # noqa: E402
+from intent_model.baseline import BaselineIntentClassifier  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Pick CASCADE_CONFIDENCE_THRESHOLD: the lowest baseline confidence that reaches a target precision."
+    )
+    parser.add_argument(
+        "--data",
+        type=str,
+        default=str(Path(__file__).resolve().parents[1] / "data" / "intent_samples.csv"),
+        help="Labelled text,intent CSV; use messages the baseline was not trained on.",
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        default=str(Path(__file__).resolve().parents[1] / "intent_model" / "artifacts" / "baseline_intent.joblib"),
+    )
+    parser.add_argument("--target_precision", type=float, default=0.95)
+    parser.add_argument("--min_samples", type=int, default=5)
+    args = parser.parse_args()
+
+    texts: list[str] = []
+    intents: list[str] = []
+    with open(args.data, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None or "text" not in reader.fieldnames or "intent" not in reader.fieldnames:
+            raise ValueError("CSV must contain headers: text,intent")
+        for row in reader:
+            texts.append(str(row["text"]))
+            intents.append(str(row["intent"]))
+
+    preds = BaselineIntentClassifier(args.model).predict_batch(texts)
+    confidences = [p.confidence for p in preds]
+    correct = [p.intent == gold for p, gold in zip(preds, intents)]
+    threshold = calibrate_threshold(confidences, correct, args.target_precision, args.min_samples)
+    if threshold is None:
+        print(f"No threshold reaches precision {args.target_precision}; every message would escalate.")
+        return
+
+    accepted = [ok for conf, ok in zip(confidences, correct) if conf >= threshold]
+    print(f"CASCADE_CONFIDENCE_THRESHOLD={threshold:.4f}")
+    print(
+        f"baseline answers {len(accepted)}/{len(texts)} messages "
+        f"({len(accepted) / len(texts):.0%}) at precision {sum(accepted) / len(accepted):.3f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,21 @@ from __future__ import annotations
 
 import argparse
 import csv
+import sys
 from pathlib import Path
 
 import joblib
+import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import classification_report
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from intent_model.compiled import CompiledIntentClassifier, compiled_dir_for, export_compiled  # noqa: E402
+
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Train baseline TF-IDF + LogisticRegression intent classifier.")
@@ -20,6 +26,10 @@ def main() -> None:
         type=str,
         default=str(Path(__file__).resolve().parents[1] / "intent_model" / "artifacts" / "baseline_intent.joblib"),
     )
+    parser.add_argument("--no_compiled", action="store_true", help="Skip the NumPy-only compiled export.")
+    parser.add_argument(
+        "--export_only", action="store_true", help="Skip training; compile the existing model at --out."
+    )
     args = parser.parse_args()
 
     X: list[str] = []
@@ -32,6 +42,10 @@ def main() -> None:
             X.append(str(row["text"]))
             y.append(str(row["intent"]))
 
+    if args.export_only:
+        export_and_check(joblib.load(args.out), args.out, X)
+        return
+
     try:
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=0.2, random_state=42, stratify=y
@@ -57,6 +71,19 @@ def main() -> None:
     joblib.dump(pipeline, out_path)
     print(f"Saved baseline intent model to: {out_path}")
 
+    if not args.no_compiled:
+        export_and_check(pipeline, str(out_path), X)
+
+
+def export_and_check(pipeline: Pipeline, model_path: str, texts: list[str]) -> None:
+    out_dir = export_compiled(pipeline, compiled_dir_for(model_path), source_path=model_path)
+    expected = pipeline.predict_proba(texts)
+    actual = CompiledIntentClassifier(out_dir).predict_proba(texts)
+    max_diff = float(np.abs(expected - actual).max()) if len(texts) else 0.0
+    print(f"Saved compiled baseline intent model to: {out_dir} (max |p - p_sklearn| = {max_diff:.2e})")
+    if max_diff > 1e-6:
+        raise SystemExit("Compiled model does not match the sklearn pipeline; do not deploy it.")
+
 
 if __name__ == "__main__":
     main()
@@ -2,8 +2,11 @@ from __future__ import annotations
 
 import argparse
 import csv
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Fine-tune DistilBERT for intent classification.")
@@ -16,6 +19,11 @@ def main() -> None:
     parser.add_argument("--model_name", type=str, default="distilbert-base-uncased")
     parser.add_argument("--epochs", type=int, default=3)
     parser.add_argument("--batch_size", type=int, default=16)
+    parser.add_argument("--no_onnx", action="store_true", help="Skip the ONNX export after training.")
+    parser.add_argument("--no_quantize", action="store_true", help="Export fp32 ONNX only (no int8 variant).")
+    parser.add_argument(
+        "--export_only", action="store_true", help="Skip training; export and parity-check the model in --out_dir."
+    )
     args = parser.parse_args()
 
     texts: list[str] = []
@@ -28,6 +36,10 @@ def main() -> None:
             texts.append(str(row["text"]))
             intents_raw.append(str(row["intent"]))
 
+    if args.export_only:
+        export_and_check(args.out_dir, texts[:200], quantize=not args.no_quantize)
+        return
+
     intents = sorted(set(intents_raw))
     label2id = {label: i for i, label in enumerate(intents)}
     id2label = {i: label for label, i in label2id.items()}
@@ -100,6 +112,20 @@ def main() -> None:
     tokenizer.save_pretrained(out_dir)
     print(f"Saved BERT intent model to: {out_dir}")
 
+    if not args.no_onnx:
+        export_and_check(str(out_dir), list(X_eval), quantize=not args.no_quantize)
+
+
+def export_and_check(model_dir: str, texts: list[str], quantize: bool) -> None:
+    from intent_model.onnx_backend import export_onnx, parity_check
+
+    paths = export_onnx(model_dir, quantize=quantize)
+    for kind, path in paths.items():
+        report = parity_check(model_dir, path, texts)
+        print(f"ONNX ({kind}) parity vs PyTorch: {report}")
+        if not report["ok"]:
+            print(f"WARNING: {kind} export disagrees with the PyTorch model; keep INTENT_BACKEND=bert.")
+
 
 if __name__ == "__main__":
     try:
@@ -108,6 +134,8 @@ if __name__ == "__main__":
         import torch as _  # noqa: F401
         import evaluate as _  # noqa: F401
     except Exception:
-        raise SystemExit("Please install requirements-ml.txt to run this script (transformers/datasets/torch/evaluate).")
+        raise SystemExit(
+            "Please install requirements-ml.txt to run this script (transformers/datasets/torch/evaluate/onnxruntime)."
+        )
     main()
 
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any
+from urllib.parse import unquote, urlparse
+
+
+class SessionBackendError(Exception):
+    """The shared session backend failed or replied with an error."""
+
+
+class SessionBackend(ABC):
+    """
+    Shared store for serialized sessions, so every worker/replica sees the same memory.
+    Values are opaque bytes; `MemoryStore` owns the encoding and keeps an in-process L1.
+    Implementations raise `SessionBackendError` for every backend or protocol failure.
+    """
+
+    @abstractmethod
+    async def fetch(self, key: str, ttl_seconds: int) -> bytes | None:
+        """Value for `key` (None when absent); also restarts its TTL."""
+
+    @abstractmethod
+    async def store(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        """Write `value` under `key`, expiring after `ttl_seconds`."""
+
+    async def aclose(self) -> None:
+        return None
+
+
+def _encode_command(*args: str | bytes | int) -> bytes:
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+        out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(out)
+
+
+def _int_field(line: bytes) -> int:
+    try:
+        return int(line[1:-2])
+    except ValueError:
+        raise SessionBackendError(f"malformed reply: {line[:32]!r}") from None
+
+
+async def _read_reply(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise SessionBackendError("connection closed by server")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode("utf-8", "replace")
+    if kind == b"-":
+        # returned, not raised: the caller still has to read the rest of the pipeline's replies
+        return SessionBackendError(body.decode("utf-8", "replace"))
+    if kind == b":":
+        return _int_field(line)
+    if kind == b"$":
+        size = _int_field(line)
+        if size < 0:
+            return None
+        data = await reader.readexactly(size + 2)
+        if not data.endswith(b"\r\n"):
+            raise SessionBackendError("malformed bulk reply")
+        return data[:-2]
+    if kind == b"*":
+        size = _int_field(line)
+        return None if size < 0 else [await _read_reply(reader) for _ in range(size)]
+    raise SessionBackendError(f"unexpected reply: {line[:32]!r}")
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    async def pipeline(self, *commands: tuple[str | bytes | int, ...]) -> list[Any]:
+        """Send every command in one write, then read the replies in order (one round trip)."""
+        self.writer.write(b"".join(_encode_command(*cmd) for cmd in commands))
+        await self.writer.drain()
+        replies = [await _read_reply(self.reader) for _ in commands]
+        for reply in replies:
+            if isinstance(reply, SessionBackendError):
+                raise reply
+        return replies
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class RedisSessionBackend(SessionBackend):
+    """
+    Minimal asyncio Redis (RESP2) client for session blobs; no client library needed.
+    - `fetch` pipelines `GET` + `PEXPIRE` (read and keep-alive in one round trip)
+    - `store` is a single `SET ... PX`
+    - Up to `pool_size` connections, opened lazily; a connection that errors or times out is discarded
+    URL form: `redis://[:password@]host[:port][/db]`.
+    """
+
+    def __init__(self, url: str, key_prefix: str = "tnea:session:", timeout_ms: int = 250, pool_size: int = 4):
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"unsupported session backend URL: {url}")
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.key_prefix = key_prefix
+        self.timeout = max(1, timeout_ms) / 1000.0
+        self._idle: list[_Connection] = []
+        self._slots = asyncio.Semaphore(max(1, pool_size))
+        self.round_trips = 0
+
+    async def _connect(self) -> _Connection:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        conn = _Connection(reader, writer)
+        setup: list[tuple[str | bytes | int, ...]] = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            try:
+                await conn.pipeline(*setup)
+            except BaseException:
+                conn.close()
+                raise
+        return conn
+
+    async def _run(self, *commands: tuple[str | bytes | int, ...]) -> list[Any]:
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else None
+            try:
+                if conn is None:
+                    conn = await asyncio.wait_for(self._connect(), self.timeout)
+                replies = await asyncio.wait_for(conn.pipeline(*commands), self.timeout)
+            except BaseException as e:
+                if conn is not None:
+                    conn.close()
+                if isinstance(e, (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError)):
+                    raise SessionBackendError(str(e) or type(e).__name__) from e
+                raise
+            self.round_trips += 1
+            self._idle.append(conn)
+            return replies
+
+    async def fetch(self, key: str, ttl_seconds: int) -> bytes | None:
+        name = self.key_prefix + key
+        value, _ = await self._run(("GET", name), ("PEXPIRE", name, ttl_seconds * 1000))
+        return value
+
+    async def store(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        await self._run(("SET", self.key_prefix + key, value, "PX", ttl_seconds * 1000))
+
+    async def aclose(self) -> None:
+        while self._idle:
+            self._idle.pop().close()
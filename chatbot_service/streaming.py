@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import codecs
+import heapq
+import json
+from typing import Any, AsyncIterator, Callable
+
+
+_WS = " \t\r\n"
+
+
+class JsonArrayStream:
+    """
+    Incremental parser for a top-level JSON array: `feed()` text chunks and get back every
+    element completed so far, without holding the whole document in memory.
+    A top-level object (e.g. `{"results": [...]}`) cannot be split safely, so it is buffered
+    and parsed by `close()` into `document`.
+    """
+
+    def __init__(self) -> None:
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._mode: str | None = None  # "array" | "document" | "done"
+        self.document: Any = None
+
+    def feed(self, text: str) -> list[Any]:
+        self._buf += text
+        return self._drain(final=False)
+
+    def close(self) -> list[Any]:
+        items = self._drain(final=True)
+        if self._mode == "document":
+            self.document = json.loads(self._buf)
+        elif self._mode == "array":
+            raise ValueError("truncated JSON array")
+        return items
+
+    def _drain(self, final: bool) -> list[Any]:
+        if self._mode is None:
+            stripped = self._buf.lstrip(_WS)
+            if not stripped:
+                return []
+            self._mode = "array" if stripped[0] == "[" else "document"
+            self._buf = stripped[1:] if self._mode == "array" else stripped
+        if self._mode != "array":
+            return []
+
+        items: list[Any] = []
+        pos = 0
+        buf = self._buf
+        while True:
+            while pos < len(buf) and (buf[pos] in _WS or buf[pos] == ","):
+                pos += 1
+            if pos >= len(buf):
+                break
+            if buf[pos] == "]":
+                self._mode = "done"
+                pos += 1
+                break
+            try:
+                item, end = self._decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break  # element not complete yet
+            # only accept an element once its delimiter has arrived: a number may still be growing ("6" -> "6.5")
+            if end >= len(buf) or buf[end] not in _WS + ",]":
+                if final:
+                    raise ValueError(f"malformed JSON array near offset {end}")
+                break
+            items.append(item)
+            pos = end
+        self._buf = buf[pos:]
+        return items
+
+
+class TopK:
+    """Bounded min-heap keeping the `k` highest-scoring items; ties keep arrival order."""
+
+    def __init__(self, k: int, score: Callable[[Any], float]):
+        self.k = max(1, k)
+        self.score = score
+        self.seen = 0
+        self._heap: list[tuple[float, int, Any]] = []
+
+    def push(self, item: Any) -> None:
+        # negative sequence: among equal scores the earliest item is the "largest" and survives
+        entry = (self.score(item), -self.seen, item)
+        self.seen += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def items(self) -> list[Any]:
+        return [item for _, _, item in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
+
+
+async def read_top_k(
+    chunks: AsyncIterator[bytes], k: int, score: Callable[[Any], float], max_bytes: int
+) -> tuple[Any, bool]:
+    """
+    Stream a JSON response body and keep only the best `k` records.
+    Returns `(data, truncated)`; reading stops once `max_bytes` have been received,
+    in which case the records parsed so far are returned with `truncated=True`.
+    """
+    stream = JsonArrayStream()
+    best = TopK(k, score)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        for item in stream.feed(decoder.decode(chunk)):
+            best.push(item)
+        if received > max_bytes:
+            if stream.document is None and best.seen:
+                return best.items(), True
+            raise ValueError(f"response exceeded {max_bytes} bytes")
+    for item in stream.feed(decoder.decode(b"", final=True)) + stream.close():
+        best.push(item)
+
+    doc = stream.document
+    if isinstance(doc, dict) and isinstance(doc.get("results"), list):
+        for item in doc["results"]:
+            best.push(item)
+        return {**doc, "results": best.items()}, False
+    if doc is not None:
+        return doc, False
+    return best.items(), False
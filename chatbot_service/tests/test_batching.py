@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from intent_model.batching import MicroBatcher
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submits_share_one_batch_and_keep_order():
+    calls: list[list[str]] = []
+
+    async def batch_fn(texts: list[str]) -> list[str]:
+        calls.append(texts)
+        return [t.upper() for t in texts]
+
+    batcher: MicroBatcher[str] = MicroBatcher(batch_fn, max_batch=8, max_wait_ms=20)
+    results = await asyncio.gather(*(batcher.submit(t) for t in ["a", "b", "c"]))
+
+    assert results == ["A", "B", "C"]
+    assert calls == [["a", "b", "c"]]
+    assert batcher.stats()["avg_batch_size"] == 3
+    await batcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_full_batches_flush_and_requests_queue_behind_running_batch():
+    calls: list[list[str]] = []
+    release = asyncio.Event()
+
+    async def batch_fn(texts: list[str]) -> list[str]:
+        calls.append(texts)
+        await release.wait()
+        return texts
+
+    batcher: MicroBatcher[str] = MicroBatcher(batch_fn, max_batch=2, max_wait_ms=200)
+    first = [asyncio.create_task(batcher.submit(t)) for t in ["1", "2"]]
+    await asyncio.sleep(0.01)
+    # the first batch is full and running; these wait for its slot and go out together
+    rest = [asyncio.create_task(batcher.submit(t)) for t in ["3", "4", "5"]]
+    await asyncio.sleep(0.01)
+    assert calls == [["1", "2"]]
+
+    release.set()
+    assert await asyncio.gather(*first, *rest) == ["1", "2", "3", "4", "5"]
+    assert calls == [["1", "2"], ["3", "4"], ["5"]]
+    await batcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_batch_errors_reach_every_waiter():
+    async def batch_fn(texts: list[str]) -> list[str]:
+        raise RuntimeError("model missing")
+
+    batcher: MicroBatcher[str] = MicroBatcher(batch_fn, max_batch=4, max_wait_ms=5)
+    results = await asyncio.gather(batcher.submit("x"), batcher.submit("y"), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    await batcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_short_result_lists_fail_the_whole_batch():
+    async def batch_fn(texts: list[str]) -> list[str]:
+        return texts[:-1]
+
+    batcher: MicroBatcher[str] = MicroBatcher(batch_fn, max_batch=4, max_wait_ms=5)
+    results = await asyncio.wait_for(
+        asyncio.gather(batcher.submit("x"), batcher.submit("y"), return_exceptions=True), timeout=1
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    await batcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_running_and_queued_waiters():
+    started = asyncio.Event()
+
+    async def batch_fn(texts: list[str]) -> list[str]:
+        started.set()
+        await asyncio.sleep(10)
+        return texts
+
+    batcher: MicroBatcher[str] = MicroBatcher(batch_fn, max_batch=1, max_wait_ms=0)
+    waiters = [asyncio.create_task(batcher.submit(t)) for t in ["running", "queued", "also queued"]]
+    await started.wait()
+    await batcher.stop()
+
+    results = await asyncio.wait_for(asyncio.gather(*waiters, return_exceptions=True), timeout=1)
+    assert all(isinstance(r, asyncio.CancelledError) for r in results)
+
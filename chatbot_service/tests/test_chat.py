@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import asyncio
+import json
+import time
+
 import pytest
 import respx
 import httpx
@@ -45,3 +49,394 @@ async def test_chat_recommendation_calls_downstream():
             assert data["intent"] in {"college_recommendation", "fallback_unknown", "greeting"}
             assert isinstance(data["results"], list)
 
+
+
+@pytest.mark.asyncio
+async def test_downstream_client_is_pooled_for_app_lifespan():
+    app = create_app()
+    api_client = app.state.api_client
+
+    with respx.mock(assert_all_called=False) as router:
+        router.post("http://127.0.0.1:3000/api/college-suggestions").respond(200, json=[])
+        router.get("http://127.0.0.1:3000/api/cutoff-history").respond(200, json=[])
+
+        async with app.router.lifespan_context(app):
+            pooled = api_client._client
+            assert pooled is not None and not pooled.is_closed
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                for _ in range(2):
+                    r = await client.post(
+                        "/chat",
+                        json={"user_id": "u3", "message": "recommend colleges for 178 cutoff BC", "language": "en"},
+                    )
+                    assert r.status_code == 200
+            assert api_client._client is pooled
+
+    assert pooled.is_closed
+    assert api_client._client is None
+
+
+@pytest.mark.asyncio
+async def test_recommendation_survives_failed_history_call():
+    app = create_app()
+
+    with respx.mock(assert_all_called=False) as router:
+        router.post("http://127.0.0.1:3000/api/college-suggestions").respond(
+            200,
+            json=[{"name": "College A", "branchName": "CSE", "location": "Chennai", "matchScore": 78}],
+        )
+        router.get("http://127.0.0.1:3000/api/cutoff-history").mock(side_effect=httpx.ConnectError("down"))
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            r = await client.post(
+                "/chat",
+                json={"user_id": "u4", "message": "recommend colleges for 178 cutoff BC in Chennai", "language": "en"},
+            )
+
+    data = r.json()
+    assert data["intent"] == "college_recommendation"
+    assert [row["college"] for row in data["results"]] == ["College A"]
+    assert data["results"][0]["last_year_cutoff"] is None
+    assert data["omitted"] == ["last_year_cutoff"]
+
+
+@pytest.mark.asyncio
+async def test_safe_target_dream_labels_are_only_omitted_when_batch_labelling_fails(monkeypatch):
+    import dataclasses
+
+    import decision_engine
+
+    async def recommend(user_id: str) -> dict:
+        transport = httpx.ASGITransport(app=create_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            r = await client.post("/chat", json={"user_id": user_id, "message": "recommend colleges for 178 cutoff BC"})
+        return r.json()
+
+    with respx.mock(assert_all_called=False) as router:
+        router.post("http://127.0.0.1:3000/api/college-suggestions").respond(
+            200,
+            json=[{"name": "College A", "branchName": "CSE", "location": "Chennai", "matchScore": 78}],
+        )
+        router.get("http://127.0.0.1:3000/api/cutoff-history").respond(200, json=[])
+        labels = router.post("http://127.0.0.1:3000/api/safe-target-dream").respond(400, json={})
+
+        # disabled (the default): the probability-derived label is kept and nothing is omitted
+        disabled = await recommend("u-std-off")
+        monkeypatch.setattr(
+            decision_engine, "settings", dataclasses.replace(decision_engine.settings, safe_target_dream_batch_labels=True)
+        )
+        failed = await recommend("u-std-on")
+
+    assert disabled["results"][0]["classification"] == "Safe" and disabled["omitted"] == []
+    assert labels.called
+    assert failed["results"][0]["classification"] == "Safe" and failed["omitted"] == ["safe_target_dream_labels"]
+
+
+@pytest.mark.asyncio
+async def test_slow_history_is_omitted_within_latency_budget():
+    app = create_app()
+
+    async def slow_history(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(5)
+        return httpx.Response(200, json=[{"generalCutoff": 185}])
+
+    with respx.mock(assert_all_called=False) as router:
+        router.post("http://127.0.0.1:3000/api/college-suggestions").respond(
+            200,
+            json=[{"name": "College A", "branchName": "CSE", "location": "Chennai", "matchScore": 78}],
+        )
+        router.get("http://127.0.0.1:3000/api/cutoff-history").mock(side_effect=slow_history)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.monotonic()
+            r = await client.post(
+                "/chat",
+                json={"user_id": "u5", "message": "recommend colleges for 178 cutoff BC in Chennai", "language": "en"},
+                headers={"x-latency-budget-ms": "800"},
+            )
+            elapsed = time.monotonic() - started
+
+    data = r.json()
+    assert elapsed < 2
+    assert data["intent"] == "college_recommendation"
+    assert [row["college"] for row in data["results"]] == ["College A"]
+    assert data["omitted"] == ["last_year_cutoff"]
+
+
+@pytest.mark.asyncio
+async def test_recommendations_are_prefetched_once_cutoff_and_category_are_known():
+    app = create_app()
+
+    with respx.mock(assert_all_called=False) as router:
+        route = router.post("http://127.0.0.1:3000/api/college-suggestions").respond(
+            200,
+            json=[{"name": "College A", "branchName": "CSE", "location": "Chennai", "matchScore": 78}],
+        )
+        router.get("http://127.0.0.1:3000/api/cutoff-history").respond(200, json=[])
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            session = {"user_id": "u6", "session_id": "s6", "language": "en"}
+            r = await client.post("/chat", json={**session, "message": "hello, my cutoff is 178 and I am BC"})
+            assert r.json()["intent"] == "greeting"
+            await asyncio.sleep(0.05)
+            assert route.call_count == 1
+
+            r = await client.post("/chat", json={**session, "message": "please recommend colleges"})
+            data = r.json()
+            assert data["intent"] == "college_recommendation"
+            assert [row["college"] for row in data["results"]] == ["College A"]
+            assert route.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_show_more_pages_through_stored_recommendations():
+    app = create_app()
+    rows = [{"name": f"College {i}", "branchName": "CSE", "location": "Chennai", "matchScore": 90 - i} for i in range(12)]
+
+    with respx.mock(assert_all_called=False) as router:
+        route = router.post("http://127.0.0.1:3000/api/college-suggestions").respond(200, json=rows)
+        router.get("http://127.0.0.1:3000/api/cutoff-history").respond(200, json=[])
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            session = {"user_id": "u7", "session_id": "s7", "language": "en"}
+            first = (await client.post("/chat", json={**session, "message": "recommend colleges for 178 cutoff BC"})).json()
+            assert [r["college"] for r in first["results"]] == [f"College {i}" for i in range(5)]
+            assert first["next_cursor"]
+
+            # other questions that happen to contain a paging phrase are answered, not paged
+            docs = (await client.post("/chat", json={**session, "message": "show me more documents"})).json()
+            assert docs["intent"] == "document_verification" and not docs["results"]
+
+            second = (await client.post("/chat", json={**session, "message": "show more"})).json()
+            assert [r["college"] for r in second["results"]] == [f"College {i}" for i in range(5, 10)]
+
+            third = (
+                await client.post("/chat", json={**session, "message": "next", "cursor": second["next_cursor"]})
+            ).json()
+            assert [r["college"] for r in third["results"]] == ["College 10", "College 11"]
+            assert third["next_cursor"] is None
+            assert route.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_show_more_with_new_criteria_starts_a_new_search():
+    app = create_app()
+    rows = [{"name": f"College {i}", "branchName": "CSE", "location": "Chennai", "matchScore": 90 - i} for i in range(12)]
+
+    with respx.mock(assert_all_called=False) as router:
+        route = router.post("http://127.0.0.1:3000/api/college-suggestions").respond(200, json=rows)
+        router.get("http://127.0.0.1:3000/api/cutoff-history").respond(200, json=[])
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            session = {"user_id": "u12", "session_id": "s12", "language": "en"}
+            await client.post("/chat", json={**session, "message": "recommend colleges for 178 cutoff BC"})
+            calls = route.call_count
+
+            r = await client.post(
+                "/chat", json={**session, "message": "recommend more colleges for 185 MBC in Coimbatore"}
+            )
+            data = r.json()
+
+    assert data["intent"] == "college_recommendation"
+    assert (data["entities"]["cutoff"], data["entities"]["category"]) == (185.0, "MBC")
+    assert data["entities"]["location"] == "Coimbatore"
+    assert route.call_count == calls + 1
+    assert json.loads(route.calls.last.request.content)["category"] == "MBC"
+
+
+@pytest.mark.asyncio
+async def test_chat_batch_streams_ndjson_in_session_order():
+    app = create_app()
+
+    with respx.mock(assert_all_called=False) as router:
+        route = router.post("http://127.0.0.1:3000/api/college-suggestions").respond(
+            200,
+            json=[{"name": "College A", "branchName": "CSE", "location": "Chennai", "matchScore": 78}],
+        )
+        router.get("http://127.0.0.1:3000/api/cutoff-history").respond(200, json=[])
+
+        requests = []
+        for student in ("s8a", "s8b"):
+            session = {"user_id": "counsellor-8", "session_id": student}
+            requests += [
+                {**session, "message": "hello, my cutoff is 178 and I am BC"},
+                {**session, "message": "please recommend colleges"},
+            ]
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            r = await client.post("/chat/batch", json={"requests": requests})
+            assert r.headers["content-type"].startswith("application/x-ndjson")
+            lines = [json.loads(line) for line in r.text.splitlines()]
+
+    assert sorted(line["index"] for line in lines) == [0, 1, 2, 3]
+    by_index = {line["index"]: line for line in lines}
+    assert all(line["ok"] for line in lines)
+    for i in (1, 3):
+        # the second turn sees the first turn's cutoff/category from session memory
+        assert by_index[i]["response"]["intent"] == "college_recommendation"
+        assert [row["college"] for row in by_index[i]["response"]["results"]] == ["College A"]
+    # both students share one canonical payload: one downstream call
+    assert route.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_chat_batch_falls_back_to_per_message_extraction(monkeypatch):
+    from ner_model.entity_extractor import EntityExtractor
+
+    def broken(self, texts, **kwargs):
+        raise RuntimeError("ner pool down")
+
+    monkeypatch.setattr(EntityExtractor, "extract_many", broken)
+    app = create_app()
+    requests = [{"user_id": "counsellor-9", "session_id": f"s{i}", "message": "my cutoff is 178 and I am BC"} for i in range(3)]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/chat/batch", json={"requests": requests}, headers={"X-Latency-Budget-Ms": "500"})
+        lines = [json.loads(line) for line in r.text.splitlines()]
+
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+    assert all(line["ok"] and line["response"]["entities"]["cutoff"] == 178.0 for line in lines)
+
+
+def _sse_events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_emits_nlu_progress_rows_then_final():
+    app = create_app()
+
+    with respx.mock(assert_all_called=False) as router:
+        router.post("http://127.0.0.1:3000/api/college-suggestions").respond(
+            200,
+            json=[
+                {"name": f"College {c}", "branchName": "CSE", "location": "Chennai", "matchScore": 90 - i}
+                for i, c in enumerate("ABCDEFG")
+            ],
+        )
+        router.get("http://127.0.0.1:3000/api/cutoff-history").respond(200, json=[])
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+
+            async def stream(user_id: str, message: str) -> list[tuple[str, dict]]:
+                r = await client.post("/chat/stream", json={"user_id": user_id, "message": message})
+                assert r.headers["content-type"].startswith("text/event-stream")
+                return _sse_events(r.text)
+
+            events = await stream("u9", "please recommend colleges, my cutoff is 178 and I am BC")
+            paged = await stream("u9", "show more")
+            missing = await stream("u10", "please recommend colleges")
+            std_missing = await stream("u10b", "is PSG safe, target or dream for me?")
+
+    names = [name for name, _ in events]
+    assert names == ["nlu", "progress"] + ["result"] * 5 + ["final"]
+    nlu, final = events[0][1], events[-1][1]
+    assert nlu["intent"] == "college_recommendation"
+    assert nlu["entities"]["cutoff"] == 178.0 and nlu["entities"]["category"] == "BC"
+    assert [data["row"]["college"] for name, data in events if name == "result"] == [f"College {c}" for c in "ABCDE"]
+    assert final["response_text"] and [row["college"] for row in final["results"]] == [f"College {c}" for c in "ABCDE"]
+
+    # paging from session memory streams the same sequence, ranked after the first page
+    assert [name for name, _ in paged] == ["nlu", "progress", "result", "result", "final"]
+    assert paged[0][1]["intent"] == "college_recommendation"
+    assert [(data["rank"], data["row"]["college"]) for name, data in paged if name == "result"] == [
+        (6, "College F"),
+        (7, "College G"),
+    ]
+
+    for clarified in (missing, std_missing):
+        assert [name for name, _ in clarified] == ["nlu", "clarification", "final"]
+        assert clarified[1][1]["response_text"] == clarified[2][1]["response_text"]
+    assert std_missing[0][1]["intent"] == "safe_target_dream_query"
+
+
+def test_websocket_chat_reuses_session_and_auth_across_turns():
+    from fastapi.testclient import TestClient
+
+    app = create_app()
+
+    with respx.mock(assert_all_called=False) as router:
+        route = router.post("http://127.0.0.1:3000/api/college-suggestions").respond(
+            200,
+            json=[{"name": "College A", "branchName": "CSE", "location": "Chennai", "matchScore": 78}],
+        )
+        router.get("http://127.0.0.1:3000/api/cutoff-history").respond(200, json=[])
+
+        with TestClient(app) as client:
+            with client.websocket_connect(
+                "/ws/chat?user_id=u11&session_id=ws", headers={"authorization": "Bearer t0ken"}
+            ) as ws:
+
+                def turn(message: dict) -> list[dict]:
+                    ws.send_json(message)
+                    frames = []
+                    while not frames or frames[-1]["event"] not in {"final", "error"}:
+                        frames.append(ws.receive_json())
+                    return frames
+
+                first = turn({"message": "hello, my cutoff is 178 and I am BC"})
+                second = turn({"message": "please recommend colleges"})
+                bad = turn({"cursor": "x"})
+
+                # another worker (or a /chat turn) rewrites the session between socket turns
+                from memory_store import SessionState
+
+                app.state.memory.save("u11", "ws", SessionState(cutoff_score=185.0, category="MBC"))
+                fourth = turn({"message": "please recommend colleges"})
+            socket_auth = {call.request.headers.get("authorization") for call in route.calls}
+
+            # the socket's session is visible to plain /chat turns
+            r = client.post("/chat", json={"user_id": "u11", "session_id": "ws", "message": "hi"})
+
+    assert {f["turn"] for f in first} == {1} and first[-1]["event"] == "final"
+    assert [f["event"] for f in second] == ["nlu", "progress", "result", "final"]
+    assert all(f["turn"] == 2 for f in second)
+    assert second[0]["data"]["entities"]["cutoff"] == 178.0
+    assert [row["college"] for row in second[-1]["data"]["results"]] == ["College A"]
+    assert socket_auth == {"Bearer t0ken"}
+    assert [f["event"] for f in bad] == ["error"] and bad[0]["turn"] == 3
+    assert fourth[0]["data"]["entities"]["category"] == "MBC"
+    assert r.json()["entities"]["category"] == "MBC"
+
+
+def test_result_rows_stream_before_slow_history_finishes():
+    from fastapi.testclient import TestClient
+
+    app = create_app()
+
+    async def slow_history(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(1)
+        return httpx.Response(200, json=[])
+
+    with respx.mock(assert_all_called=False) as router:
+        router.post("http://127.0.0.1:3000/api/college-suggestions").respond(
+            200,
+            json=[{"name": "College A", "branchName": "CSE", "location": "Chennai", "matchScore": 78}],
+        )
+        router.get("http://127.0.0.1:3000/api/cutoff-history").mock(side_effect=slow_history)
+
+        with TestClient(app) as client:
+            with client.websocket_connect("/ws/chat?user_id=u12") as ws:
+                started = time.monotonic()
+                ws.send_json({"message": "please recommend colleges, my cutoff is 178 and I am BC"})
+                arrivals = []
+                while not arrivals or arrivals[-1][0] not in {"final", "error"}:
+                    arrivals.append((ws.receive_json()["event"], time.monotonic() - started))
+
+    seen = dict(arrivals)
+    assert [name for name, _ in arrivals] == ["nlu", "progress", "result", "final"]
+    assert seen["result"] < 0.5 <= seen["final"]
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import csv
+import os
+import subprocess
+import sys
+import warnings
+
+import joblib
+import numpy as np
+
+from config import settings
+from intent_model.baseline import BaselineIntentClassifier
+from intent_model.compiled import CompiledIntentClassifier, compiled_dir_for, export_compiled
+
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _texts() -> list[str]:
+    with open(os.path.join(SERVICE_DIR, "data", "intent_samples.csv"), "r", encoding="utf-8", newline="") as f:
+        texts = [row["text"] for row in csv.DictReader(f)]
+    return texts + ["", "zzz unknown words only", "Compare CEG vs MIT for CSE, cutoff 195!", "வணக்கம்"]
+
+
+def test_compiled_export_matches_sklearn_probabilities(tmp_path):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        pipeline = joblib.load(settings.baseline_intent_model_path)
+    compiled = CompiledIntentClassifier(export_compiled(pipeline, str(tmp_path / "compiled")))
+    texts = _texts()
+
+    assert np.allclose(compiled.predict_proba(texts), pipeline.predict_proba(texts), atol=1e-9)
+    assert [p.intent for p in compiled.predict_batch(texts)] == [str(c) for c in pipeline.predict(texts)]
+
+
+def test_baseline_serves_compiled_model_without_sklearn():
+    code = (
+        "import sys\n"
+        "from config import settings\n"
+        "from intent_model.baseline import BaselineIntentClassifier\n"
+        "pred = BaselineIntentClassifier(settings.baseline_intent_model_path).predict('which college for 190 cutoff')\n"
+        "assert 'sklearn' not in sys.modules, 'sklearn imported'\n"
+        "print(pred.intent)\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=SERVICE_DIR, capture_output=True, text=True, check=True)
+    expected = BaselineIntentClassifier(settings.baseline_intent_model_path, use_compiled=False)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        assert out.stdout.strip() == expected.predict("which college for 190 cutoff").intent
+
+
+def test_export_from_another_joblib_is_ignored(tmp_path):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        pipeline = joblib.load(settings.baseline_intent_model_path)
+        model_path = str(tmp_path / "baseline_intent.joblib")
+        joblib.dump(pipeline, model_path)
+        export_compiled(pipeline, compiled_dir_for(model_path), source_path=model_path)
+
+        fresh = BaselineIntentClassifier(model_path)
+        fresh.load()
+        assert fresh._compiled is not None
+
+        # retrained (here: re-saved with different bytes) without re-exporting
+        joblib.dump(pipeline, model_path, compress=3)
+        stale = BaselineIntentClassifier(model_path)
+        stale.load()
+        assert stale._compiled is None and stale._pipeline is not None
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import time
+from email.utils import formatdate
+
+import httpx
+import numpy as np
+import pytest
+import respx
+
+from cutoff_snapshot import CutoffSnapshot, CutoffSnapshotStore
+from decision_engine import DecisionEngine
+from ner_model.entity_extractor import EntityExtractor
+from integration_layer import TneaApiClient
+from memory_store import MemoryStore
+
+
+RECORDS = [
+    {"year": 2022, "round": 1, "generalCutoff": 195.0, "obcCutoff": 192.5, "scCutoff": 180.0, "stCutoff": None,
+     "collegeName": "PSG College of Technology", "branchName": "Computer Science and Engineering"},
+    {"year": 2023, "round": 2, "generalCutoff": 196.0, "obcCutoff": None, "scCutoff": 181.0, "stCutoff": None,
+     "collegeName": "PSG College of Technology", "branchName": "Computer Science and Engineering"},
+    {"year": 2023, "round": 1, "generalCutoff": 197.5, "obcCutoff": 194.0, "scCutoff": 183.0, "stCutoff": 170.0,
+     "collegeName": "PSG College of Technology", "branchName": "Computer Science and Engineering"},
+    {"year": 2023, "round": 1, "generalCutoff": 189.0, "obcCutoff": 186.0, "scCutoff": None, "stCutoff": None,
+     "collegeName": "SSN College of Engineering", "branchName": "ECE"},
+]
+
+
+def test_last_cutoff_lookups():
+    snap = CutoffSnapshot.from_records(RECORDS)
+    assert len(snap) == 4
+    assert snap.cutoffs.dtype == np.float32
+
+    # latest year, final round; branch names are canonicalized ("CSE" == "Computer Science and Engineering")
+    assert snap.last_cutoff("psg college of technology", "CSE", "SC") == pytest.approx(181.0)
+    # BC has no value in 2023 round 2 -> last valid BC value
+    assert snap.last_cutoff("PSG College of Technology", "CSE", "BC") == pytest.approx(194.0)
+    assert snap.last_cutoff("PSG College of Technology", "CSE", "OC", year=2022) == pytest.approx(195.0)
+    # missing group falls back to the general column
+    assert snap.last_cutoff("SSN College of Engineering", "ece", "ST") == pytest.approx(189.0)
+    assert snap.last_cutoff("Unknown College", "CSE", "OC") is None
+
+
+def test_snapshot_round_trips_through_memory_mapped_files(tmp_path):
+    CutoffSnapshot.from_records(RECORDS).save(str(tmp_path))
+    CutoffSnapshot.from_records(RECORDS[:1]).save(str(tmp_path))
+
+    loaded = CutoffSnapshot.load(str(tmp_path))
+    assert loaded is not None and len(loaded) == 1
+    assert isinstance(loaded.cutoffs, np.memmap)
+    assert loaded.last_cutoff("PSG College of Technology", "CSE", "OC") == pytest.approx(195.0)
+    assert len([p for p in tmp_path.iterdir() if p.name.startswith("snapshot-")]) == 1
+
+
+def test_current_never_moves_back_to_an_older_refresh(tmp_path):
+    def versions() -> list[str]:
+        return [p.name for p in tmp_path.iterdir() if p.name.startswith("snapshot-")]
+
+    newer = CutoffSnapshot.from_records(RECORDS[:1])
+    assert newer.save(str(tmp_path))
+    published = (tmp_path / "CURRENT").read_text()
+
+    # a slower worker finishes an older refresh afterwards: CURRENT keeps the newer version
+    assert not CutoffSnapshot.from_records(RECORDS, fetched_at=newer.fetched_at - 60).save(str(tmp_path))
+    assert (tmp_path / "CURRENT").read_text() == published and versions() == [published]
+    assert len(CutoffSnapshot.load(str(tmp_path))) == 1
+
+    assert CutoffSnapshot.from_records(RECORDS, fetched_at=newer.fetched_at + 60).save(str(tmp_path))
+    assert len(versions()) == 1 and len(CutoffSnapshot.load(str(tmp_path))) == 4
+
+
+@pytest.mark.asyncio
+async def test_snapshot_cutoffs_are_not_copied_onto_unmatched_rows():
+    api = TneaApiClient(base_url="http://backend")
+    store = CutoffSnapshotStore(api, refresh_seconds=60, max_age_seconds=60, directory="")
+    store._snapshot = CutoffSnapshot.from_records(RECORDS)
+    engine = DecisionEngine(MemoryStore(max_sessions=10, ttl_seconds=60), EntityExtractor(), api, cutoff_snapshot=store)
+
+    with respx.mock() as router:
+        router.post("http://backend/api/college-suggestions").respond(
+            200,
+            json=[
+                {"name": "PSG College of Technology", "branchName": "CSE", "matchScore": 90},
+                {"name": "Unknown College", "branchName": "CSE", "matchScore": 40},
+            ],
+        )
+        data = await engine.handle(
+            user_id="u1",
+            session_id=None,
+            message="recommend CSE colleges for 190 cutoff OC",
+            intent="college_recommendation",
+            intent_confidence=0.9,
+        )
+
+    cutoffs = {row["college"]: row["last_year_cutoff"] for row in data["results"]}
+    assert cutoffs == {"PSG College of Technology": pytest.approx(196.0), "Unknown College": None}
+    assert "Last year" not in data["response_text"]
+    await api.aclose()
+
+
+@pytest.mark.asyncio
+async def test_store_refresh_swaps_in_new_snapshot():
+    api = TneaApiClient(base_url="http://backend")
+    store = CutoffSnapshotStore(api, refresh_seconds=60, max_age_seconds=60, directory="")
+    assert store.current() is None
+
+    with respx.mock() as router:
+        router.get("http://backend/api/cutoff-history").respond(200, json=RECORDS)
+        assert await store.refresh()
+
+    snap = store.current()
+    assert snap is not None and len(snap) == 4
+    assert store.stats()["rows"] == 4 and store.stats()["stale"] is False
+    await api.aclose()
+
+
+@pytest.mark.asyncio
+async def test_refresh_failure_is_not_masked_by_the_response_cache():
+    api = TneaApiClient(base_url="http://backend")
+    store = CutoffSnapshotStore(api, refresh_seconds=60, max_age_seconds=3600, directory="")
+    two_hours_ago = time.time() - 7200
+
+    with respx.mock() as router:
+        route = router.get("http://backend/api/cutoff-history")
+        # the snapshot's age is the backend's answer time, not when this worker built it
+        route.mock(return_value=httpx.Response(200, json=RECORDS, headers={"date": formatdate(two_hours_ago, usegmt=True)}))
+        assert await store.refresh()
+        assert store.stats()["age_seconds"] == pytest.approx(7200, abs=5)
+
+        route.mock(return_value=httpx.Response(500, json={"error": "down"}))
+        assert not await store.refresh()
+
+    stats = store.stats()
+    assert stats["failures"] == 1 and stats["stale"] is True
+    assert stats["age_seconds"] == pytest.approx(7200, abs=5)
+    await api.aclose()
+
+
+
+@pytest.mark.asyncio
+async def test_refresh_sends_service_session_cookie_and_reports_auth_failures(monkeypatch):
+    import dataclasses
+
+    import cutoff_snapshot
+
+    api = TneaApiClient(base_url="http://backend")
+    store = CutoffSnapshotStore(api, refresh_seconds=60, max_age_seconds=60, directory="")
+    monkeypatch.setattr(
+        cutoff_snapshot, "settings", dataclasses.replace(cutoff_snapshot.settings, tnea_service_cookie="connect.sid=svc")
+    )
+
+    with respx.mock() as router:
+        route = router.get("http://backend/api/cutoff-history")
+        route.respond(200, json=RECORDS)
+        assert await store.refresh()
+        assert route.calls.last.request.headers["cookie"] == "connect.sid=svc"
+
+        # the session expired: say so instead of a bare "Unauthorized"
+        route.respond(401, text="Unauthorized")
+        assert not await store.refresh()
+
+    stats = store.stats()
+    assert stats["last_status"] == 401 and "TNEA_SERVICE_COOKIE" in stats["last_error"]
+    await api.aclose()
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+
+from ner_model.entity_extractor import EntityExtractor
+
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXTRACTOR = EntityExtractor()
+
+
+def test_single_pass_scan_uses_utils_aliases():
+    ents = EXTRACTOR.extract("computer science and engineering in kovai for girls, govt or private, sca 185.5 round 2")
+    assert ents.to_dict() == {
+        "cutoff_score": 185.5,
+        "category": "SCA",
+        "branch": "CSE",
+        "district": "Coimbatore",
+        "college_name": None,
+        "college_type": "Government",
+        "round_number": 2,
+        "gender_quota": "female",
+        "first_graduate_quota": None,
+    }
+
+
+def test_short_branch_codes_need_upper_case():
+    assert EXTRACTOR.extract("can I get it in Chennai with 178").branch is None
+    assert EXTRACTOR.extract("can I get IT in Chennai with 178").branch == "IT"
+    assert EXTRACTOR.extract("AI&DS or CSE at Trichy").branch == "AI&DS"
+
+
+def test_heuristics_still_fill_unknown_places_and_college_names():
+    ents = EXTRACTOR.extract('Is "PSG College of Technology" good near Erode')
+    assert ents.college_name == "PSG College of Technology"
+    assert ents.district == "Erode"
+
+
+def test_spacy_is_not_imported_without_a_model_path():
+    code = (
+        "import sys\n"
+        "from ner_model.entity_extractor import EntityExtractor\n"
+        "EntityExtractor().extract('178 BC CSE in Chennai')\n"
+        "assert 'spacy' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=SERVICE_DIR, check=True)
+
+
+MESSAGES = [
+    "I have 178 cutoff BC can I get CSE in Chennai?",
+    "",
+    "round",
+    "2 and 190",
+    'Is "PSG College of Technology" good near Erode',
+    "ai&ds in kovai for girls govt",
+    "not first graduate, ST, private auto colleges",
+]
+
+
+def test_extract_many_matches_extract_in_input_order():
+    expected = [EXTRACTOR.extract(t) for t in MESSAGES]
+    assert EXTRACTOR.extract_many(MESSAGES) == expected
+    assert EXTRACTOR.extract_many(MESSAGES, batch_size=2, n_process=2) == expected
+
+
+def test_extract_many_pipes_custom_spacy_model(tmp_path):
+    import spacy
+
+    nlp = spacy.blank("en")
+    nlp.add_pipe("entity_ruler").add_patterns([{"label": "LOCATION", "pattern": "Erode"}])
+    nlp.to_disk(tmp_path / "ner")
+    extractor = EntityExtractor(spacy_model_path=str(tmp_path / "ner"))
+
+    texts = ["CSE seats Erode side", "CSE seats"] * 3
+    assert [e.district for e in extractor.extract_many(texts, batch_size=4)] == ["Erode", None] * 3
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import pytest
+
+from config import settings
+from executors import InferenceExecutor, parse_routing
+from intent_model.baseline import BaselineIntentClassifier
+from intent_model.onnx_backend import OnnxIntentClassifier
+
+
+class _ThreadProbe:
+    def __init__(self, _: object = None):
+        pass
+
+    def whoami(self, suffix: str) -> str:
+        return threading.current_thread().name + suffix
+
+
+def test_parse_routing_ignores_unknown_modes():
+    assert parse_routing(" baseline=thread, BERT=process ,ner=gpu,x") == {"baseline": "thread", "bert": "process"}
+
+
+@pytest.mark.asyncio
+async def test_thread_and_inline_routing():
+    executor = InferenceExecutor(routing={"probe": "thread", "inline_probe": "inline"}, thread_workers=2)
+    executor.register("probe", _ThreadProbe())
+    executor.register("inline_probe", _ThreadProbe())
+
+    assert (await executor.run("probe", "whoami", "!")).startswith("inference")
+    assert await executor.run("inline_probe", "whoami", "!") == threading.current_thread().name + "!"
+
+    stats = executor.stats()
+    assert stats["in_flight"] == 0 and stats["queued"] == 0
+    assert stats["backends"]["probe"] == {
+        "mode": "thread",
+        "in_flight": 0,
+        "queued": 0,
+        "completed": 1,
+        "version": "probe@0:builtin",
+    }
+    executor.shutdown()
+
+
+class _Gate:
+    def __init__(self, _: object = None):
+        self.release = threading.Event()
+
+    def wait(self) -> bool:
+        return self.release.wait(5)
+
+
+@pytest.mark.asyncio
+async def test_queued_calls_are_reported_apart_from_running_ones():
+    executor = InferenceExecutor(routing={"gate": "thread"}, thread_workers=1)
+    gate = _Gate()
+    executor.register("gate", gate)
+
+    calls = [asyncio.create_task(executor.run("gate", "wait")) for _ in range(3)]
+    await asyncio.sleep(0.05)
+    stats = executor.stats()
+    assert (stats["in_flight"], stats["queued"]) == (3, 2)
+    assert stats["backends"]["gate"]["queued"] == 2 and executor.running("gate") == 1
+
+    gate.release.set()
+    assert await asyncio.gather(*calls) == [True, True, True]
+    assert executor.stats()["queued"] == 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_process_routing_builds_model_in_worker():
+    model = BaselineIntentClassifier(settings.baseline_intent_model_path)
+    executor = InferenceExecutor(routing={"baseline": "process", "onnx": "process"}, process_workers=1)
+    executor.register("baseline", model, settings.baseline_intent_model_path)
+    onnx = OnnxIntentClassifier("missing.onnx", intra_op_threads=3)
+    executor.register("onnx", onnx, "missing.onnx", {"intra_op_threads": 3})
+
+    remote = await executor.run("baseline", "predict", "which college can I get for 178 cutoff")
+    local = model.predict("which college can I get for 178 cutoff")
+    assert remote.intent == local.intent
+    assert remote.confidence == pytest.approx(local.confidence)
+    # the worker's copy is built with the same constructor options, not just the path
+    assert await executor.run("onnx", "__getattribute__", "intra_op_threads") == 3
+    executor.shutdown()
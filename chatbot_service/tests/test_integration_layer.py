@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import httpx
+import pytest
+import respx
+
+from integration_layer import TneaApiClient, auth_scope
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_requests_are_coalesced():
+    api = TneaApiClient(base_url="http://backend")
+
+    async def slow_history(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=[{"generalCutoff": 190.5}])
+
+    with respx.mock() as router:
+        route = router.get("http://backend/api/cutoff-history").mock(side_effect=slow_history)
+        results = await asyncio.gather(*(api.cutoff_history() for _ in range(20)))
+        other_user = await api.cutoff_history(headers={"authorization": "Bearer other"})
+
+    assert all(r.ok and r.data == [{"generalCutoff": 190.5}] for r in results)
+    assert route.call_count == 2
+    assert api.coalesced_requests == 19
+    assert other_user.ok
+    await api.aclose()
+
+
+def test_auth_scope_partitions_credentials():
+    assert auth_scope(None) == auth_scope({"x-request-id": "1"}) == "anon"
+    assert auth_scope({"cookie": "a=1"}) == auth_scope({"Cookie": "a=1"})
+    assert auth_scope({"cookie": "a=1"}) != auth_scope({"cookie": "a=2"})
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_opens_and_fails_fast():
+    api = TneaApiClient(base_url="http://backend")
+
+    with respx.mock() as router:
+        route = router.post("http://backend/api/compare-colleges").respond(500, text="boom")
+        for _ in range(api._resilience("/api/compare-colleges").breaker.failure_threshold):
+            res = await api.compare_colleges({"query": "PSG vs SSN"})
+            assert not res.ok and res.status_code == 500
+        calls = route.call_count
+
+        res = await api.compare_colleges({"query": "PSG vs SSN"})
+        assert not res.ok and "circuit open" in (res.error or "")
+        assert route.call_count == calls
+
+    state = api.resilience_state()["/api/compare-colleges"]
+    assert state["breaker"]["state"] == "open"
+    assert state["breaker"]["rejected"] == 1
+    await api.aclose()
+
+
+@pytest.mark.asyncio
+async def test_connect_errors_are_retried_within_budget():
+    api = TneaApiClient(base_url="http://backend")
+
+    with respx.mock() as router:
+        route = router.get("http://backend/api/cutoff-history").mock(
+            side_effect=[httpx.ConnectError("refused"), httpx.Response(200, json=[])]
+        )
+        res = await api.cutoff_history()
+
+    assert res.ok and route.call_count == 2
+    assert api.resilience_state()["/api/cutoff-history"]["retries"] == 1
+    await api.aclose()
+
+
+@pytest.mark.asyncio
+async def test_slow_cutoff_history_is_hedged():
+    api = TneaApiClient(base_url="http://backend")
+    policy = api._resilience("/api/cutoff-history")
+    policy.hedge = True
+    for _ in range(50):
+        policy.latency.observe(0.01)
+
+    calls = 0
+
+    async def first_call_hangs(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(5)
+        return httpx.Response(200, json=[{"generalCutoff": 180}])
+
+    with respx.mock() as router:
+        router.get("http://backend/api/cutoff-history").mock(side_effect=first_call_hangs)
+        res = await asyncio.wait_for(api.cutoff_history(), timeout=1)
+
+    assert res.ok and calls == 2
+    assert api.resilience_state()["/api/cutoff-history"]["hedges"] == 1
+    await api.aclose()
+
+
+@pytest.mark.asyncio
+async def test_responses_are_cached_per_auth_scope_and_bucket():
+    api = TneaApiClient(base_url="http://backend")
+
+    with respx.mock() as router:
+        route = router.post("http://backend/api/college-suggestions").respond(200, json=[{"name": "College A"}])
+        await api.recommend_colleges({"cutoff": 178.1, "category": "BC"})
+        cached = await api.recommend_colleges({"cutoff": 178.2, "category": "BC"})
+        assert cached.ok and not cached.stale and cached.data == [{"name": "College A"}]
+        assert route.call_count == 1
+
+        await api.recommend_colleges({"cutoff": 178.2, "category": "BC"}, headers={"cookie": "sid=other"})
+        assert route.call_count == 2
+
+    assert api.cache is not None and api.cache.hits == 1
+    await api.aclose()
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_served_when_backend_errors():
+    api = TneaApiClient(base_url="http://backend")
+
+    with respx.mock() as router:
+        router.post("http://backend/api/compare-colleges").respond(200, json={"winner": "PSG"})
+        await api.compare_colleges({"query": "PSG vs SSN"})
+
+    # expire the entry past its stale-while-revalidate window
+    assert api.cache is not None
+    for entry in api.cache._entries.values():
+        entry.fresh_until -= 10_000
+
+    with respx.mock() as router:
+        router.post("http://backend/api/compare-colleges").respond(503, text="unavailable")
+        res = await api.compare_colleges({"query": "PSG vs SSN"})
+
+    assert res.ok and res.stale and res.data == {"winner": "PSG"}
+    assert res.error == "unavailable"
+    await api.aclose()
+
+
+@pytest.mark.asyncio
+async def test_safe_target_dream_batch_is_chunked_and_aligned():
+    api = TneaApiClient(base_url="http://backend")
+    items = [{"college": f"College {i}", "branch": "CSE"} for i in range(60)]
+
+    def label_chunk(request: httpx.Request) -> httpx.Response:
+        chunk = json.loads(request.content)["items"]
+        if chunk[0]["college"] == "College 25":
+            return httpx.Response(503, text="busy")
+        return httpx.Response(200, json={"results": [{"classification": f"L-{it['college']}"} for it in chunk]})
+
+    with respx.mock() as router:
+        route = router.post("http://backend/api/safe-target-dream").mock(side_effect=label_chunk)
+        res = await api.safe_target_dream_batch(items, {"cutoff": 178.0, "category": "BC"})
+
+    labels = res.data["labels"]
+    assert res.ok and len(labels) == 60
+    assert labels[0] == "L-College 0" and labels[59] == "L-College 59"
+    assert labels[25:50] == [None] * 25
+    assert route.call_count == 3
+    await api.aclose()
+
+
+@pytest.mark.asyncio
+async def test_recommendations_are_streamed_down_to_top_k():
+    api = TneaApiClient(base_url="http://backend")
+    rows = [{"name": f"College {i}", "matchScore": i % 97} for i in range(500)]
+
+    with respx.mock() as router:
+        router.post("http://backend/api/college-suggestions").respond(200, json=rows)
+        res = await api.recommend_colleges({"cutoff": 178.0, "category": "BC"})
+
+    assert res.ok and not res.truncated
+    assert len(res.data) == 50
+    assert res.data[0]["matchScore"] == 96
+    assert all(a["matchScore"] >= b["matchScore"] for a, b in zip(res.data, res.data[1:]))
+    await api.aclose()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_half_open_probe_frees_the_probe_slot():
+    from deadline import Deadline
+
+    api = TneaApiClient(base_url="http://backend")
+    breaker = api._resilience("/api/compare-colleges").breaker
+    breaker.state, breaker.opened_at = breaker.HALF_OPEN, None
+
+    async def slow(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(1.0)
+        return httpx.Response(200, json={"winner": "PSG"})
+
+    with respx.mock() as router:
+        route = router.post("http://backend/api/compare-colleges").mock(side_effect=slow)
+        res = await api.compare_colleges({"query": "PSG vs SSN"}, deadline=Deadline.from_header("50"))
+        assert not res.ok and "deadline exceeded" in (res.error or "")
+        await asyncio.sleep(0.01)  # let the abandoned probe finish cancelling
+
+        # the probe we abandoned is not a backend failure, but its slot is free for the next call
+        assert breaker.state == breaker.HALF_OPEN and not breaker._probe_in_flight
+        assert breaker.consecutive_failures == 0
+
+        route.mock(return_value=httpx.Response(200, json={"winner": "PSG"}))
+        res = await api.compare_colleges({"query": "PSG vs SSN 2"})
+        assert res.ok and breaker.state == breaker.CLOSED
+    await api.aclose()
+
+
+@pytest.mark.asyncio
+async def test_client_side_cancellations_never_open_a_closed_breaker():
+    from deadline import Deadline
+
+    api = TneaApiClient(base_url="http://backend")
+    breaker = api._resilience("/api/compare-colleges").breaker
+
+    async def healthy_but_slower_than_budget(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.15)
+        return httpx.Response(200, json={"winner": "PSG"})
+
+    with respx.mock() as router:
+        router.post("http://backend/api/compare-colleges").mock(side_effect=healthy_but_slower_than_budget)
+        for i in range(breaker.failure_threshold + 2):
+            res = await api.compare_colleges({"query": f"PSG vs SSN {i}"}, deadline=Deadline.from_header("50"))
+            assert not res.ok
+        await asyncio.sleep(0.01)
+
+        assert breaker.state == breaker.CLOSED and breaker.consecutive_failures == 0
+        assert (await api.compare_colleges({"query": "PSG vs SSN"})).ok
+    await api.aclose()
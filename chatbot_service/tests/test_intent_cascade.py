@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import pytest
+
+from intent_cascade import IntentCascade, calibrate_threshold
+from intent_model.baseline import IntentPrediction
+
+
+def _predictor(table: dict[str, IntentPrediction], calls: list[str]):
+    async def predict(text: str) -> IntentPrediction:
+        calls.append(text)
+        if text not in table:
+            raise FileNotFoundError("model missing")
+        return table[text]
+
+    return predict
+
+
+@pytest.mark.asyncio
+async def test_only_unsure_unmatched_messages_escalate():
+    baseline_calls: list[str] = []
+    transformer_calls: list[str] = []
+    baseline = _predictor(
+        {
+            "hi": IntentPrediction("greeting", 0.9),
+            "compare ceg mit": IntentPrediction("college_comparison", 0.4),
+            "178 bc cse": IntentPrediction("college_recommendation", 0.3),
+        },
+        baseline_calls,
+    )
+    transformer = _predictor({"178 bc cse": IntentPrediction("college_recommendation", 0.97)}, transformer_calls)
+    cascade = IntentCascade(baseline, transformer, threshold=0.7)
+
+    assert await cascade.classify("hi") == (IntentPrediction("greeting", 0.9), "baseline")
+    pred, tier = await cascade.classify("compare ceg mit", rule_intent="college_comparison")
+    assert (pred.intent, pred.confidence, tier) == ("college_comparison", 0.6, "rules")
+    assert await cascade.classify("178 bc cse") == (IntentPrediction("college_recommendation", 0.97), "transformer")
+    assert transformer_calls == ["178 bc cse"]
+
+    stats = cascade.stats()
+    assert stats["requests"] == 3
+    assert {t: s["answered"] for t, s in stats["tiers"].items()} == {
+        "baseline": 1,
+        "rules": 1,
+        "transformer": 1,
+        "baseline_fallback": 0,
+    }
+    assert stats["tiers"]["transformer"]["hit_rate"] == round(1 / 3, 4)
+    assert stats["tiers"]["baseline"]["latency_p95_ms"] is not None
+
+
+@pytest.mark.asyncio
+async def test_transformer_failure_keeps_baseline_answer():
+    baseline = _predictor({"seat trend": IntentPrediction("seat_trend_analysis", 0.5)}, [])
+    cascade = IntentCascade(baseline, _predictor({}, []), threshold=0.7)
+
+    assert await cascade.classify("seat trend") == (IntentPrediction("seat_trend_analysis", 0.5), "baseline_fallback")
+    assert cascade.transformer_errors == 1
+    assert cascade.stats()["tiers"]["baseline_fallback"]["answered"] == 1
+
+
+def test_calibrate_threshold_picks_lowest_confidence_meeting_precision():
+    confidences = [0.95, 0.9, 0.85, 0.8, 0.7, 0.6, 0.5, 0.4]
+    correct = [True, True, True, True, True, False, True, False]
+    assert calibrate_threshold(confidences, correct, target_precision=0.85, min_samples=3) == 0.5
+    assert calibrate_threshold(confidences, correct, target_precision=1.0, min_samples=3) == 0.7
+    assert calibrate_threshold(confidences, correct, target_precision=1.0, min_samples=6) is None
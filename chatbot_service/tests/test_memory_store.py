@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+
+import pytest
+import pytest_asyncio
+
+from memory_store import MemoryStore, RankedResults, SessionState, decode_state, encode_state, session_bytes
+from session_backend import RedisSessionBackend, SessionBackend
+
+
+class FakeRedis:
+    """Stand-in RESP server: GET, SET [PX], PEXPIRE, AUTH, SELECT."""
+
+    def __init__(self):
+        self.data: dict[bytes, bytes] = {}
+        self.ttl_ms: dict[bytes, int] = {}
+        self.commands: list[list[bytes]] = []
+        # raw bytes to answer every command with instead of a proper reply
+        self.garbage: bytes | None = None
+        self.server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"redis://127.0.0.1:{port}"
+
+    async def stop(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    break
+                args = []
+                for _ in range(int(header[1:-2])):
+                    size = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(size + 2))[:-2])
+                self.commands.append(args)
+                writer.write(self.garbage or self._reply(args))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def _reply(self, args: list[bytes]) -> bytes:
+        cmd = args[0].upper()
+        if cmd in {b"AUTH", b"SELECT"}:
+            return b"+OK\r\n"
+        if cmd == b"GET":
+            value = self.data.get(args[1])
+            return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+        if cmd == b"SET":
+            self.data[args[1]] = args[2]
+            if len(args) == 5 and args[3].upper() == b"PX":
+                self.ttl_ms[args[1]] = int(args[4])
+            return b"+OK\r\n"
+        if cmd == b"PEXPIRE":
+            if args[1] not in self.data:
+                return b":0\r\n"
+            self.ttl_ms[args[1]] = int(args[2])
+            return b":1\r\n"
+        return b"-ERR unknown command\r\n"
+
+
+@pytest_asyncio.fixture
+async def redis_url():
+    server = FakeRedis()
+    url = await server.start()
+    yield server, url
+    await server.stop()
+
+
+def test_session_state_round_trips_through_compact_encoding():
+    state = SessionState(
+        cutoff_score=178.5,
+        category="BC",
+        preferred_branch="CSE",
+        location="Chennai",
+        first_graduate_quota=True,
+        last_intent="college_recommendation",
+        ranked_results=RankedResults(
+            set_id="abc", rows=(("College A", "CSE", "Chennai", 0.82, "Safe", 176.0),), next_offset=1
+        ),
+        extras={"source": "widget"},
+    )
+    blob = encode_state(state)
+    assert decode_state(blob) == state
+    assert b"cutoff_score" not in blob
+    assert decode_state(encode_state(SessionState())) == SessionState()
+
+
+@pytest.mark.asyncio
+async def test_sessions_are_shared_between_workers(redis_url):
+    server, url = redis_url
+    worker_a = MemoryStore(max_sessions=10, ttl_seconds=60, backend=RedisSessionBackend(url))
+    worker_b = MemoryStore(max_sessions=10, ttl_seconds=60, backend=RedisSessionBackend(url))
+
+    state = await worker_a.load("u1", "s1")
+    worker_a.apply(state, cutoff_score=178.0, category="BC")
+    await worker_a.persist("u1", "s1", state)
+    assert server.ttl_ms[b"tnea:session:u1::s1"] == 60_000
+
+    # the next turn lands on another worker
+    state_b = await worker_b.load("u1", "s1")
+    assert (state_b.cutoff_score, state_b.category) == (178.0, "BC")
+    worker_b.apply(state_b, preferred_branch="CSE")
+    await worker_b.persist("u1", "s1", state_b)
+
+    # ...and back: worker A's L1 copy is refreshed from the backend
+    again = await worker_a.load("u1", "s1")
+    assert again.preferred_branch == "CSE" and worker_a.get("u1", "s1") is again
+
+    # the read is one pipelined round trip that also restarts the TTL
+    reads = worker_a.backend.round_trips
+    server.ttl_ms.clear()
+    await worker_a.load("u1", "s1")
+    assert worker_a.backend.round_trips == reads + 1
+    assert [c[0] for c in server.commands[-2:]] == [b"GET", b"PEXPIRE"]
+    assert server.ttl_ms[b"tnea:session:u1::s1"] == 60_000
+
+    # an unchanged session is not written back
+    writes = worker_a.backend_writes
+    await worker_a.persist("u1", "s1", again)
+    assert worker_a.backend_writes == writes
+
+    await worker_a.aclose()
+    await worker_b.aclose()
+
+
+@pytest.mark.asyncio
+async def test_backend_url_auth_and_db_are_sent_on_connect(redis_url):
+    server, url = redis_url
+    backend = RedisSessionBackend(url.replace("redis://", "redis://:s3cret@") + "/2")
+    await backend.store("k", b"v", 30)
+    assert server.commands[:2] == [[b"AUTH", b"s3cret"], [b"SELECT", b"2"]]
+    assert await backend.fetch("k", 30) == b"v"
+    await backend.aclose()
+
+
+@pytest.mark.asyncio
+async def test_unreachable_backend_falls_back_to_local_sessions(redis_url):
+    server, url = redis_url
+    await server.stop()
+    memory = MemoryStore(max_sessions=10, ttl_seconds=60, backend=RedisSessionBackend(url, timeout_ms=100))
+
+    state = await memory.load("u2")
+    memory.apply(state, category="MBC")
+    await memory.persist("u2", None, state)
+
+    assert (await memory.load("u2")).category == "MBC"
+    assert memory.stats()["backend"]["errors"] == 3
+
+
+def test_sessions_are_slotted_and_share_interned_codes():
+    memory = MemoryStore(max_sessions=10, ttl_seconds=60)
+    a = memory.update("u3", None, category="".join(["B", "C"]), location="Chen" + "nai")
+    b = memory.update("u4", None, category="".join(["B", "C"]), location="Chen" + "nai")
+    assert not hasattr(a, "__dict__") and a.extras is None
+    assert a.category is b.category is sys.intern("BC")
+    assert a.location is b.location
+
+
+def test_byte_budget_evicts_longest_idle_sessions():
+    ranked = RankedResults.from_results(
+        "set1",
+        [{"college": f"College {i}", "branch": "CSE", "probability": 0.5, "last_year_cutoff": 170.0} for i in range(6)],
+        max_rows=6,
+    )
+    probe = MemoryStore(max_sessions=10, ttl_seconds=60, max_bytes=10**6)
+    probe.update("u0", None, cutoff_score=180.0, category="BC")
+    small = probe.memory_bytes()
+    # the key and the cache's bookkeeping are part of an entry's cost
+    assert small > session_bytes(probe.get("u0")) + sys.getsizeof("u0::default")
+
+    memory = MemoryStore(max_sessions=10, ttl_seconds=60, max_bytes=small * 4)
+    for i in range(6):
+        memory.update(f"u{i}", None, cutoff_score=180.0, category="BC")
+
+    stats = memory.stats()
+    assert stats["sessions"] == 4 and stats["evictions"] == 2
+    assert stats["bytes"] == small * 4 and stats["avg_session_bytes"] == small
+    assert stats["max_bytes"] == small * 4 and stats["max_sessions"] == 10
+
+    # a session that grows is re-measured when written back, pushing older ones out
+    state = memory.get("u5")
+    memory.apply(state, ranked_results=ranked)
+    memory.save("u5", None, state)
+    assert session_bytes(state) > small * 2
+    assert memory.memory_bytes() <= small * 4
+    assert memory.get("u5") is state and memory.stats()["sessions"] < 4
+
+
+def test_session_count_cap_applies_alongside_byte_budget():
+    memory = MemoryStore(max_sessions=3, ttl_seconds=60, max_bytes=10**9)
+    for i in range(5):
+        memory.update(f"u{i}", None, category="BC")
+    assert memory.stats()["sessions"] == 3 and memory.stats()["evictions"] == 2
+
+
+def test_default_config_is_bounded_by_bytes_not_by_count():
+    from config import settings
+
+    memory = MemoryStore(
+        max_sessions=settings.memory_max_sessions, ttl_seconds=60, max_bytes=settings.memory_max_bytes
+    )
+    for i in range(6000):
+        memory.update(f"u{i}", None, cutoff_score=180.0, category="BC")
+    stats = memory.stats()
+    assert stats["sessions"] == 6000 and stats["evictions"] == 0 and stats["max_sessions"] is None
+
+    # with the default (unset) count cap, the byte budget is what evicts
+    small = MemoryStore(max_sessions=settings.memory_max_sessions, ttl_seconds=60, max_bytes=memory.memory_bytes() // 10)
+    for i in range(1000):
+        small.update(f"u{i}", None, cutoff_score=180.0, category="BC")
+    assert 0 < small.stats()["sessions"] < 1000 and small.memory_bytes() <= small.max_bytes
+
+    # without a byte budget the count cap falls back to a fixed default
+    assert MemoryStore(max_sessions=0, ttl_seconds=60).stats()["max_sessions"] == 5000
+
+
+def test_oversized_sessions_are_trimmed_not_raised():
+    probe = MemoryStore(max_sessions=10, ttl_seconds=60)
+    probe.update("u0", None, cutoff_score=180.0, category="BC")
+    memory = MemoryStore(max_sessions=10, ttl_seconds=60, max_bytes=probe.memory_bytes() + 50)
+
+    state = memory.update("u0", None, cutoff_score=180.0, category="BC")
+    state.ranked_results = RankedResults.from_results("s", [{"college": f"C{i}"} for i in range(10)], max_rows=10)
+    memory.save("u0", None, state)
+    assert state.ranked_results is None and memory.get("u0") is state
+    assert memory.stats()["trimmed"] == 1
+
+    tiny = MemoryStore(max_sessions=10, ttl_seconds=60, max_bytes=10)
+    assert tiny.update("u1", None, category="BC").category == "BC"
+    assert tiny.stats()["sessions"] == 0 and tiny.stats()["rejected"] >= 1
+
+
+def test_session_backend_is_abstract():
+    with pytest.raises(TypeError):
+        SessionBackend()
+
+
+@pytest.mark.asyncio
+async def test_malformed_replies_and_blobs_fall_back_to_local_sessions(redis_url):
+    server, url = redis_url
+    memory = MemoryStore(max_sessions=10, ttl_seconds=60, backend=RedisSessionBackend(url))
+    memory.update("u5", None, category="OC")
+
+    server.garbage = b":not-a-number\r\n"
+    assert (await memory.load("u5")).category == "OC"
+
+    server.garbage = None
+    server.data[b"tnea:session:u5::default"] = b'[1,180.0,"BC",null,null,null,null,null,["set",0],null]'
+    assert (await memory.load("u5")).category == "OC"
+    assert memory.stats()["backend"]["errors"] == 2
+    await memory.aclose()
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import httpx
+import pytest
+
+from executors import InferenceExecutor
+from intent_model.baseline import IntentPrediction
+from main import create_app
+from ner_model.entity_extractor import ExtractedEntities
+from nlu_cache import NluCache
+
+
+class _Model:
+    def __init__(self, _: object = None):
+        self.reloads = 0
+
+    def reload(self) -> None:
+        self.reloads += 1
+
+
+@pytest.mark.asyncio
+async def test_intent_keys_ignore_case_and_entities_are_copied():
+    cache = NluCache(max_entries=8)
+    calls: list[str] = []
+
+    async def classify() -> IntentPrediction:
+        calls.append("intent")
+        return IntentPrediction("greeting", 0.9)
+
+    async def extract() -> ExtractedEntities:
+        calls.append("entities")
+        return ExtractedEntities(branch="CSE")
+
+    assert await cache.get_or_compute("intent", "baseline", "baseline@0:x", "Hi", classify) == IntentPrediction("greeting", 0.9)
+    await cache.get_or_compute("intent", "baseline", "baseline@0:x", "hi", classify)
+    ents = await cache.get_or_compute("entities", "ner", "ner@0:builtin", "CSE please", extract)
+    ents.branch = "ECE"
+    again = await cache.get_or_compute("entities", "ner", "ner@0:builtin", "CSE please", extract)
+
+    assert again.branch == "CSE"
+    assert calls == ["intent", "entities"]
+    assert cache.stats()["hits"] == {"intent": 1, "entities": 1}
+
+
+@pytest.mark.asyncio
+async def test_reload_bumps_version_and_invalidates_entries():
+    executor = InferenceExecutor(routing={"baseline": "inline", "ner": "inline"})
+    model = _Model()
+    executor.register("baseline", model)
+    executor.register("ner", _Model())
+    cache = NluCache(max_entries=8)
+    executor.add_reload_listener(cache.invalidate)
+
+    async def compute() -> IntentPrediction:
+        return IntentPrediction("greeting", 0.9)
+
+    before = executor.version("baseline")
+    await cache.get_or_compute("intent", "cascade", f"{before}|onnx@0:y", "hi", compute)
+    await cache.get_or_compute("intent", "ner-only", executor.version("ner"), "hi", compute)
+    await executor.reload("baseline")
+
+    assert model.reloads == 1
+    assert executor.version("baseline") != before
+    assert cache.stats()["entries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_repeated_chat_messages_hit_the_cache():
+    app = create_app()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for message in ["Hello", "hello", "Hello"]:
+            r = await client.post("/chat", json={"user_id": "u-cache", "message": message})
+            assert r.status_code == 200
+        stats = (await client.get("/health/inference")).json()["nlu_cache"]
+
+    assert stats["hits"] == {"intent": 2, "entities": 1}
+    assert stats["misses"] == {"intent": 1, "entities": 2}
+
+
+@pytest.mark.asyncio
+async def test_degraded_cascade_answers_are_not_cached(monkeypatch):
+    import dataclasses
+
+    import main
+
+    # no transformer model is available here, so every escalation falls back to the baseline
+    monkeypatch.setattr(main, "settings", dataclasses.replace(main.settings, intent_backend="cascade"))
+    app = create_app()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for _ in range(2):
+            r = await client.post("/chat", json={"user_id": "u-cascade", "message": "zzz unknown words only"})
+            assert r.status_code == 200
+        health = (await client.get("/health/inference")).json()
+
+    assert health["cascade"]["tiers"]["baseline_fallback"]["answered"] == 2
+    assert health["nlu_cache"]["hits"]["intent"] == 0
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from intent_model.bert import IntentPrediction
+from intent_model.onnx_backend import OnnxIntentClassifier, _softmax, default_onnx_path
+
+
+class _StubTokenizer:
+    """Whitespace tokenizer with the `__call__`/`pad` surface the ONNX backend uses."""
+
+    def __call__(self, texts: list[str], truncation: bool = True) -> dict[str, list[list[int]]]:
+        ids = [[len(word) for word in text.split()] for text in texts]
+        return {"input_ids": ids, "attention_mask": [[1] * len(row) for row in ids]}
+
+    def pad(self, features: list[dict[str, list[int]]], return_tensors: str = "np") -> dict[str, np.ndarray]:
+        width = max(len(f["input_ids"]) for f in features)
+        return {
+            key: np.array([f[key] + [0] * (width - len(f[key])) for f in features])
+            for key in ("input_ids", "attention_mask")
+        }
+
+
+class _StubSession:
+    """Scores label 1 for inputs with an even token count, label 0 otherwise."""
+
+    def __init__(self):
+        self.batch_shapes: list[tuple[int, int]] = []
+
+    def run(self, outputs: object, feeds: dict[str, np.ndarray]) -> list[np.ndarray]:
+        assert set(feeds) == {"input_ids", "attention_mask"}
+        assert all(v.dtype == np.int64 for v in feeds.values())
+        self.batch_shapes.append(feeds["input_ids"].shape)
+        even = feeds["attention_mask"].sum(axis=1) % 2 == 0
+        return [np.where(even[:, None], [[0.0, 3.0]], [[3.0, 0.0]])]
+
+
+def test_missing_export_points_to_export_step(tmp_path):
+    clf = OnnxIntentClassifier(default_onnx_path(str(tmp_path)))
+    with pytest.raises(FileNotFoundError, match="--export_only"):
+        clf.predict("hello")
+
+
+def test_softmax_is_stable_for_large_logits():
+    probs = _softmax(np.array([[1000.0, 1001.0], [0.0, 0.0]]))
+    assert np.allclose(probs.sum(axis=-1), 1.0)
+    assert probs[0, 1] > probs[0, 0]
+    assert np.allclose(probs[1], [0.5, 0.5])
+
+
+def test_predict_batch_restores_input_order_across_length_buckets():
+    clf = OnnxIntentClassifier("model.onnx")
+    session = _StubSession()
+    clf._session, clf._tokenizer = session, _StubTokenizer()
+    clf._input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    clf._labels = {0: "greeting", 1: "cutoff_prediction"}
+
+    texts = ["one two three", "hi", "a b", "which college for 190 cutoff"]
+    preds = clf.predict_batch(texts, bucket_size=2)
+
+    assert [p.intent for p in preds] == ["greeting", "greeting", "cutoff_prediction", "greeting"]
+    assert all(p.confidence == pytest.approx(_softmax(np.array([3.0, 0.0]))[0]) for p in preds)
+    # shortest texts share the first bucket, padded only to their own length
+    assert session.batch_shapes == [(2, 2), (2, 5)]
+    assert clf.predict("a b") == IntentPrediction("cutoff_prediction", preds[2].confidence)
+    assert clf.predict_batch([]) == []
+
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from intent_model.rules import KeywordMatch, KeywordRuleEngine
+
+
+RULES = KeywordRuleEngine()
+
+
+def test_keywords_respect_word_boundaries():
+    # plain substring checks used to read these as greeting / comparison / counselling
+    assert RULES.intent("this is about which branch") is None
+    assert RULES.intent("canvs and devs") is None
+    assert RULES.intent("colleges around Chennai") is None
+    assert RULES.intent("CEG vs. MIT") == "college_comparison"
+
+
+def test_stems_take_suffixes_and_multi_word_keywords_match():
+    assert RULES.intent("Any recommendations?") == "college_recommendation"
+    assert RULES.intent("what was the predicted cutoff") == "cutoff_prediction"
+    assert RULES.intent("Thank you!") == "goodbye"
+
+
+def test_tamil_keywords_with_attached_particles():
+    assert RULES.intent("வணக்கம்") == "greeting"
+    assert RULES.intent("ரொம்ப நன்றிங்க") == "goodbye"
+    assert RULES.intent("கலந்தாய்வு எப்போது?") == "counselling_process"
+
+
+def test_priority_order_and_spans():
+    text = "Hello, compare CEG vs MIT"
+    result = RULES.match(text)
+    assert result is not None and result.intent == "greeting"
+    assert [(m.intent, text[m.start : m.end]) for m in result.matches] == [
+        ("greeting", "Hello"),
+        ("college_comparison", "compare"),
+        ("college_comparison", "vs"),
+    ]
+
+
+def test_overlapping_keywords_are_all_reported():
+    engine = KeywordRuleEngine((("a", ("cut off for",)), ("b", ("off",)), ("c", ("cut*",))))
+    assert engine.find_all("cut off for") == [
+        KeywordMatch("c", "cut*", 0, 3),
+        KeywordMatch("b", "off", 4, 7),
+        KeywordMatch("a", "cut off for", 0, 11),
+    ]
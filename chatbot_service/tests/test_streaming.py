@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from streaming import JsonArrayStream, TopK, read_top_k
+from utils import record_probability
+
+
+RECORDS = [{"name": f"College {i}", "matchScore": (i * 37) % 100, "note": "é, [x]"} for i in range(200)]
+
+
+async def _chunks(body: bytes, size: int):
+    for i in range(0, len(body), size):
+        yield body[i : i + size]
+
+
+def test_array_stream_yields_elements_across_any_split():
+    body = json.dumps([1, 23, {"a": "x]y"}, [4, 5], "s,", None, 6.5])
+    for size in (1, 2, 3, 7, len(body)):
+        stream = JsonArrayStream()
+        items = []
+        for i in range(0, len(body), size):
+            items.extend(stream.feed(body[i : i + size]))
+        items.extend(stream.close())
+        assert items == [1, 23, {"a": "x]y"}, [4, 5], "s,", None, 6.5]
+
+
+def test_top_k_keeps_best_with_stable_ties():
+    best = TopK(3, lambda x: x[1])
+    for item in [("a", 1), ("b", 5), ("c", 5), ("d", 3), ("e", 5), ("f", 0)]:
+        best.push(item)
+    assert best.items() == [("b", 5), ("c", 5), ("e", 5)]
+
+
+@pytest.mark.asyncio
+async def test_read_top_k_streams_arrays_and_objects():
+    expected = sorted(RECORDS, key=lambda r: -record_probability(r))[:5]
+
+    data, truncated = await read_top_k(_chunks(json.dumps(RECORDS).encode(), 64), 5, record_probability, 1 << 20)
+    assert not truncated
+    assert [r["matchScore"] for r in data] == [r["matchScore"] for r in expected]
+
+    doc = {"meta": 1, "results": RECORDS}
+    data, truncated = await read_top_k(_chunks(json.dumps(doc).encode(), 64), 5, record_probability, 1 << 20)
+    assert data["meta"] == 1 and len(data["results"]) == 5
+
+
+@pytest.mark.asyncio
+async def test_read_top_k_stops_at_byte_cap():
+    body = json.dumps(RECORDS).encode()
+    data, truncated = await read_top_k(_chunks(body, 256), 5, record_probability, 2048)
+    assert truncated and 0 < len(data) <= 5
+
+    with pytest.raises(ValueError):
+        await read_top_k(_chunks(json.dumps({"results": RECORDS}).encode(), 256), 5, record_probability, 2048)
@@ -107,6 +107,16 @@ def safe_float(value) -> float | None:
         return None
 
 
+def record_probability(rec: dict) -> float:
+    """Admission probability of a downstream recommendation record ({probability} or {matchScore} style)."""
+    prob = safe_float(rec.get("probability")) if isinstance(rec, dict) else None
+    if prob is None and isinstance(rec, dict):
+        match_score = rec.get("matchScore")
+        if isinstance(match_score, (int, float)):
+            prob = float(match_score) / 100.0
+    return 0.5 if prob is None else prob
+
+
 def pct(x: float) -> int:
     return int(round(max(0.0, min(1.0, x)) * 100))
 